@@ -1,5 +1,10 @@
+import os
+
+import numpy as np
 import pandas as pd
 
+from parallel_helpers import *
+
 
 # Reformat a single game possessions to fit style of RAPM calculator
 def reformat_single_game_possessions(game_possessions, date):
@@ -26,7 +31,8 @@ def reformat_single_game_possessions(game_possessions, date):
 
         # Create a row with offensive players, defensive players, points score in possessions, and number of possessions
         # which is always 1 since we are using possession data instead of stints
-        reformatted_possessions.append(offensive_players + defensive_players + [offensive_points, 1, date])
+        reformatted_possessions.append(offensive_players + defensive_players +
+                                       [offensive_points, 1, date, possession['game_id']])
 
     # Create a data frame with the reformatted possessions
     reformatted_possessions_df = pd.DataFrame(reformatted_possessions)
@@ -34,14 +40,20 @@ def reformat_single_game_possessions(game_possessions, date):
                                           'offensive_player4', 'offensive_player5',
                                           'defensive_player1', 'defensive_player2', 'defensive_player3',
                                           'defensive_player4', 'defensive_player5',
-                                          'points', 'possessions', 'date']
+                                          'points', 'possessions', 'date', 'game_id']
 
     return reformatted_possessions_df
 
 
+# Read and reformat the possessions for a single game
+def get_reformatted_game_possessions(game_id, game_dates, possessions_filename):
+    game_possessions = pd.read_csv(possessions_filename.format(game_id))
+    return reformat_single_game_possessions(game_possessions, game_dates[game_id])
+
+
 # Combine possessions for a single season
 def combine_season_possessions(season, season_type, schedule_filename, possessions_filename,
-                               season_possessions_filename):
+                               season_possessions_filename, max_processes=default_max_processes):
     # Read schedule
     schedule = pd.read_csv(schedule_filename.format(season, season_type), dtype=str)
 
@@ -50,18 +62,15 @@ def combine_season_possessions(season, season_type, schedule_filename, possessio
     games.reset_index(drop=True, inplace=True)
     n_games = games.shape[0]
 
-    # Get possessions for each game in the season
+    # Get the reformatted possessions for each game in the season on a pool of processes
+    game_dates = dict(zip(games['GAME_ID'], games['GAME_DATE']))
+    results = run_games(get_reformatted_game_possessions, games['GAME_ID'], (game_dates, possessions_filename),
+                        max_processes=max_processes)
     season_possessions = []
-    for i, game in games.iterrows():
-        game_id = game['GAME_ID']
-        game_date = game['GAME_DATE']
+    for i, (game_id, reformatted_possessions, failure) in enumerate(results):
         print(f'{((i + 1) / n_games):.2%} {season} {season_type}: {game_id}')
-
-        # Get the possessions for this game
-        game_possessions = pd.read_csv(possessions_filename.format(game_id))
-
-        # Reformat the possessions
-        reformatted_possessions = reformat_single_game_possessions(game_possessions, game_date)
+        if failure is not None:
+            raise_failure(game_id, failure)
 
         # Add this game's reformatted possessions to season-long list
         season_possessions.append(reformatted_possessions)
@@ -75,13 +84,13 @@ def combine_season_possessions(season, season_type, schedule_filename, possessio
 
 # Combine possessions for multiple seasons
 def combine_multiple_season_possessions(seasons, season_types, schedule_filename, possessions_filename,
-                                        season_possessions_filename):
+                                        season_possessions_filename, max_processes=default_max_processes):
     # Loop over seasons and regular season/playoffs
     for season in seasons:
         for season_type in season_types:
             # Combine possessions for this season
             combine_season_possessions(season, season_type, schedule_filename, possessions_filename,
-                                       season_possessions_filename)
+                                       season_possessions_filename, max_processes=max_processes)
 
 
 # Combine all possessions for all seasons
@@ -107,6 +116,42 @@ def combine_all_seasons_possessions(seasons, season_types, season_possessions_fi
     all_possessions_df.to_csv(all_possessions_filename, index=False)
 
 
+# Drop the possessions of games that are already in a possessions file
+# Appending is then safe to repeat, e.g. after a crash between appending games and recording them as processed
+def drop_saved_games(possessions, filename):
+    if not os.path.exists(filename):
+        return possessions
+    saved_game_ids = pd.read_csv(filename, usecols=['game_id'])['game_id'].astype(np.int64).unique()
+    return possessions[~possessions['game_id'].astype(np.int64).isin(saved_game_ids)]
+
+
+# Append the possessions for new games to the season file and the all-seasons file instead of rewriting them
+# Games already in either file are not appended to it again
+def append_games_possessions(games, season, season_type, possessions_filename, season_possessions_filename,
+                             all_possessions_filename):
+    # Get the reformatted possessions for each new game
+    new_possessions = []
+    for _, game in games.iterrows():
+        game_possessions = pd.read_csv(possessions_filename.format(game['GAME_ID']))
+        new_possessions.append(reformat_single_game_possessions(game_possessions, game['GAME_DATE']))
+
+    # Do nothing if there are no new possessions
+    if len(new_possessions) == 0:
+        return
+    new_possessions_df = pd.concat(new_possessions)
+
+    # Append to the season-long possessions, writing the header only if the file is new
+    season_filename = season_possessions_filename.format(season, season_type)
+    drop_saved_games(new_possessions_df, season_filename).to_csv(
+        season_filename, mode='a', header=not os.path.exists(season_filename), index=False)
+
+    # Add columns for the season and season type and append to the possessions for all seasons
+    new_possessions_df['season'] = season
+    new_possessions_df['season_type'] = season_type
+    drop_saved_games(new_possessions_df, all_possessions_filename).to_csv(
+        all_possessions_filename, mode='a', header=not os.path.exists(all_possessions_filename), index=False)
+
+
 if __name__ == '__main__':
     seasons = range(1996, 2024)
     seasons = [f'{season}-{((season % 100) + 1) % 100:02}' for season in seasons]
@@ -1,70 +1,101 @@
+import os
 import pickle
-import time
 import traceback
 
 from api_helpers import *
+from Possessions.manifest import *
+from season_helpers import is_finished_season
 
 
 # Download play-by-play data for given seasons
-def download_play_by_play(schedule_url, seasons, season_types, schedule_filename, play_by_play_url, play_by_play_filename, failed_filename):
+# Games recorded as complete in the manifest are skipped, so a run picks up where the last one stopped and a follow-up
+# run only fetches new or failed games
+def download_play_by_play(schedule_url, seasons, season_types, schedule_filename, play_by_play_url, play_by_play_filename,
+                          failed_filename, manifest_filename, verify_checksums=False):
     # Keep track of failed downloads
     failures = {}
 
+    # Load the manifest of previously downloaded games, dropping superseded entries
+    manifest = compact_manifest(manifest_filename)
+
     # Loop over seasons and regular season/playoffs
     for season in seasons:
         for season_type in season_types:
             # Extract schedule data for the season and season type
             try:
-                schedule = extract_data(schedule_url.format(season, season_type))
+                schedule = get_schedule(schedule_url, season, season_type, schedule_filename)
             except Exception as error:
                 print(f'Error occurred: {error}')
                 traceback.print_exc()
                 failures[schedule_url.format(season, season_type)] = (error, traceback.format_exc())
                 continue
 
-            # Remove missing/wrong games
-            schedule = schedule[schedule['WL'].notna()]
-
-            # Save schedule in case it is needed later
-            schedule.to_csv(schedule_filename.format(season, season_type), index=False)
-
             # Extract the game IDs from the schedule
             game_ids = schedule['GAME_ID'].unique()
-            n_games = len(game_ids)
-
-            # Scrape the play-by-play for every game
-            for i, game_id in enumerate(game_ids):
-                print(f'{((i + 1) / n_games):.2%} {season} {season_type}: {game_id}')
 
-                # Scrape play-by-play for the game
-                results = download_play_by_play_single_game(game_id, play_by_play_url, play_by_play_filename)
+            # Skip games that have already been downloaded
+            new_game_ids = [game_id for game_id in game_ids
+                            if not is_complete(manifest.get(game_id), play_by_play_filename.format(game_id),
+                                               verify_checksum=verify_checksums)]
 
-                # Check if there was an error
-                if results[0] != 0:
-                    failures[game_id] = results[1:]
+            # Scrape the play-by-play for every remaining game
+            print(f'{season} {season_type}: {len(new_game_ids)} of {len(game_ids)} games to download')
+            failures.update(download_play_by_play_games(new_game_ids, play_by_play_url, play_by_play_filename,
+                                                        manifest_filename))
 
     # Save failed links
     with open(failed_filename, 'wb') as fp:
         pickle.dump(failures, fp)
 
 
-# Download play-by-play data for a single game
-def download_play_by_play_single_game(game_id, play_by_play_url, play_by_play_filename):
-    try:
-        play_by_play = extract_data(play_by_play_url.format(game_id))
-    except Exception as error:
-        print(f'Error occurred: {error}')
-        traceback.print_exc()
-        return -1, str(error), traceback.format_exc()
+# Get the schedule for a season and season type
+# Schedules for finished seasons never change, so they are read from the saved file when it exists
+def get_schedule(schedule_url, season, season_type, schedule_filename):
+    # Use the saved schedule for finished seasons
+    if is_finished_season(season) and os.path.exists(schedule_filename.format(season, season_type)):
+        return pd.read_csv(schedule_filename.format(season, season_type), dtype=str)
+
+    # Extract schedule data for the season and season type
+    schedule = extract_data(schedule_url.format(season, season_type))
+
+    # Remove missing/wrong games
+    schedule = schedule[schedule['WL'].notna()]
+
+    # Save schedule in case it is needed later
+    schedule.to_csv(schedule_filename.format(season, season_type), index=False)
+
+    return schedule
+
+
+# Download play-by-play data for many games concurrently, recording each game in the manifest as soon as it finishes
+def download_play_by_play_games(game_ids, play_by_play_url, play_by_play_filename, manifest_filename,
+                                max_workers=default_max_workers):
+    # Keep track of failed downloads
+    failures = {}
+
+    # Build the URL for every game
+    urls = [play_by_play_url.format(game_id) for game_id in game_ids]
+
+    # Download every play-by-play
+    n_games = len(game_ids)
+    for n_done, (i, result) in enumerate(iterate_data_batch(urls, max_workers=max_workers)):
+        game_id = game_ids[i]
+        print(f'{((n_done + 1) / n_games):.2%}: {game_id}')
 
-    # Save the play-by-play data
-    play_by_play.to_csv(play_by_play_filename.format(game_id), index=False)
+        # Record the failure if there was an error
+        if isinstance(result, Exception):
+            print(f'Error occurred: {result}')
+            failures[game_id] = str(result), result.traceback
+            record_manifest_entry(manifest_filename, game_id, status_failed, error=str(result))
+            continue
 
-    # Sleep for 0.75 seconds to stay under the rate limit
-    time.sleep(.75)
+        # Save the play-by-play data and record it as complete
+        data = result.to_csv(index=False).encode('utf-8')
+        write_file_atomically(play_by_play_filename.format(game_id), data)
+        record_manifest_entry(manifest_filename, game_id, status_ok, n_bytes=len(data),
+                              checksum=compute_checksum(data))
 
-    # Return success code
-    return 0,
+    return failures
 
 
 if __name__ == '__main__':
@@ -73,4 +104,4 @@ if __name__ == '__main__':
     season_types = ['Regular Season', 'Playoffs']
     schedule_url = "http://stats.nba.com/stats/leaguegamelog/?leagueId=00&season={}&seasonType={}&playerOrTeam=T&counter=0&sorter=PTS&direction=ASC&dateFrom=&dateTo="
     play_by_play_url = "https://stats.nba.com/stats/playbyplayv2/?gameId={0}&startPeriod=0&endPeriod=14"
-    download_play_by_play(schedule_url, seasons, season_types, '../Data/Schedules/schedule_{}_{}.csv', play_by_play_url, '../Data/PlayByPlay/Standard/pbp_{}.csv', 'Fails/failed_play_by_plays.pkl')
+    download_play_by_play(schedule_url, seasons, season_types, '../Data/Schedules/schedule_{}_{}.csv', play_by_play_url, '../Data/PlayByPlay/Standard/pbp_{}.csv', 'Fails/failed_play_by_plays.pkl', '../Data/PlayByPlay/Standard/manifest.jsonl')
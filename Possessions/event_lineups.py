@@ -0,0 +1,200 @@
+import pickle
+
+import numpy as np
+
+from Possessions.play_by_play_helpers import *
+from Possessions.play_by_play_store import read_play_by_play
+from parallel_helpers import *
+
+# Constants for the lineup columns added to every event
+team_id_columns = ['TEAM1_ID', 'TEAM2_ID']
+team_player_columns = [[f'TEAM{team}_PLAYER{player}' for player in range(1, 6)] for team in range(1, 3)]
+lineup_columns = [team_id_columns[0]] + team_player_columns[0] + [team_id_columns[1]] + team_player_columns[1]
+
+# Play-by-play columns needed to replay the substitutions
+substitution_columns = ['GAME_ID', 'EVENTNUM', 'EVENTMSGTYPE', period_column, player1_id, player1_team_id, player2_id]
+
+
+# Convert string representation of a list to an actual list
+def string_to_list(list_str):
+    # Remove brackets
+    list_str_no_brackets = list_str.replace('[', '').replace(']', '')
+
+    # Convert comma-separated values to list
+    return list_str_no_brackets.split(', ')
+
+
+# Get the players on the court for each team at the start of each period from the players at period file for a game
+def get_sub_map(players_at_start_of_period):
+    # Pre-populate the map with the players at the start of each period
+    sub_map = {}
+    for _, period in players_at_start_of_period.iterrows():
+        sub_map[period[period_column]] = {period['TEAM_ID_1']: string_to_list(period['TEAM_1_PLAYERS']),
+                                          period['TEAM_ID_2']: string_to_list(period['TEAM_2_PLAYERS'])}
+    return sub_map
+
+
+# Assign each player a small integer code
+# Codes are assigned in the order of the players' string IDs, so sorting codes sorts the players the same way as
+# sorting their string IDs does
+def get_player_codes(sub_map, e_types, players_in):
+    # Get every player on the court at the start of a period or subbed in
+    players = set()
+    for teams in sub_map.values():
+        for team_players in teams.values():
+            players.update(team_players)
+    for e_type, player_in in zip(e_types, players_in):
+        if e_type == EventType.Substitution.value:
+            players.add(str(player_in))
+
+    # Map each player to a code
+    players = sorted(players)
+    return players, {player: code for code, player in enumerate(players)}
+
+
+# Get the team IDs and lineups of integer player codes for each period from the players on the court at the start of
+# each period
+def get_period_lineups(sub_map, player_codes):
+    team_ids = {}
+    lineups = {}
+    for period, teams in sub_map.items():
+        team_ids[period] = list(teams.keys())
+        lineups[period] = np.array([[player_codes[player] for player in players] for players in teams.values()],
+                                   dtype=np.int32)
+    return team_ids, lineups
+
+
+# Apply a substitution to the lineups for a period
+def substitute(team_id, player_out, player_in, team_ids, lineups, player_codes):
+    # Get the team who is substituting
+    if team_id not in team_ids:
+        raise KeyError(team_id)
+    lineup = lineups[team_ids.index(team_id)]
+
+    # Find the player being subbed out
+    positions = np.flatnonzero(lineup == player_codes.get(player_out, -1))
+    if len(positions) == 0:
+        raise ValueError(f'{player_out!r} is not in list')
+
+    # Replace player being subbed out with player being subbed in and sort the new lineup
+    lineup[positions[0]] = player_codes[player_in]
+    lineup.sort()
+
+
+# Get the teams and players on the court for every event of a game by replaying the substitutions once, starting
+# from the players on the court at the start of each period
+# A substitution event gets the lineup after the substitution. Each team's players are in the order of the players at
+# the start of the period until the team's first substitution, and sorted by their string IDs from then on.
+# Returns a dataframe with one row per event, in the same order as the play-by-play.
+def get_event_lineups(play_by_play, sub_map):
+    # Get the columns needed to replay the substitutions as plain lists
+    e_types = play_by_play['EVENTMSGTYPE'].tolist()
+    periods = play_by_play[period_column].tolist()
+    players_out = play_by_play[player1_id].tolist()
+    team_ids_out = play_by_play[player1_team_id].tolist()
+    players_in = play_by_play[player2_id].tolist()
+
+    # Get the lineups for each period as integer player codes
+    players, player_codes = get_player_codes(sub_map, e_types, players_in)
+    period_team_ids, period_lineups = get_period_lineups(sub_map, player_codes)
+
+    # Walk through every event once, keeping the lineups after each event
+    n_events = len(play_by_play)
+    lineups = np.empty((n_events, 2, 5), dtype=np.int32)
+    team_ids = np.empty((n_events, 2), dtype=np.int64)
+    for i in range(n_events):
+        period = periods[i]
+        if period not in period_lineups:
+            raise KeyError(period)
+
+        # If the event is a substitution, sub out the players on the court
+        if e_types[i] == EventType.Substitution.value:
+            substitute(team_ids_out[i], str(players_out[i]), str(players_in[i]), period_team_ids[period],
+                       period_lineups[period], player_codes)
+
+        lineups[i] = period_lineups[period]
+        team_ids[i] = period_team_ids[period]
+
+    # Convert the player codes back to player IDs
+    player_ids = np.array([int(player) for player in players], dtype=np.int64)
+    event_lineups = pd.DataFrame({'GAME_ID': play_by_play['GAME_ID'].to_numpy(),
+                                  'EVENTNUM': play_by_play['EVENTNUM'].to_numpy()})
+    for team in range(2):
+        event_lineups[team_id_columns[team]] = team_ids[:, team]
+        for player in range(5):
+            event_lineups[team_player_columns[team][player]] = player_ids[lineups[:, team, player]]
+
+    return event_lineups
+
+
+# Get the lineups for every event in a single game and save them
+def get_event_lineups_single_game(game_id, play_by_play_filename, players_at_period_filename, lineups_filename):
+    # Read in the play-by-play columns needed for substitutions
+    play_by_play = read_play_by_play(game_id, play_by_play_filename, columns=substitution_columns)
+
+    # Read the players at the start of each period for the game
+    sub_map = get_sub_map(pd.read_csv(players_at_period_filename.format(game_id)))
+
+    # Save the lineups for every event to a .csv file
+    get_event_lineups(play_by_play, sub_map).to_csv(lineups_filename.format(game_id), index=False)
+
+
+# Read the saved lineups for a game
+def read_event_lineups(game_id, lineups_filename):
+    return pd.read_csv(lineups_filename.format(game_id), dtype=np.int64)
+
+
+# Add the saved lineups for a game to its play-by-play as columns
+# The lineups must have one row for each event in the play-by-play, in the same order
+def add_event_lineups(play_by_play, event_lineups):
+    if (len(event_lineups) != len(play_by_play) or
+            not np.array_equal(event_lineups['EVENTNUM'].to_numpy(), play_by_play['EVENTNUM'].to_numpy())):
+        raise ValueError('Lineups do not match the events in the play-by-play')
+    for column in lineup_columns:
+        play_by_play[column] = event_lineups[column].to_numpy()
+
+
+# Get the lineups for every event for every game for every season
+def get_event_lineups_seasons(seasons, season_types, schedule_filename, play_by_play_filename,
+                              players_at_period_filename, lineups_filename, failed_filename,
+                              max_processes=default_max_processes):
+    # Keep track of failed games
+    failures = {}
+
+    # Loop over seasons and regular season/playoffs
+    for season in seasons:
+        for season_type in season_types:
+            # Read schedule
+            schedule = pd.read_csv(schedule_filename.format(season, season_type), dtype=str)
+
+            # Extract the game IDs from the schedule
+            game_ids = schedule['GAME_ID'].unique()
+            n_games = len(game_ids)
+
+            # Get the lineups for each game on a pool of processes
+            args = (play_by_play_filename, players_at_period_filename, lineups_filename)
+            results = run_games(get_event_lineups_single_game, game_ids, args, max_processes=max_processes)
+            for i, (game_id, _, failure) in enumerate(results):
+                print(f'{((i + 1) / n_games):.2%} {season} {season_type}: {game_id}')
+
+                # Keep track of failed games
+                if failure is not None:
+                    print(f'Error occurred: {failure[0]}')
+                    print(failure[1])
+                    failures[game_id] = failure
+
+    # Save failed games
+    with open(failed_filename, 'wb') as fp:
+        pickle.dump(failures, fp)
+
+
+if __name__ == '__main__':
+    seasons = range(1996, 2024)
+    seasons = [f'{season}-{((season % 100) + 1) % 100:02}' for season in seasons]
+    season_types = ['Regular Season', 'Playoffs']
+    schedule_filename = '../Data/Schedules/schedule_{}_{}.csv'
+    play_by_play_filename = '../Data/PlayByPlay/Standard/pbp_{}.csv'
+    players_at_period_filename = '../Data/PeriodStarters/pap_{}.csv'
+    lineups_filename = '../Data/Lineups/lineups_{}.csv'
+    get_event_lineups_seasons(seasons, season_types, schedule_filename, play_by_play_filename,
+                              players_at_period_filename, lineups_filename, 'Fails/failed_lineups.pkl')
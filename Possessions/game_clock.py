@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+# Constants for the length of periods in seconds
+regulation_periods = 4
+regulation_period_length = 12 * 60
+overtime_period_length = 5 * 60
+
+
+# Parse game clock strings (e.g. '11:42') into the seconds left in the period
+def get_seconds_left(clock):
+    clock = pd.Series(clock).astype(str).str.split(':', n=1, expand=True)
+    return (clock[0].astype(np.int64) * 60 + clock[1].astype(np.int64)).to_numpy()
+
+
+# Get the length of periods in seconds, 12 minutes for quarters and 5 minutes for overtime periods
+def get_period_length(periods):
+    return np.where(np.asarray(periods) > regulation_periods, overtime_period_length, regulation_period_length)
+
+
+# Get the time elapsed in a game before the start of periods in seconds
+def get_period_start_time(periods):
+    periods = np.asarray(periods)
+    return np.where(periods > regulation_periods,
+                    (regulation_periods * regulation_period_length +
+                     (periods - regulation_periods - 1) * overtime_period_length),
+                    (periods - 1) * regulation_period_length)
+
+
+# Get the time elapsed in the period in seconds from game clock strings and periods
+def get_time_elapsed_in_period(clock, periods):
+    return get_period_length(periods) - get_seconds_left(clock)
+
+
+# Get the time elapsed in the game in seconds from game clock strings and periods
+def get_time_elapsed_in_game(clock, periods):
+    return get_period_start_time(periods) + get_time_elapsed_in_period(clock, periods)
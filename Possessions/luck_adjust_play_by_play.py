@@ -1,51 +1,73 @@
 from Possessions.play_by_play_helpers import *
+from Possessions.play_by_play_store import *
+from parallel_helpers import *
+
+
+# Get a value for each player from a series of values indexed by player ID
+def get_player_values(player_ids, values):
+    missing = ~np.isin(player_ids, values.index)
+    if missing.any():
+        raise KeyError(f'Players not in stats: {np.unique(player_ids[missing]).tolist()}')
+    return values.reindex(player_ids).to_numpy(dtype=np.float64)
 
 
 # Luck-adjust a play-by-play for a single game
+# If the luck-adjusted play-by-play goes to a store, it is returned instead of saved so luck_adjust_play_by_plays can
+# write it into the season's store file
 def luck_adjust_play_by_play_single_game(game_id, stats, play_by_play_filename, luck_adjusted_play_by_play_filename):
     # Read in play-by-play data for the game
-    play_by_play = pd.read_csv(play_by_play_filename.format(game_id))
+    play_by_play = read_play_by_play(game_id, play_by_play_filename)
 
     # Fill NA descriptions with empty strings
     play_by_play[home_description] = play_by_play[home_description].fillna("")
     play_by_play[neutral_description] = play_by_play[home_description].fillna("")
     play_by_play[away_description] = play_by_play[away_description].fillna("")
 
-    # Add column for points for each EVENT initialized to 0
-    play_by_play['POINTS'] = 0.0
+    # Classify every event
+    classify_events(play_by_play)
 
-    # Add luck-adjusted points value for every event
+    # Get the average point value of a three and of a free throw for each player
     # TODO: Adjust percentages based on shot-bucket distances
-    for idx, event in play_by_play.iterrows():
-        # Get the event type
-        e_type = EventType.from_number(event[event_type])
-        player_id = event[player1_id]
-
-        # Adjust point values for threes
-        if (e_type == EventType.MadeShot or e_type == EventType.MissedShot) and is_three(event):
-            # Set points to average point value for a three from this player
-            player_stats = stats[stats['PLAYER_ID'] == player_id].iloc[0]
-            three_value = (player_stats['FG3M'] / player_stats['FG3A']) * 3
-            play_by_play.at[idx, 'POINTS'] = three_value
-
-        # Adjust point values for free throws
-        elif e_type == EventType.FreeThrow:
-            # Set points to average point value for a free throw from this player
-            player_stats = stats[stats['PLAYER_ID'] == player_id].iloc[0]
-            ft_value = player_stats['FTM'] / player_stats['FTA']
-            play_by_play.at[idx, 'POINTS'] = ft_value
-
-        # Add point values for twos
-        elif e_type == EventType.MadeShot and not is_three(event):
-            play_by_play.at[idx, 'POINTS'] = 2
-
-    # Save luck-adjusted play-by-play to csv
+    player_stats = stats.drop_duplicates(subset='PLAYER_ID').set_index('PLAYER_ID')
+    three_values = (player_stats['FG3M'] / player_stats['FG3A']) * 3
+    ft_values = player_stats['FTM'] / player_stats['FTA']
+
+    # Find the threes (made or missed), free throws, and made twos from the event classifications
+    e_types = play_by_play[event_type_code].to_numpy()
+    is_threes = play_by_play[is_three_column].to_numpy(dtype=bool)
+    threes = ((e_types == EventType.MadeShot.value) | (e_types == EventType.MissedShot.value)) & is_threes
+    free_throws = e_types == EventType.FreeThrow.value
+    made_twos = (e_types == EventType.MadeShot.value) & ~is_threes
+
+    # Add luck-adjusted points value for every event, 0 for events that are not shots
+    player_ids = play_by_play[player1_id].to_numpy()
+    points = np.zeros(len(play_by_play))
+    points[threes] = get_player_values(player_ids[threes], three_values)
+    points[free_throws] = get_player_values(player_ids[free_throws], ft_values)
+    points[made_twos] = 2
+    play_by_play['POINTS'] = points
+
+    # Save luck-adjusted play-by-play to csv without the event classifications
+    play_by_play = play_by_play.drop(columns=classification_columns)
+    if is_play_by_play_store(luck_adjusted_play_by_play_filename):
+        return play_by_play
     play_by_play.to_csv(luck_adjusted_play_by_play_filename.format(game_id), index=False)
 
 
+# Go through the results of luck-adjusting each game, yielding each luck-adjusted play-by-play that was returned
+# instead of saved and stopping at the first failed game
+def iter_luck_adjusted_games(results, n_games, season, season_type):
+    for i, (game_id, play_by_play, failure) in enumerate(results):
+        print(f'{((i + 1) / n_games):.2%} {season} {season_type}: {game_id}')
+        if failure is not None:
+            raise_failure(game_id, failure)
+        if play_by_play is not None:
+            yield play_by_play
+
+
 # Luck-adjust play-by-plays for every season
 def luck_adjust_play_by_plays(seasons, season_types, schedule_filename, stats_filename, play_by_play_filename,
-                              luck_adjusted_play_by_play_filename):
+                              luck_adjusted_play_by_play_filename, max_processes=default_max_processes):
     # Loop over seasons and regular season/playoffs
     for season in seasons:
         for season_type in season_types:
@@ -59,13 +81,18 @@ def luck_adjust_play_by_plays(seasons, season_types, schedule_filename, stats_fi
             # Read in player stats for the season
             stats = pd.read_csv(stats_filename.format(season, season_type))
 
-            # Get possessions for each game
-            for i, game_id in enumerate(game_ids):
-                print(f'{((i + 1) / n_games):.2%} {season} {season_type}: {game_id}')
-
-                # Luck-adjust play-by-play for this game
-                luck_adjust_play_by_play_single_game(game_id, stats, play_by_play_filename,
-                                                     luck_adjusted_play_by_play_filename)
+            # Luck-adjust play-by-play for each game on a pool of processes
+            args = (stats, play_by_play_filename, luck_adjusted_play_by_play_filename)
+            results = run_games(luck_adjust_play_by_play_single_game, game_ids, args, max_processes=max_processes)
+            luck_adjusted_games = iter_luck_adjusted_games(results, n_games, season, season_type)
+
+            # Write each game to the season's store file as soon as it is luck-adjusted, so the season is never held
+            # in memory at once
+            if is_play_by_play_store(luck_adjusted_play_by_play_filename):
+                write_store_season(luck_adjusted_games, season, season_type, luck_adjusted_play_by_play_filename)
+            else:
+                for _ in luck_adjusted_games:
+                    pass
 
 
 if __name__ == '__main__':
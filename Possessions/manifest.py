@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import time
+
+# Statuses for manifest entries
+status_ok = 'ok'
+status_failed = 'failed'
+
+
+# Compute the SHA-256 checksum of some bytes
+def compute_checksum(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# Compute the SHA-256 checksum of a file
+def compute_file_checksum(filename):
+    checksum = hashlib.sha256()
+    with open(filename, 'rb') as fp:
+        for block in iter(lambda: fp.read(1024 * 1024), b''):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+# Write bytes to a file atomically so that a crash never leaves a partial file behind
+def write_file_atomically(filename, data):
+    temporary_filename = f'{filename}.{os.getpid()}.tmp'
+    with open(temporary_filename, 'wb') as fp:
+        fp.write(data)
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(temporary_filename, filename)
+
+
+# Load a manifest as a dictionary mapping each key (e.g. game ID) to its most recent entry
+# The manifest is a journal with one JSON entry per line, so later entries for the same key replace earlier ones
+def load_manifest(manifest_filename):
+    manifest = {}
+    if not os.path.exists(manifest_filename):
+        return manifest
+
+    with open(manifest_filename, 'r') as fp:
+        for line in fp:
+            # Skip a partially written last line left behind by a crash
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            manifest[entry['KEY']] = entry
+
+    return manifest
+
+
+# Rewrite a manifest with only the most recent entry for each key
+def compact_manifest(manifest_filename):
+    manifest = load_manifest(manifest_filename)
+    if len(manifest) == 0:
+        return manifest
+
+    # Write the compacted manifest to a temporary file and swap it in atomically
+    lines = ''.join(json.dumps(entry) + '\n' for entry in manifest.values())
+    write_file_atomically(manifest_filename, lines.encode('utf-8'))
+
+    return manifest
+
+
+# Add an entry to a manifest
+# Each entry is a single appended line that is flushed to disk immediately, so completed work survives a crash
+def record_manifest_entry(manifest_filename, key, status, n_bytes=None, checksum=None, error=None):
+    entry = {
+        'KEY': key,
+        'STATUS': status,
+        'BYTES': n_bytes,
+        'CHECKSUM': checksum,
+        'FETCHED_AT': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'ERROR': error,
+    }
+    with open(manifest_filename, 'a') as fp:
+        fp.write(json.dumps(entry) + '\n')
+        fp.flush()
+        os.fsync(fp.fileno())
+    return entry
+
+
+# Check if the work for a manifest entry is complete and its output file is still intact
+def is_complete(entry, filename, verify_checksum=False):
+    # Ensure the work succeeded
+    if entry is None or entry['STATUS'] != status_ok:
+        return False
+
+    # Ensure the output file still exists with the recorded size
+    if not os.path.exists(filename) or os.path.getsize(filename) != entry['BYTES']:
+        return False
+
+    # Optionally ensure the output file has not been modified
+    return not verify_checksum or compute_file_checksum(filename) == entry['CHECKSUM']
@@ -1,8 +1,10 @@
-import math
 from enum import Enum
 
+import numpy as np
 import pandas as pd
 
+from Possessions.game_clock import *
+
 
 # Enumeration for type of play-by-play event
 class EventType(Enum):
@@ -24,10 +26,7 @@ class EventType(Enum):
 
     @classmethod
     def from_number(cls, number):
-        for member in cls:
-            if member.value == number:
-                return member
-        return cls.Unimportant
+        return cls._value2member_map_.get(number, cls.Unimportant)
 
 
 # Enumeration for type of foul
@@ -60,10 +59,7 @@ class FoulType(Enum):
 
     @classmethod
     def from_number(cls, number):
-        for member in cls:
-            if member.value == number:
-                return member
-        return cls.Unimportant
+        return cls._value2member_map_.get(number, cls.Unimportant)
 
 
 # Enumeration for type of rebound
@@ -74,10 +70,7 @@ class ReboundType(Enum):
 
     @classmethod
     def from_number(cls, number):
-        for member in cls:
-            if member.value == number:
-                return member
-        return cls.Unimportant
+        return cls._value2member_map_.get(number, cls.Unimportant)
 
 
 # Enumeration for free throw types
@@ -99,10 +92,7 @@ class FreeThrowType(Enum):
 
     @classmethod
     def from_number(cls, number):
-        for member in cls:
-            if member.value == number:
-                return member
-        return cls.Unimportant
+        return cls._value2member_map_.get(number, cls.Unimportant)
 
 
 # Enumeration for type turnover
@@ -115,10 +105,7 @@ class TurnoverType(Enum):
 
     @classmethod
     def from_number(cls, number):
-        for member in cls:
-            if member.value == number:
-                return member
-        return cls.Unimportant
+        return cls._value2member_map_.get(number, cls.Unimportant)
 
 
 # Constants for column names
@@ -135,277 +122,178 @@ player1_id = 'PLAYER1_ID'
 player1_team_id = 'PLAYER1_TEAM_ID'
 player2_id = 'PLAYER2_ID'
 
+# Constants for the event classification columns added by classify_events
+event_type_code = 'EVENT_TYPE'
+foul_type_code = 'FOUL_TYPE'
+free_throw_type_code = 'FREE_THROW_TYPE'
+is_three_column = 'IS_THREE'
+is_miss_column = 'IS_MISS'
+is_team_event_column = 'IS_TEAM_EVENT'
+is_team_rebound_column = 'IS_TEAM_REBOUND'
+is_team_turnover_column = 'IS_TEAM_TURNOVER'
+classification_columns = [event_type_code, foul_type_code, free_throw_type_code, is_three_column, is_miss_column,
+                          is_team_event_column, is_team_rebound_column, is_team_turnover_column]
+
+# Constants for the look-back and look-ahead columns added by index_events
+missed_shot_index = 'MISSED_SHOT_INDEX'
+foul_index = 'FOUL_INDEX'
+is_and_1_column = 'IS_AND_1'
+
+
+# Build a lookup table mapping every number to the value of an enumeration, or -1 if it is not in the enumeration
+def get_lookup_table(enum):
+    values = [member.value for member in enum if member.value >= 0]
+    table = np.full(max(values) + 1, -1, dtype=np.int64)
+    table[values] = values
+    return table
+
+
+# Lookup tables for each enumeration
+event_type_table = get_lookup_table(EventType)
+foul_type_table = get_lookup_table(FoulType)
+rebound_type_table = get_lookup_table(ReboundType)
+free_throw_type_table = get_lookup_table(FreeThrowType)
+turnover_type_table = get_lookup_table(TurnoverType)
+
+
+# Map a column of numbers to enumeration values with a lookup table, using -1 for unknown or missing numbers
+def lookup_codes(numbers, table):
+    numbers = pd.to_numeric(numbers, errors='coerce').to_numpy(dtype=np.float64)
+    valid = np.isfinite(numbers) & (numbers >= 0) & (numbers < len(table)) & (numbers == np.floor(numbers))
+    codes = np.full(len(numbers), -1, dtype=np.int64)
+    codes[valid] = table[numbers[valid].astype(np.int64)]
+    return codes
+
+
+# Check which descriptions of a column contain some text
+def descriptions_contain(descriptions, text, lower=False):
+    descriptions = descriptions.fillna('').astype(str)
+    if lower:
+        descriptions = descriptions.str.lower()
+    return descriptions.str.contains(text, regex=False).to_numpy()
+
+
+# Classify every event in a play-by-play once with array operations
+# Adds integer-coded columns for the event type, foul type and free throw type along with flags for threes, misses,
+# team events, team rebounds and team turnovers, so the possession logic never has to re-derive them event by event.
+# Subtypes are coded against each enumeration for every event, so they should only be read for events of that type.
+def classify_events(play_by_play):
+    # Get the integer codes for the event type and subtypes
+    event_types = lookup_codes(play_by_play[event_type], event_type_table)
+    play_by_play[event_type_code] = event_types
+    play_by_play[foul_type_code] = lookup_codes(play_by_play[event_subtype], foul_type_table)
+    play_by_play[free_throw_type_code] = lookup_codes(play_by_play[event_subtype], free_throw_type_table)
+    rebound_types = lookup_codes(play_by_play[event_subtype], rebound_type_table)
+    turnover_types = lookup_codes(play_by_play[event_subtype], turnover_type_table)
+
+    # Check the home and away descriptions for threes and misses
+    play_by_play[is_three_column] = (descriptions_contain(play_by_play[home_description], '3PT') |
+                                     descriptions_contain(play_by_play[away_description], '3PT'))
+    play_by_play[is_miss_column] = (descriptions_contain(play_by_play[home_description], 'miss', lower=True) |
+                                    descriptions_contain(play_by_play[away_description], 'miss', lower=True))
+
+    # If no player is listed, the event is a team event
+    team_events = play_by_play[player1_team_id].isna().to_numpy()
+    play_by_play[is_team_event_column] = team_events
+
+    # Find team rebounds
+    play_by_play[is_team_rebound_column] = ((event_types == EventType.Rebound.value) &
+                                            ((rebound_types == ReboundType.Team.value) | team_events))
+
+    # Find team turnovers, assuming turnovers without a player listed are team turnovers
+    play_by_play[is_team_turnover_column] = ((event_types == EventType.Turnover.value) &
+                                             (team_events | (turnover_types != TurnoverType.Unimportant.value)))
+
+    return play_by_play
+
+
+# Get the position of the most recent earlier event matching a condition for every event, or -1 if there is none
+def find_previous(matches):
+    positions = np.where(matches, np.arange(len(matches)), -1)
+    previous = np.full(len(matches), -1, dtype=np.int64)
+    previous[1:] = np.maximum.accumulate(positions)[:-1]
+    return previous
+
+
+# Get the next event matching a condition that involves the player of each event
+# Returns, for every event, the position of the nearest later matching event for that event's player 1, and for every
+# matching event, the position of the next matching event for the same player, or -1 if there is none
+def find_next_for_player(matches, match_players, players):
+    next_for_player = np.full(len(matches), -1, dtype=np.int64)
+    next_for_same_player = np.full(len(matches), -1, dtype=np.int64)
+    latest = {}
+    for i in range(len(matches) - 1, -1, -1):
+        next_for_player[i] = latest.get(players[i], -1)
+        if matches[i]:
+            next_for_same_player[i] = latest.get(match_players[i], -1)
+            latest[match_players[i]] = i
+    return next_for_player, next_for_same_player
+
+
+# Check if there is a matching event within the event and time windows by following the chain of matching events
+def has_match_in_window(i, first_match, next_for_same_player, times, event_window, time_window):
+    j = first_match
+    while 0 <= j <= i + event_window:
+        if times[i] <= times[j] <= times[i] + time_window:
+            return True
+        j = next_for_same_player[j]
+    return False
+
+
+# Index every event of a classified play-by-play with time elapsed columns in one forward and one backward sweep
+# Adds the position of the missed shot before each rebound (or the furthest back event in the window if there is none)
+# and the foul before each free throw (or the event before it if there is none), along with whether each made shot is
+# an And-1, so that finding the end of a possession never has to search through a window of events
+def index_events(play_by_play, event_window=20, time_window=10):
+    positions = np.arange(len(play_by_play))
+    event_types = play_by_play[event_type_code].to_numpy()
+    foul_types = play_by_play[foul_type_code].to_numpy()
+
+    # Find the most recent miss in the window, falling back to the furthest back event
+    previous_miss = find_previous(play_by_play[is_miss_column].to_numpy(dtype=bool))
+    play_by_play[missed_shot_index] = np.where((previous_miss >= 0) & (previous_miss >= positions - event_window),
+                                               previous_miss, np.maximum(positions - event_window, 0))
+
+    # Find the most recent foul in the window, falling back to the most recent event
+    previous_foul = find_previous(event_types == EventType.Foul.value)
+    play_by_play[foul_index] = np.where((previous_foul >= 0) & (previous_foul >= positions - event_window),
+                                        previous_foul, np.maximum(positions - 1, 0))
+
+    # Find the next foul drawn by and the next 1-of-1 free throw shot by the player on every event
+    players = play_by_play[player1_id].tolist()
+    fouls = ((event_types == EventType.Foul.value) & (foul_types != FoulType.Technical.value) &
+             (foul_types != FoulType.LooseBall.value) & (foul_types != FoulType.Inbound.value))
+    next_foul, next_foul_for_same_player = find_next_for_player(fouls, play_by_play[player2_id].tolist(), players)
+    free_throws = ((event_types == EventType.FreeThrow.value) &
+                   (play_by_play[free_throw_type_code].to_numpy() == FreeThrowType.OneOfOne.value))
+    next_ft, next_ft_for_same_player = find_next_for_player(free_throws, players, players)
+
+    # A made shot is an And-1 if the shooter draws a foul and shoots a 1-of-1 free throw within the windows
+    times = play_by_play[time_elapsed].tolist()
+    and_1s = np.zeros(len(play_by_play), dtype=bool)
+    for i in np.flatnonzero(event_types == EventType.MadeShot.value):
+        and_1s[i] = (has_match_in_window(i, next_foul[i], next_foul_for_same_player, times, event_window,
+                                         time_window) and
+                     has_match_in_window(i, next_ft[i], next_ft_for_same_player, times, event_window, time_window))
+    play_by_play[is_and_1_column] = and_1s
+
+    return play_by_play
+
 
 # Check if a free throw (or any event) is a miss
 def is_miss(event):
-    miss = False
-    if event[home_description]:
-        miss = miss or 'miss' in event[home_description].lower()
-    if event[away_description]:
-        miss = miss or 'miss' in event[away_description].lower()
-    return miss
-
-
-# Check if an event is a team rebound
-def is_team_rebound(event):
-    # Ensure the event is a rebound
-    if EventType.from_number(event[event_type]) != EventType.Rebound:
-        return False
-
-    # Check if rebound is a team rebound
-    return ReboundType.from_number(event[event_subtype]) == ReboundType.Team or math.isnan(event[player1_team_id])
-
-
-# Check if an event is a defensive rebound
-def is_defensive_rebound(idx, event, events, window=10):
-    # Ensure event is a rebound
-    if EventType.from_number(event[event_type]) != EventType.Rebound:
-        return False
-
-    # Get the missed shot leading to rebound
-    shot = extract_missed_shot_for_rebound(idx, events, window=window)
-
-    # Check if the team that missed the shot rebounded it
-    if is_team_rebound(event):
-        return shot[player1_team_id] != event[player1_id]
-    else:
-        return shot[player1_team_id] != event[player1_team_id]
-
-
-# Get the missed shot before a rebound
-def extract_missed_shot_for_rebound(idx, events, window=10):
-    # Look at the previous events in the window
-    window_of_events = events[max(0, idx - window): idx]
-
-    # Look at the most recent events first
-    window_of_events.reverse()
-
-    # Check every event to see if it is a miss
-    for event in window_of_events:
-        # Return event if it is a miss
-        if is_miss(event[1]) or is_missed_free_throw(event[1]):
-            return event[1]
-
-    # Return furthest back event if no miss was found
-    return window_of_events[-1][1]
-
-
-# Check if event is a missed free throw
-def is_missed_free_throw(event):
-    # Ensure event is a free throw
-    if EventType.from_number(event[event_type]) != EventType.FreeThrow:
-        return False
-
-    # Check if free throw was missed
-    return is_miss(event)
-
-
-# Check if event is a made final free throw
-def is_last_free_throw_made(idx, event, events, window=20):
-    # Check event is a free throw
-    if EventType.from_number(event[event_type]) != EventType.FreeThrow:
-        return False
-
-    # Make sure the free throw was made
-    if is_miss(event):
-        return False
-
-    # Get the foul before the free throw
-    foul = extract_foul_for_last_free_throw(idx, events, window=window)
-
-    # Get the type of free throw and foul
-    ft_type = FreeThrowType.from_number(event[event_subtype])
-    foul_type = FoulType.from_number(foul[event_subtype])
-
-    # Check if the free throw was the last of multiple
-    if ft_type.is_final_multi_ft():
-        return True
-
-    # Check to see if possession changes after free throw
-    return (ft_type == FreeThrowType.OneOfOne and
-            foul_type != FoulType.AwayFromPlay and
-            foul_type != FoulType.LooseBall and
-            foul_type != FoulType.Inbound)
-
-
-# Get the foul that led to free throws
-def extract_foul_for_last_free_throw(idx, events, window=20):
-    # Look at the previous events in the window
-    subset_of_events = events[max(0, idx - window): idx]
-
-    # Look at most recent events first
-    subset_of_events.reverse()
-
-    # Check each event to see if it was a foul
-    for event in subset_of_events:
-        # Return event if it was a foul
-        if EventType.from_number(event[1][event_type]) == EventType.Foul:
-            return event[1]
-
-    # Return furthest back event if no foul was found
-    return subset_of_events[0][1]
-
-
-# Check if an event is an And-1
-def is_and_1(idx, event, events, event_window=20, time_window=10):
-    # Ensure event is a made shot
-    if EventType.from_number(event[event_type]) != EventType.MadeShot:
-        return False
-
-    # Look at future events in the window
-    subset_of_events = events[idx + 1: min(idx + event_window + 1, len(events))]
-
-    # Check for a foul and then a 1 of 1 free throw
-    foul = False
-    ft = False
-    for sub_ind, e in subset_of_events:
-        # Make sure event occurred within time window
-        if not event[time_elapsed] <= e[time_elapsed] <= event[time_elapsed] + time_window:
-            continue
-
-        # Get the event type
-        e_type = EventType.from_number(e[event_type])
-
-        # Check if event is a foul
-        if e_type == EventType.Foul:
-            # Get type of foul
-            foul_type = FoulType.from_number(e[event_subtype])
-
-            # Check if the foul is not a special foul and the shooter received it
-            if (foul_type != FoulType.Technical and foul_type != FoulType.LooseBall and
-                    foul_type != FoulType.Inbound and e[player2_id] == event[player1_id]):
-                foul = True
-
-        # Check if event is a free throw
-        elif e_type == EventType.FreeThrow:
-            # Get type of free throw
-            ft_type = FreeThrowType.from_number(e[event_subtype])
-
-            # Check if the free throw was a 1-of-1 and the shooter shot it
-            if ft_type == FreeThrowType.OneOfOne and e[player1_id] == event[player1_id]:
-                ft = True
-
-    return foul and ft
-
-
-# Check if an event is a made shot but not an And-1
-def is_make_and_not_and_1(idx, event, events, event_window=20, time_window=10):
-    # Ensure event is a made shot
-    if EventType.from_number(event[event_type]) != EventType.MadeShot:
-        return False
-
-    # Ensure there was not an And-1
-    return not is_and_1(idx, event, events, event_window=event_window, time_window=time_window)
+    return event[is_miss_column]
 
 
 # Check if an event is a three pointer
 def is_three(event):
-    three = False
-    if event[home_description]:
-        three = three or '3PT' in event[home_description]
-    if event[away_description]:
-        three = three or '3PT' in event[away_description]
-    return three
-
-
-# Check if an event is a team turnover
-def is_team_turnover(event):
-    # Ensure event is a turnover
-    if EventType.from_number(event[event_type]) != EventType.Turnover:
-        return False
-
-    # If no player is listed, assume it is a team turnover
-    if no_player_listed(event):
-        return True
-
-    # Get type of turnover
-    to_type = TurnoverType.from_number(event[event_subtype])
-
-    # Check if event is team turnover
-    return (to_type == TurnoverType.FiveSecond or to_type == TurnoverType.EightSecond or
-            to_type == TurnoverType.ShotClock or to_type == TurnoverType.TooManyPlayers)
-
-
-# Check if no player is listed for an event
-def no_player_listed(event):
-    return math.isnan(event[player1_team_id])
-
-
-# Check if an event is the end of a possession
-def is_end_of_possession(idx, event, events, event_window=20, time_window=10):
-    e_type = EventType.from_number(event[event_type])
-    return (e_type == EventType.Turnover or is_last_free_throw_made(idx, event, events, window=event_window) or
-            is_defensive_rebound(idx, event, events, window=event_window) or
-            is_make_and_not_and_1(idx, event, events, event_window=event_window, time_window=time_window) or
-            e_type == EventType.EndOfPeriod)
-
-
-# We need to know how many points each shot is worth:
-def extract_points(event, use_points_column=True):
-    # If there is a points column, return its value
-    if use_points_column and 'POINTS' in event.index:
-        return event['POINTS']
-
-    # Get the event type
-    e_type = EventType.from_number(event[event_type])
-
-    # 1 point if made free throw
-    if e_type == EventType.FreeThrow and not is_miss(event):
-        return 1
-
-    # 3 points if made three pointer
-    elif e_type == EventType.MadeShot and is_three(event):
-        return 3
-
-    # 2 points if made two pointer
-    elif e_type == EventType.MadeShot and not is_three(event):
-        return 2
-
-    # 0 points for any other event
-    else:
-        return 0
-
-
-# Find the time elapsed in a period at a given event
-def get_time_elapsed_period(event):
-    # Get the time on the clock and the period of the event
-    time_str = event[game_clock]
-    period = event[period_column]
-
-    # Maximum minutes in a period is 12 unless overtime
-    max_minutes = 12 if period < 5 else 5
-
-    # Get minutes and seconds from time string
-    [minutes, sec] = time_str.split(':')
-
-    # Convert minutes and seconds to integers
-    minutes = int(minutes)
-    sec = int(sec)
-
-    # Calculate minutes and seconds elapsed in period
-    min_elapsed = max_minutes - minutes - 1
-    sec_elapsed = 60 - sec
-
-    # Return time elapsed in period in seconds
-    return (min_elapsed * 60) + sec_elapsed
-
-
-# Find time elapsed in a game at a given event
-def get_time_elapsed_game(event):
-    # Find time elapsed in current period of game
-    time_in_period = get_time_elapsed_period(event)
-    period = event[period_column]
+    return event[is_three_column]
 
-    # Calculate total time elapsed up to the start of the current period
-    if period > 4:
-        return (12 * 60 * 4) + ((period - 5) * 5 * 60) + time_in_period
-    else:
-        return ((period - 1) * 12 * 60) + time_in_period
 
+# Add columns for the time elapsed in the game and in the period at every event
+def add_time_elapsed(play_by_play):
+    play_by_play[time_elapsed_period] = get_time_elapsed_in_period(play_by_play[game_clock],
+                                                                   play_by_play[period_column])
+    play_by_play[time_elapsed] = get_period_start_time(play_by_play[period_column]) + play_by_play[time_elapsed_period]
+    return play_by_play
 
-if __name__ == '__main__':
-    test_pbp = pd.read_csv('../../NBA Tutorials/play_by_play_parser/data/0021801167_pbp.csv')
-    test_pbp[time_elapsed] = test_pbp.apply(get_time_elapsed_game, axis=1)
-    test_pbp[time_elapsed_period] = test_pbp.apply(get_time_elapsed_period, axis=1)
-    events = list(test_pbp.iterrows())
-    print(is_and_1(83, events[83][1], events))
@@ -0,0 +1,219 @@
+import functools
+import itertools
+import os
+import pickle
+import traceback
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from season_helpers import season_from_game_id, season_type_from_game_id
+
+# Schema for the play-by-play columns from stats.nba.com
+# Player IDs are never missing (0 means no player), but team IDs are missing for team events
+play_by_play_schema = pa.schema([
+    ('GAME_ID', pa.int64()),
+    ('EVENTNUM', pa.int64()),
+    ('EVENTMSGTYPE', pa.int64()),
+    ('EVENTMSGACTIONTYPE', pa.int64()),
+    ('PERIOD', pa.int64()),
+    ('WCTIMESTRING', pa.string()),
+    ('PCTIMESTRING', pa.string()),
+    ('HOMEDESCRIPTION', pa.string()),
+    ('NEUTRALDESCRIPTION', pa.string()),
+    ('VISITORDESCRIPTION', pa.string()),
+    ('SCORE', pa.string()),
+    ('SCOREMARGIN', pa.string()),
+    ('PERSON1TYPE', pa.float64()),
+    ('PLAYER1_ID', pa.int64()),
+    ('PLAYER1_NAME', pa.string()),
+    ('PLAYER1_TEAM_ID', pa.float64()),
+    ('PLAYER1_TEAM_CITY', pa.string()),
+    ('PLAYER1_TEAM_NICKNAME', pa.string()),
+    ('PLAYER1_TEAM_ABBREVIATION', pa.string()),
+    ('PERSON2TYPE', pa.float64()),
+    ('PLAYER2_ID', pa.int64()),
+    ('PLAYER2_NAME', pa.string()),
+    ('PLAYER2_TEAM_ID', pa.float64()),
+    ('PLAYER2_TEAM_CITY', pa.string()),
+    ('PLAYER2_TEAM_NICKNAME', pa.string()),
+    ('PLAYER2_TEAM_ABBREVIATION', pa.string()),
+    ('PERSON3TYPE', pa.float64()),
+    ('PLAYER3_ID', pa.int64()),
+    ('PLAYER3_NAME', pa.string()),
+    ('PLAYER3_TEAM_ID', pa.float64()),
+    ('PLAYER3_TEAM_CITY', pa.string()),
+    ('PLAYER3_TEAM_NICKNAME', pa.string()),
+    ('PLAYER3_TEAM_ABBREVIATION', pa.string()),
+    ('VIDEO_AVAILABLE_FLAG', pa.int64()),
+])
+
+# Extra column for luck-adjusted play-by-play
+points_field = pa.field('POINTS', pa.float64())
+
+# Read string columns as strings from csv files instead of letting pandas guess their types
+csv_dtypes = {field.name: str for field in play_by_play_schema if pa.types.is_string(field.type)}
+
+
+# Check if a play-by-play location is a store directory rather than a filename template for one csv per game
+# Filename templates have a {} where the game ID goes, e.g. '../Data/PlayByPlay/Standard/pbp_{}.csv'
+def is_play_by_play_store(play_by_play_filename):
+    return '{' not in play_by_play_filename
+
+
+# Get the filename holding the play-by-play for a season and season type in a store
+def get_store_filename(store_directory, season, season_type):
+    return os.path.join(store_directory, season, f'{season_type}.parquet')
+
+
+# Open a store file and map each game ID to the row group holding its play-by-play
+# The file's modification time is part of the cache key so that rewritten files are opened again
+@functools.lru_cache(maxsize=8)
+def open_store_file(filename, modified_time):
+    parquet_file = pq.ParquetFile(filename)
+    game_id_column = parquet_file.schema_arrow.get_field_index('GAME_ID')
+    row_groups = {}
+    for i in range(parquet_file.metadata.num_row_groups):
+        row_groups[parquet_file.metadata.row_group(i).column(game_id_column).statistics.min] = i
+    return parquet_file, row_groups
+
+
+# Read the play-by-play for a single game from a store
+def read_store_game(game_id, store_directory, columns=None):
+    filename = get_store_filename(store_directory, season_from_game_id(game_id), season_type_from_game_id(game_id))
+    parquet_file, row_groups = open_store_file(filename, os.path.getmtime(filename))
+    if int(game_id) not in row_groups:
+        raise KeyError(f'Game {game_id} is not in {filename}')
+    return parquet_file.read_row_group(row_groups[int(game_id)], columns=columns).to_pandas()
+
+
+# Read the play-by-play for every game in a season from a store
+def read_store_season(season, season_type, store_directory, columns=None):
+    return pq.read_table(get_store_filename(store_directory, season, season_type), columns=columns).to_pandas()
+
+
+# Read the play-by-play for a single game, either from one csv per game or from a store
+# String columns are read as strings from csv files, so the columns have the same types as in the store no matter what
+# a game's values look like (e.g. a SCOREMARGIN column that happens to be all numbers)
+def read_play_by_play(game_id, play_by_play_filename, columns=None):
+    if is_play_by_play_store(play_by_play_filename):
+        return read_store_game(game_id, play_by_play_filename, columns=columns)
+    return pd.read_csv(play_by_play_filename.format(game_id), index_col=False, usecols=columns, dtype=csv_dtypes)
+
+
+# Convert the play-by-play for a game to a table with the store schema
+def to_store_table(play_by_play):
+    schema = play_by_play_schema
+    if points_field.name in play_by_play.columns:
+        schema = schema.append(points_field)
+
+    columns = []
+    for field in schema:
+        values = play_by_play[field.name]
+        if pa.types.is_integer(field.type):
+            values = values.fillna(0).astype(np.int64)
+        elif pa.types.is_floating(field.type):
+            values = values.astype(np.float64)
+        else:
+            values = values.where(values.isna(), values.astype(str)).astype(object)
+            values = values.where(values.notna(), None)
+        columns.append(pa.array(values, type=field.type, from_pandas=True))
+
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+# Write the play-by-play for every game in a season to a store, with one row group per game
+# The games can be any iterable of play-by-play dataframes, so a season never has to be held in memory at once
+def write_store_season(games, season, season_type, store_directory):
+    filename = get_store_filename(store_directory, season, season_type)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    # Write to a temporary file first so readers never see a partial season
+    # The temporary file is removed if anything fails before it replaces the season's file
+    temporary_filename = f'{filename}.{os.getpid()}.tmp'
+    writer = None
+    try:
+        for play_by_play in games:
+            if len(play_by_play) == 0:
+                continue
+            table = to_store_table(play_by_play)
+            if writer is None:
+                writer = pq.ParquetWriter(temporary_filename, table.schema, compression='zstd')
+            writer.write_table(table, row_group_size=len(table))
+        if writer is not None:
+            writer.close()
+            os.replace(temporary_filename, filename)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(temporary_filename):
+            os.remove(temporary_filename)
+
+
+# Add the play-by-play for new games to a season in a store, replacing any games that are already there
+def append_store_games(games, season, season_type, store_directory):
+    games = list(games)
+    new_game_ids = {int(play_by_play['GAME_ID'].iloc[0]) for play_by_play in games if len(play_by_play) > 0}
+
+    # Keep the saved games that are not being replaced, one row group at a time
+    saved_games = []
+    filename = get_store_filename(store_directory, season, season_type)
+    if os.path.exists(filename):
+        parquet_file, row_groups = open_store_file(filename, os.path.getmtime(filename))
+        saved_games = (parquet_file.read_row_group(row_group).to_pandas()
+                       for game_id, row_group in row_groups.items() if game_id not in new_game_ids)
+
+    write_store_season(itertools.chain(saved_games, games), season, season_type, store_directory)
+
+
+# Read the play-by-play for a single game from a csv file with the store's string columns, ready to be stored
+def read_play_by_play_csv(game_id, play_by_play_filename):
+    return pd.read_csv(play_by_play_filename.format(game_id), index_col=False, dtype=csv_dtypes)
+
+
+# Read the play-by-play for every game in a season from one csv per game, keeping track of failed games
+def iter_csv_games(game_ids, play_by_play_filename, failures):
+    for game_id in game_ids:
+        try:
+            yield read_play_by_play_csv(game_id, play_by_play_filename)
+        except Exception as error:
+            print(f'Error occurred: {error}')
+            traceback.print_exc()
+            failures[game_id] = str(error), traceback.format_exc()
+
+
+# Convert play-by-play from one csv per game to a store with one file per season and season type
+def convert_play_by_play_to_store(seasons, season_types, schedule_filename, play_by_play_filename, store_directory,
+                                  failed_filename):
+    # Keep track of failed games
+    failures = {}
+
+    # Loop over seasons and regular season/playoffs
+    for season in seasons:
+        for season_type in season_types:
+            print(f'{season} {season_type}')
+
+            # Read schedule
+            schedule = pd.read_csv(schedule_filename.format(season, season_type), dtype=str)
+
+            # Write the play-by-play for every game in the schedule
+            game_ids = schedule['GAME_ID'].unique()
+            write_store_season(iter_csv_games(game_ids, play_by_play_filename, failures), season, season_type,
+                               store_directory)
+
+    # Save failed games
+    with open(failed_filename, 'wb') as fp:
+        pickle.dump(failures, fp)
+
+
+if __name__ == '__main__':
+    seasons = range(1996, 2024)
+    seasons = [f'{season}-{((season % 100) + 1) % 100:02}' for season in seasons]
+    season_types = ['Regular Season', 'Playoffs']
+    schedule_filename = '../Data/Schedules/schedule_{}_{}.csv'
+    convert_play_by_play_to_store(seasons, season_types, schedule_filename, '../Data/PlayByPlay/Standard/pbp_{}.csv',
+                                  '../Data/PlayByPlay/Standard/Store', 'Fails/failed_store_standard.pkl')
+    convert_play_by_play_to_store(seasons, season_types, schedule_filename, '../Data/PlayByPlay/LuckAdjusted/pbp_{}.csv',
+                                  '../Data/PlayByPlay/LuckAdjusted/Store', 'Fails/failed_store_luck_adjusted.pkl')
@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Constants for the registry columns
+player_index = 'PLAYER_INDEX'
+player_id = 'PLAYER_ID'
+player_name = 'PLAYER_NAME'
+registry_columns = [player_index, player_id, player_name]
+
+
+# Load the player registry, which gives every player ID a dense integer index that never changes once assigned
+# Row i of the registry is the player with index i
+def load_player_registry(registry_filename):
+    if not os.path.exists(registry_filename):
+        return pd.DataFrame({player_index: pd.Series(dtype=np.int32), player_id: pd.Series(dtype=np.int64),
+                             player_name: pd.Series(dtype=object)})
+    registry = pd.read_csv(registry_filename, dtype={player_index: np.int32, player_id: np.int64,
+                                                     player_name: object}, keep_default_na=False)
+    return registry.sort_values(by=player_index).reset_index(drop=True)
+
+
+# Save the player registry
+def save_player_registry(registry, registry_filename):
+    registry.to_csv(registry_filename, index=False)
+
+
+# Add any new players to the registry, giving them the next indices in order of their IDs
+# Players already in the registry keep their index, and get a name if they did not have one
+def add_players_to_registry(registry, players):
+    players = players[[player_id, player_name]].copy()
+    players[player_id] = players[player_id].astype(np.int64)
+    players[player_name] = players[player_name].fillna('').astype(str)
+
+    # Use the first name found for each player, preferring names that are not empty
+    players = players.iloc[np.lexsort((players[player_name] == '', players[player_id]))]
+    players = players.drop_duplicates(subset=player_id)
+
+    # Fill in missing names for players already in the registry
+    registry = registry.copy()
+    names = dict(zip(players[player_id], players[player_name]))
+    missing_names = registry[player_name] == ''
+    registry.loc[missing_names, player_name] = registry.loc[missing_names, player_id].map(names).fillna('')
+
+    # Append the new players
+    new_players = players[~players[player_id].isin(registry[player_id])].copy()
+    new_players.insert(0, player_index, np.arange(len(registry), len(registry) + len(new_players), dtype=np.int32))
+    if len(new_players) == 0:
+        return registry
+    return pd.concat([registry, new_players], ignore_index=True)
+
+
+# Add every player in the players and IDs file to the registry
+def update_player_registry(players_and_ids_filename, registry_filename):
+    registry = load_player_registry(registry_filename)
+    registry = add_players_to_registry(registry, pd.read_csv(players_and_ids_filename))
+    save_player_registry(registry, registry_filename)
+    return registry
+
+
+# Map player IDs to their indices in the registry all at once
+# IDs can be integers or strings of integers, and any ID not in the registry raises a KeyError
+def ids_to_indices(registry, ids):
+    ids = np.asarray(ids).astype(np.int64)
+    registry_ids = registry[player_id].to_numpy()
+    order = np.argsort(registry_ids)
+    positions = np.minimum(np.searchsorted(registry_ids, ids, sorter=order), max(len(registry_ids) - 1, 0))
+    if len(registry_ids) == 0:
+        found = np.zeros(ids.shape, dtype=bool)
+    else:
+        found = registry_ids[order[positions]] == ids
+    if not np.all(found):
+        raise KeyError(f'Players not in registry: {np.unique(ids[~found]).tolist()}')
+    return registry[player_index].to_numpy()[order[positions]]
+
+
+# Map registry indices to player IDs
+def indices_to_ids(registry, indices):
+    return registry[player_id].to_numpy()[np.asarray(indices)]
+
+
+# Map registry indices to player names
+def indices_to_names(registry, indices):
+    return registry[player_name].to_numpy()[np.asarray(indices)]
+
+
+if __name__ == '__main__':
+    update_player_registry('../Data/players_and_ids.csv', '../Data/player_registry.csv')
@@ -1,10 +1,16 @@
+import os
+
 import pandas as pd
 
+from Possessions.play_by_play_store import read_play_by_play
+from Possessions.player_registry import update_player_registry
+from parallel_helpers import *
+
 
 # Get the unique player names and IDs from a single game
 def get_players_and_ids_single_game(game_id, play_by_play_filename):
     # Get the play-by-play data
-    play_by_play = pd.read_csv(play_by_play_filename.format(game_id))
+    play_by_play = read_play_by_play(game_id, play_by_play_filename)
 
     # Replace NA values with empty strings
     play_by_play = play_by_play.fillna('')
@@ -52,7 +58,7 @@ def get_players_and_ids_single_game(game_id, play_by_play_filename):
 
 # Get the unique player names and IDs from multiple seasons
 def get_players_and_ids_seasons(seasons, season_types, schedule_filename, play_by_play_filename,
-                                players_and_ids_filename):
+                                players_and_ids_filename, max_processes=default_max_processes):
     # Keep track of all the players and IDs
     all_players = []
 
@@ -66,12 +72,13 @@ def get_players_and_ids_seasons(seasons, season_types, schedule_filename, play_b
             game_ids = schedule['GAME_ID'].unique()
             n_games = len(game_ids)
 
-            # Find players on the court at the start of each period for each game
-            for i, game_id in enumerate(game_ids):
+            # Get the players and IDs for each game on a pool of processes
+            results = run_games(get_players_and_ids_single_game, game_ids, (play_by_play_filename,),
+                                max_processes=max_processes)
+            for i, (game_id, players, failure) in enumerate(results):
                 print(f'{((i + 1) / n_games):.2%} {season} {season_type}: {game_id}')
-
-                # Get the players and IDs for this game
-                players = get_players_and_ids_single_game(game_id, play_by_play_filename)
+                if failure is not None:
+                    raise_failure(game_id, failure)
 
                 # Add this game's players and IDs to list for all games
                 all_players.append(players)
@@ -86,6 +93,23 @@ def get_players_and_ids_seasons(seasons, season_types, schedule_filename, play_b
     all_players_df.to_csv(players_and_ids_filename, index=False)
 
 
+# Add the players and IDs from new games to the saved players and IDs
+def add_players_and_ids_games(game_ids, play_by_play_filename, players_and_ids_filename):
+    # Get the players and IDs for the new games
+    new_players = [get_players_and_ids_single_game(game_id, play_by_play_filename) for game_id in game_ids]
+
+    # Combine with the saved players and IDs
+    if os.path.exists(players_and_ids_filename):
+        new_players.append(pd.read_csv(players_and_ids_filename))
+    all_players_df = pd.concat(new_players).drop_duplicates()
+
+    # Sort players and IDs by ID ascending
+    all_players_df = all_players_df.sort_values(by='PLAYER_ID', ascending=True)
+
+    # Save players and IDs to csv
+    all_players_df.to_csv(players_and_ids_filename, index=False)
+
+
 if __name__ == '__main__':
     seasons = range(1996, 2024)
     seasons = [f'{season}-{((season % 100) + 1) % 100:02}' for season in seasons]
@@ -94,4 +118,5 @@ if __name__ == '__main__':
     play_by_play_filename = '../Data/PlayByPlay/Standard/pbp_{}.csv'
     get_players_and_ids_seasons(seasons, season_types, schedule_filename, play_by_play_filename,
                                 '../Data/players_and_ids.csv')
+    update_player_registry('../Data/players_and_ids.csv', '../Data/player_registry.csv')
 
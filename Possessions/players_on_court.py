@@ -1,19 +1,15 @@
 import pickle
-import time
 import traceback
 
+from Possessions.game_clock import *
+from Possessions.play_by_play_store import read_play_by_play
 from api_helpers import *
+from parallel_helpers import *
 
 
 # Calculate the time (in tenths of a second) elapsed before the start of a period
 def calculate_start_time_of_period(period):
-    # If an overtime period has been played
-    if period > 5:
-        return (720 * 4 + (period - 5) * 300) * 10
-
-    # If only quarters have been played
-    else:
-        return 720 * (period - 1) * 10
+    return int(get_period_start_time(period)) * 10
 
 
 # For each substitution, get only players who were subbed in or subbed out, but not both
@@ -84,11 +80,11 @@ def get_players_on_court_slow(seasons, season_types, schedule_filename, play_by_
 def get_players_on_court_single_game_slow(game_id, play_by_play_filename, advanced_box_score_url,
                                           players_on_court_filename):
     # Read the play-by-play data
-    play_by_play = pd.read_csv(play_by_play_filename.format(game_id))
+    play_by_play = read_play_by_play(game_id, play_by_play_filename)
 
     # Make new column with time remaining in period
     # This is done to handle revisions which have been made after the fact and have event IDs much higher
-    play_by_play['time_left'] = play_by_play['PCTIMESTRING'].apply(lambda x: int(x.split(':')[0]) * 60 + int(x.split(':')[1]))
+    play_by_play['time_left'] = get_seconds_left(play_by_play['PCTIMESTRING'])
 
     # Get the substitution events from the play-by-play data
     substitutionsOnly = play_by_play[play_by_play['EVENTMSGTYPE'] == 8][
@@ -164,9 +160,6 @@ def get_players_on_court_single_game_slow(game_id, play_by_play_filename, advanc
         # Add row to list of rows
         rows.append(row)
 
-        # Sleep for 0.75 seconds to stay under the rate limit
-        time.sleep(0.75)
-
     # Convert rows for each period into a data frame
     players_on_court_at_start_of_period = pd.DataFrame(rows)
 
@@ -183,7 +176,7 @@ def get_players_on_court_single_game_slow(game_id, play_by_play_filename, advanc
 
 # Get the players on the court at the start of each period for each game for each season for each season type
 def get_players_on_court_fast(seasons, season_types, schedule_filename, play_by_play_filename,
-                              players_on_court_filename, failed_filename):
+                              players_on_court_filename, failed_filename, max_processes=default_max_processes):
     # Keep track of failed downloads
     failures = {}
 
@@ -197,12 +190,13 @@ def get_players_on_court_fast(seasons, season_types, schedule_filename, play_by_
             game_ids = schedule['GAME_ID'].unique()
             n_games = len(game_ids)
 
-            # Find players on the court at the start of each period for each game
-            for i, game_id in enumerate(game_ids):
+            # Find players on the court at the start of each period for each game on a pool of processes
+            args = (play_by_play_filename, players_on_court_filename)
+            results = run_games(get_players_on_court_single_game_fast, game_ids, args, max_processes=max_processes)
+            for i, (game_id, result, failure) in enumerate(results):
                 print(f'{((i + 1) / n_games):.2%} {season} {season_type}: {game_id}')
-
-                # Find players on the court at the start of each period for the game
-                result = get_players_on_court_single_game_fast(game_id, play_by_play_filename, players_on_court_filename)
+                if failure is not None:
+                    raise_failure(game_id, failure)
 
                 # If there was an error, add it to failures dictionary
                 if result[0] != 0:
@@ -216,7 +210,7 @@ def get_players_on_court_fast(seasons, season_types, schedule_filename, play_by_
 # Get the players on the court at the start of each period for a single game
 def get_players_on_court_single_game_fast(game_id, play_by_play_filename, players_on_court_filename):
     # Get the play-by-play for the game
-    play_by_play = pd.read_csv(play_by_play_filename.format(game_id))
+    play_by_play = read_play_by_play(game_id, play_by_play_filename)
 
     # Remove technical fouls because players on bench can receive them
     play_by_play = play_by_play[~((play_by_play['EVENTMSGTYPE'] == 6) & (play_by_play['EVENTMSGACTIONTYPE'] == 11))]
@@ -226,7 +220,7 @@ def get_players_on_court_single_game_fast(game_id, play_by_play_filename, player
 
     # Make new column with time remaining in period
     # This is done to handle revisions which have been made after the fact and have event IDs much higher
-    play_by_play['time_left'] = play_by_play['PCTIMESTRING'].apply(lambda x: int(x.split(':')[0]) * 60 + int(x.split(':')[1]))
+    play_by_play['time_left'] = get_seconds_left(play_by_play['PCTIMESTRING'])
 
     # Get the substitution events from the play-by-play data
     substitutionsOnly = play_by_play[play_by_play['EVENTMSGTYPE'] == 8][
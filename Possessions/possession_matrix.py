@@ -0,0 +1,225 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from Possessions.player_registry import *
+
+# Constants for the files in a possession matrix directory
+lineups_file = 'lineups.npy'
+points_file = 'points.npy'
+possessions_file = 'possessions.npy'
+dates_file = 'dates.npy'
+game_ids_file = 'game_ids.npy'
+players_file = 'players.npy'
+seasons_file = 'seasons.csv'
+matrix_arrays = {
+    'lineups': lineups_file,
+    'points': points_file,
+    'possessions': possessions_file,
+    'dates': dates_file,
+    'game_ids': game_ids_file,
+}
+
+# Constants for the columns of the combined possessions
+offensive_player_columns = [f'offensive_player{i}' for i in range(1, 6)]
+defensive_player_columns = [f'defensive_player{i}' for i in range(1, 6)]
+lineup_columns = offensive_player_columns + defensive_player_columns
+
+
+# Convert date strings (e.g. '2023-10-24') to the number of days since 1970-01-01
+def date_to_day(dates):
+    dates = pd.to_datetime(pd.Series(dates)).to_numpy().astype('datetime64[D]')
+    return dates.astype(np.int64).astype(np.int32)
+
+
+# Convert the number of days since 1970-01-01 back to date strings
+def day_to_date(days):
+    return np.asarray(days).astype('datetime64[D]').astype(str)
+
+
+# Read the combined possessions for a season and encode the players in each lineup as codes into the season's players
+def read_season_possessions(season, season_type, season_possessions_filename):
+    possessions = pd.read_csv(season_possessions_filename.format(season, season_type), dtype={'date': str})
+
+    # Get the sorted player IDs in the season and each lineup as indices into them
+    season_players, codes = np.unique(possessions[lineup_columns].to_numpy(dtype=np.int64), return_inverse=True)
+    codes = codes.reshape(-1, len(lineup_columns)).astype(np.int32)
+
+    # Get the other columns in the matrix's types
+    season_arrays = {
+        'points': possessions['points'].to_numpy(dtype=np.float32),
+        'possessions': possessions['possessions'].to_numpy(dtype=np.float32),
+        'dates': date_to_day(possessions['date']),
+        'game_ids': possessions['game_id'].to_numpy(dtype=np.int64),
+    }
+
+    return season_players, codes, season_arrays
+
+
+# Load the player registry with every player in some possessions added to it, saving it if any players were new
+def register_matrix_players(player_ids, registry_filename):
+    registry = load_player_registry(registry_filename)
+    n_registered = len(registry)
+    registry = add_players_to_registry(registry, pd.DataFrame({player_id: player_ids, player_name: ''}))
+    if len(registry) > n_registered:
+        save_player_registry(registry, registry_filename)
+    return registry
+
+
+# Combine the possessions for all seasons into a possession matrix, a directory of binary arrays that can be memory
+# mapped instead of read from csv
+# Lineups are stored as an (N, 10) array of player indices from the player registry, offense then defense, and
+# players.npy maps each index back to its player ID. Any player missing from the registry is added to it.
+# Possessions are grouped by season type and then season, so any range of seasons of one season type is a contiguous
+# block of rows, and seasons.csv gives the first and last row of each block.
+def write_possession_matrix(seasons, season_types, season_possessions_filename, registry_filename,
+                            matrix_directory):
+    # Read and encode the possessions for every season
+    season_rows = []
+    season_players = []
+    season_codes = []
+    season_arrays = []
+    start = 0
+    for season_type in season_types:
+        for season in seasons:
+            print(f'{season} {season_type}')
+            players, codes, arrays = read_season_possessions(season, season_type, season_possessions_filename)
+            season_rows.append([season, season_type, start, start + len(codes)])
+            season_players.append(players)
+            season_codes.append(codes)
+            season_arrays.append(arrays)
+            start += len(codes)
+
+    # Make sure every player has an index in the registry
+    registry = register_matrix_players(np.unique(np.concatenate(season_players)), registry_filename)
+
+    # Save the lineups as registry indices, one season at a time
+    os.makedirs(matrix_directory, exist_ok=True)
+    lineups = np.lib.format.open_memmap(os.path.join(matrix_directory, lineups_file), mode='w+', dtype=np.int32,
+                                        shape=(start, len(lineup_columns)))
+    for (_, _, season_start, season_stop), season_player_ids, codes in zip(season_rows, season_players, season_codes):
+        season_indices = ids_to_indices(registry, season_player_ids).astype(np.int32)
+        lineups[season_start:season_stop] = season_indices[codes]
+    lineups.flush()
+    del lineups
+
+    # Save the other columns
+    for name, filename in matrix_arrays.items():
+        if name != 'lineups':
+            np.save(os.path.join(matrix_directory, filename),
+                    np.concatenate([arrays[name] for arrays in season_arrays]))
+
+    # Save the player ID for each registry index and the rows for each season
+    np.save(os.path.join(matrix_directory, players_file), registry[player_id].to_numpy())
+    pd.DataFrame(season_rows, columns=['season', 'season_type', 'start', 'stop']).to_csv(
+        os.path.join(matrix_directory, seasons_file), index=False)
+
+
+# Replace the possessions for one season and season type in a possession matrix with the ones in its season file,
+# e.g. after the nightly update appends new games to it
+# Only that season is read from csv. Every other season is copied block by block from the memory mapped arrays into
+# new files, which replace the old ones once they are all written. A season that is not in the matrix yet goes after
+# the other seasons of its season type, so the possessions stay grouped by season type and then season.
+def update_possession_matrix_season(season, season_type, season_possessions_filename, registry_filename,
+                                    matrix_directory):
+    # Read and encode the possessions for the season as registry indices
+    players, codes, arrays = read_season_possessions(season, season_type, season_possessions_filename)
+    registry = register_matrix_players(players, registry_filename)
+    arrays['lineups'] = ids_to_indices(registry, players).astype(np.int32)[codes]
+
+    # Get the blocks of the matrix to keep, with the updated season in its place
+    old_matrix = None
+    old_seasons = pd.DataFrame(columns=['season', 'season_type', 'start', 'stop'])
+    if os.path.exists(os.path.join(matrix_directory, seasons_file)):
+        old_matrix = load_possession_matrix(matrix_directory)
+        old_seasons = old_matrix['seasons']
+    blocks = [(row.season, row.season_type, row.start, row.stop) for row in old_seasons.itertuples()
+              if (row.season, row.season_type) != (season, season_type)]
+    blocks.append((season, season_type, None, None))
+    season_type_order = list(dict.fromkeys(list(old_seasons['season_type']) + [season_type]))
+    blocks.sort(key=lambda block: (season_type_order.index(block[1]), block[0]))
+
+    # Find where each block goes in the new matrix
+    season_rows = []
+    start = 0
+    for block_season, block_season_type, block_start, block_stop in blocks:
+        n_rows = len(codes) if block_start is None else block_stop - block_start
+        season_rows.append([block_season, block_season_type, start, start + n_rows])
+        start += n_rows
+
+    # Write each array to a temporary file one block at a time, removing the temporary files if anything fails
+    os.makedirs(matrix_directory, exist_ok=True)
+    temporary_filenames = {name: os.path.join(matrix_directory, f'{filename}.{os.getpid()}.tmp')
+                           for name, filename in matrix_arrays.items()}
+    try:
+        for name in matrix_arrays:
+            new_array = np.lib.format.open_memmap(temporary_filenames[name], mode='w+', dtype=arrays[name].dtype,
+                                                  shape=(start, *arrays[name].shape[1:]))
+            for (_, _, block_start, block_stop), (_, _, new_start, new_stop) in zip(blocks, season_rows):
+                if block_start is None:
+                    new_array[new_start:new_stop] = arrays[name]
+                else:
+                    new_array[new_start:new_stop] = old_matrix[name][block_start:block_stop]
+            new_array.flush()
+            del new_array
+
+        # Swap in the new arrays
+        for name, filename in matrix_arrays.items():
+            os.replace(temporary_filenames[name], os.path.join(matrix_directory, filename))
+    finally:
+        for temporary_filename in temporary_filenames.values():
+            if os.path.exists(temporary_filename):
+                os.remove(temporary_filename)
+
+    # Save the player ID for each registry index and the rows for each season
+    np.save(os.path.join(matrix_directory, players_file), registry[player_id].to_numpy())
+    pd.DataFrame(season_rows, columns=['season', 'season_type', 'start', 'stop']).to_csv(
+        os.path.join(matrix_directory, seasons_file), index=False)
+
+
+# Load a possession matrix with every array memory mapped, so nothing is read from disk until it is used
+def load_possession_matrix(matrix_directory):
+    matrix = {name: np.load(os.path.join(matrix_directory, filename), mmap_mode='r')
+              for name, filename in matrix_arrays.items()}
+    matrix['players'] = np.load(os.path.join(matrix_directory, players_file))
+    matrix['seasons'] = pd.read_csv(os.path.join(matrix_directory, seasons_file), dtype={'season': str})
+    return matrix
+
+
+# Get the rows of a possession matrix for a range of seasons and season types
+# A range of seasons of one season type is a slice of the memory mapped arrays, so no possessions are copied
+def select_possession_matrix_seasons(matrix, start_season, end_season, season_types):
+    seasons = matrix['seasons']
+    seasons = seasons[(seasons['season'] >= start_season) & (seasons['season'] <= end_season) &
+                      (seasons['season_type'].isin(season_types))]
+
+    # Merge neighboring seasons into blocks of contiguous rows
+    blocks = []
+    for start, stop in zip(seasons['start'], seasons['stop']):
+        if len(blocks) > 0 and blocks[-1][1] == start:
+            blocks[-1][1] = stop
+        else:
+            blocks.append([start, stop])
+    if len(blocks) == 0:
+        blocks.append([0, 0])
+
+    # Slice each array, only copying if the seasons are not contiguous
+    selected = {'players': matrix['players']}
+    for name in matrix_arrays:
+        if len(blocks) == 1:
+            selected[name] = matrix[name][blocks[0][0]:blocks[0][1]]
+        else:
+            selected[name] = np.concatenate([matrix[name][start:stop] for start, stop in blocks])
+    return selected
+
+
+if __name__ == '__main__':
+    seasons = range(1996, 2024)
+    seasons = [f'{season}-{((season % 100) + 1) % 100:02}' for season in seasons]
+    season_types = ['Regular Season', 'Playoffs']
+    registry_filename = '../Data/player_registry.csv'
+    write_possession_matrix(seasons, season_types, '../Data/Possessions/Standard/Seasons/possessions_{}_{}.csv',
+                            registry_filename, '../Data/Possessions/Standard/Matrix')
+    write_possession_matrix(seasons, season_types, '../Data/Possessions/LuckAdjusted/Seasons/possessions_{}_{}.csv',
+                            registry_filename, '../Data/Possessions/LuckAdjusted/Matrix')
@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+from Possessions.event_lineups import lineup_columns, team_id_columns, team_player_columns
+from Possessions.play_by_play_helpers import *
+
+# Columns in a possession record
+possession_columns = ['game_id', 'period', 'possession_end', 'possession_start', 'possession_team',
+                      'team1_id', 'team1_player1', 'team1_player2', 'team1_player3', 'team1_player4', 'team1_player5',
+                      'team1_points',
+                      'team2_id', 'team2_player1', 'team2_player2', 'team2_player3', 'team2_player4', 'team2_player5',
+                      'team2_points']
+
+# Play-by-play columns read by the parser
+parser_columns = ['GAME_ID', period_column, time_elapsed, event_type_code, foul_type_code, free_throw_type_code,
+                  is_miss_column, is_three_column, is_team_event_column, is_team_rebound_column,
+                  is_team_turnover_column, missed_shot_index, foul_index, is_and_1_column, player1_id, player1_team_id,
+                  player2_id] + lineup_columns
+
+
+# Get the columns of a play-by-play as plain lists, which are much faster to index one event at a time than a
+# dataframe or its Series
+def get_event_columns(play_by_play):
+    columns = {column: play_by_play[column].tolist() for column in parser_columns}
+    if 'POINTS' in play_by_play.columns:
+        columns['POINTS'] = play_by_play['POINTS'].tolist()
+    return columns
+
+
+# Check if an event is the end of a possession using the look-back and look-ahead columns from index_events
+def is_end_of_possession_event(i, columns):
+    e_type = columns[event_type_code][i]
+
+    # A turnover or the end of a period always ends a possession
+    if e_type == EventType.Turnover.value or e_type == EventType.EndOfPeriod.value:
+        return True
+
+    # A made final free throw ends a possession unless the foul keeps the ball with the shooting team
+    if e_type == EventType.FreeThrow.value:
+        if columns[is_miss_column][i]:
+            return False
+        ft_type = FreeThrowType.from_number(columns[free_throw_type_code][i])
+        if ft_type.is_final_multi_ft():
+            return True
+        foul_type = columns[foul_type_code][columns[foul_index][i]]
+        return (ft_type == FreeThrowType.OneOfOne and
+                foul_type != FoulType.AwayFromPlay.value and
+                foul_type != FoulType.LooseBall.value and
+                foul_type != FoulType.Inbound.value)
+
+    # A defensive rebound ends a possession
+    if e_type == EventType.Rebound.value:
+        shot_team_id = columns[player1_team_id][columns[missed_shot_index][i]]
+        if columns[is_team_rebound_column][i]:
+            return shot_team_id != columns[player1_id][i]
+        return shot_team_id != columns[player1_team_id][i]
+
+    # A made shot ends a possession unless it is an And-1
+    if e_type == EventType.MadeShot.value:
+        return not columns[is_and_1_column][i]
+
+    return False
+
+
+# Get the points scored on an event
+def get_event_points(i, columns):
+    # If there is a points column, return its value
+    if 'POINTS' in columns:
+        return columns['POINTS'][i]
+
+    # 1 point if made free throw, 3 or 2 points if made shot, and 0 points for any other event
+    e_type = columns[event_type_code][i]
+    if e_type == EventType.FreeThrow.value:
+        return 0 if columns[is_miss_column][i] else 1
+    elif e_type == EventType.MadeShot.value:
+        return 3 if columns[is_three_column][i] else 2
+    return 0
+
+
+# Determine which team had possession of the ball based on the last event in the possession
+def get_possession_team_event(i, columns, team1, team2):
+    e_type = columns[event_type_code][i]
+
+    # If the last event was a made shot or made free throw, return the team that made the shot or free throw
+    if e_type == EventType.MadeShot.value or e_type == EventType.FreeThrow.value:
+        return str(int(columns[player1_team_id][i]))
+
+    # If the last event was a rebound, return the team that did not get the rebound
+    elif e_type == EventType.Rebound.value:
+        rebound_team = columns[player1_id][i] if columns[is_team_rebound_column][i] else columns[player1_team_id][i]
+        return str(team2 if rebound_team == team1 else team1)
+
+    # If the last event was a turnover, return the team that committed the turnover
+    elif e_type == EventType.Turnover.value:
+        if columns[is_team_turnover_column][i]:
+            return str(int(columns[player1_id][i]))
+        return str(int(columns[player1_team_id][i]))
+
+    # Otherwise return whatever team player 1 was on
+    else:
+        if columns[is_team_event_column][i]:
+            return str(int(columns[player1_id][i]))
+        return str(int(columns[player1_team_id][i]))
+
+
+# Get every possession in a game in a single pass over the events of a classified and indexed play-by-play with time
+# elapsed and lineup columns
+# The players on the court are read from the lineup columns, and each possession is written straight into
+# preallocated columns
+def parse_possessions(play_by_play):
+    # Get the event columns
+    columns = get_event_columns(play_by_play)
+    n_events = len(play_by_play)
+
+    # Preallocate the possession columns, as there can never be more possessions than events
+    first_events = np.empty(n_events, dtype=np.int64)
+    possession_ends = [None] * n_events
+    team1_points = [0] * n_events
+    team2_points = [0] * n_events
+    possession_teams = [None] * n_events
+
+    # Walk through every event once
+    n_possessions = 0
+    first_event = -1
+    last_event = -1
+    for i in range(n_events):
+        e_type = columns[event_type_code][i]
+
+        # Do not include substitutions or end of periods to events in possession
+        if e_type != EventType.Substitution.value and e_type != EventType.EndOfPeriod.value:
+            # Start a new possession with the players on the court for its first event
+            if first_event < 0:
+                first_event = i
+                first_events[n_possessions] = i
+                possession_ends[n_possessions] = columns[time_elapsed][i]
+            last_event = i
+
+            # Keep track of the latest time and the points for each team in the possession
+            possession_ends[n_possessions] = max(possession_ends[n_possessions], columns[time_elapsed][i])
+            if (e_type == EventType.MadeShot.value or e_type == EventType.MissedShot.value or
+                    e_type == EventType.FreeThrow.value):
+                if columns[player1_team_id][i] == columns[team_id_columns[0]][first_event]:
+                    team1_points[n_possessions] += get_event_points(i, columns)
+                elif columns[player1_team_id][i] == columns[team_id_columns[1]][first_event]:
+                    team2_points[n_possessions] += get_event_points(i, columns)
+
+        # If event is end of possession, finish the current possession unless it is empty
+        if is_end_of_possession_event(i, columns) and first_event >= 0:
+            possession_teams[n_possessions] = get_possession_team_event(last_event, columns,
+                                                                        columns[team_id_columns[0]][first_event],
+                                                                        columns[team_id_columns[1]][first_event])
+            n_possessions += 1
+            first_event = -1
+
+    # Build the possession records
+    if n_possessions == 0:
+        return pd.DataFrame()
+    first_events = first_events[:n_possessions]
+    possession_ends = possession_ends[:n_possessions]
+    possessions = {
+        'game_id': [str(columns['GAME_ID'][i]) for i in first_events],
+        'period': [columns[period_column][i] for i in first_events],
+        'possession_end': possession_ends,
+        'possession_start': [0] + possession_ends[:-1],
+        'possession_team': possession_teams[:n_possessions],
+        'team1_points': team1_points[:n_possessions],
+        'team2_points': team2_points[:n_possessions],
+    }
+    for team in range(2):
+        possessions[f'team{team + 1}_id'] = [str(columns[team_id_columns[team]][i]) for i in first_events]
+        for player in range(5):
+            possessions[f'team{team + 1}_player{player + 1}'] = [
+                str(columns[team_player_columns[team][player]][i]) for i in first_events]
+
+    # Sort the columns alphabetically
+    return pd.DataFrame(possessions, columns=sorted(possession_columns))
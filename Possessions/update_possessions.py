@@ -0,0 +1,164 @@
+import traceback
+
+from Possessions.combine_possessions import append_games_possessions
+from Possessions.download_play_by_play import download_play_by_play_games
+from Possessions.event_lineups import get_event_lineups_single_game
+from Possessions.luck_adjust_play_by_play import luck_adjust_play_by_play_single_game
+from Possessions.make_possessions import get_possessions_single_game
+from Possessions.manifest import *
+from Possessions.play_by_play_store import append_store_games, read_play_by_play_csv
+from Possessions.player_registry import update_player_registry
+from Possessions.players_and_ids import add_players_and_ids_games
+from Possessions.possession_matrix import update_possession_matrix_season
+from Possessions.players_on_court import (get_players_on_court_single_game_fast,
+                                          get_players_on_court_single_game_slow)
+from Stats.general import get_general_stats_whole_season
+from api_helpers import *
+from season_helpers import current_season
+
+
+# Process a single new game through every stage of the pipeline
+def process_new_game(game_id, stats, filenames):
+    # Find the players on the court at the start of each period, falling back to box scores if needed
+    result = get_players_on_court_single_game_fast(game_id, filenames['play_by_play'], filenames['players_on_court'])
+    if result[0] != 0:
+        result = get_players_on_court_single_game_slow(game_id, filenames['play_by_play'],
+                                                       filenames['advanced_box_score_url'],
+                                                       filenames['players_on_court'])
+        if result[0] != 0:
+            raise Exception(f'Could not find players on court: {result[1:]}')
+
+    # Find the players on the court for every event
+    get_event_lineups_single_game(game_id, filenames['play_by_play'], filenames['players_on_court'],
+                                  filenames['lineups'])
+
+    # Luck-adjust the play-by-play
+    luck_adjust_play_by_play_single_game(game_id, stats, filenames['play_by_play'],
+                                         filenames['luck_adjusted_play_by_play'])
+
+    # Get the standard and luck-adjusted possessions
+    get_possessions_single_game(game_id, filenames['play_by_play'], filenames['lineups'], filenames['possessions'])
+    get_possessions_single_game(game_id, filenames['luck_adjusted_play_by_play'], filenames['lineups'],
+                                filenames['luck_adjusted_possessions'])
+
+
+# Update the pipeline with only the games that have been played since the last update
+# The latest schedule is compared with the games already processed, the new games are downloaded and run through
+# every stage, and their possessions are appended to the season and all-seasons possession files and the possession
+# matrices. Games are only recorded as processed once all of that is done, and appending them again skips any games
+# already in the files, so a run that crashed part of the way through can simply be run again.
+# Note that luck adjustments use the season-to-date stats at the time each game is processed
+def update_possessions(season, season_types, schedule_url, filenames):
+    # Keep track of failed games
+    failures = {}
+
+    # Load the manifest of games that have already been processed
+    processed = compact_manifest(filenames['processed_manifest'])
+
+    for season_type in season_types:
+        # Get the latest schedule
+        schedule = extract_data(schedule_url.format(season, season_type))
+        schedule = schedule[schedule['WL'].notna()]
+        schedule.to_csv(filenames['schedule'].format(season, season_type), index=False)
+
+        # Find the games that have not been processed yet
+        games = schedule[['GAME_ID', 'GAME_DATE']].drop_duplicates()
+        games = games[[processed.get(game_id, {}).get('STATUS') != status_ok for game_id in games['GAME_ID']]]
+        games.reset_index(drop=True, inplace=True)
+        game_ids = list(games['GAME_ID'])
+        print(f'{season} {season_type}: {len(game_ids)} new games')
+        if len(game_ids) == 0:
+            continue
+
+        # Download the play-by-play for the new games that have not already been downloaded
+        downloaded = load_manifest(filenames['download_manifest'])
+        download_game_ids = [game_id for game_id in game_ids
+                             if not is_complete(downloaded.get(game_id), filenames['play_by_play'].format(game_id))]
+        download_failures = download_play_by_play_games(download_game_ids, filenames['play_by_play_url'],
+                                                        filenames['play_by_play'], filenames['download_manifest'])
+        failures.update(download_failures)
+
+        # Get up-to-date season stats for luck adjustments
+        get_general_stats_whole_season(season, season_type, 'Base', filenames['stats'])
+        stats = pd.read_csv(filenames['stats'].format('Base', season, season_type))
+
+        # Process each downloaded game
+        processed_games = []
+        for i, game in games.iterrows():
+            game_id = game['GAME_ID']
+            if game_id in download_failures:
+                continue
+            print(f'{((i + 1) / len(games)):.2%} {season} {season_type}: {game_id}')
+            try:
+                process_new_game(game_id, stats, filenames)
+                processed_games.append(i)
+            except Exception as error:
+                print(f'Error occurred: {error}')
+                traceback.print_exc()
+                failures[game_id] = str(error), traceback.format_exc()
+                record_manifest_entry(filenames['processed_manifest'], game_id, status_failed, error=str(error))
+
+        # Append the possessions for the processed games
+        processed_games = games.loc[processed_games]
+        append_games_possessions(processed_games, season, season_type, filenames['possessions'],
+                                 filenames['season_possessions'], filenames['all_possessions'])
+        append_games_possessions(processed_games, season, season_type, filenames['luck_adjusted_possessions'],
+                                 filenames['luck_adjusted_season_possessions'],
+                                 filenames['luck_adjusted_all_possessions'])
+
+        # Add any new players
+        add_players_and_ids_games(list(processed_games['GAME_ID']), filenames['play_by_play'],
+                                  filenames['players_and_ids'])
+        update_player_registry(filenames['players_and_ids'], filenames['player_registry'])
+
+        # Replace the season in the possession matrices if they are kept, so RAPM sees the new games
+        for season_possessions_key, matrix_key in [('season_possessions', 'possessions_matrix'),
+                                                   ('luck_adjusted_season_possessions',
+                                                    'luck_adjusted_possessions_matrix')]:
+            if matrix_key in filenames and len(processed_games) > 0:
+                update_possession_matrix_season(season, season_type, filenames[season_possessions_key],
+                                                filenames['player_registry'], filenames[matrix_key])
+
+        # Add the processed games to the play-by-play stores if they are kept
+        for play_by_play_key in ['play_by_play', 'luck_adjusted_play_by_play']:
+            if f'{play_by_play_key}_store' in filenames:
+                games_play_by_play = [read_play_by_play_csv(game_id, filenames[play_by_play_key])
+                                      for game_id in processed_games['GAME_ID']]
+                append_store_games(games_play_by_play, season, season_type, filenames[f'{play_by_play_key}_store'])
+
+        # Record the games as processed only once their possessions have been appended
+        for game_id in processed_games['GAME_ID']:
+            record_manifest_entry(filenames['processed_manifest'], game_id, status_ok)
+
+    return failures
+
+
+if __name__ == '__main__':
+    season = current_season()
+    season_types = ['Regular Season', 'Playoffs']
+    schedule_url = "http://stats.nba.com/stats/leaguegamelog/?leagueId=00&season={}&seasonType={}&playerOrTeam=T&counter=0&sorter=PTS&direction=ASC&dateFrom=&dateTo="
+    filenames = {
+        'schedule': '../Data/Schedules/schedule_{}_{}.csv',
+        'play_by_play_url': "https://stats.nba.com/stats/playbyplayv2/?gameId={0}&startPeriod=0&endPeriod=14",
+        'advanced_box_score_url': 'https://stats.nba.com/stats/boxscoretraditionalv2/?gameId={0}&startPeriod=0&endPeriod=14&startRange={1}&endRange={2}&rangeType=2',
+        'play_by_play': '../Data/PlayByPlay/Standard/pbp_{}.csv',
+        'luck_adjusted_play_by_play': '../Data/PlayByPlay/LuckAdjusted/pbp_{}.csv',
+        'play_by_play_store': '../Data/PlayByPlay/Standard/Store',
+        'luck_adjusted_play_by_play_store': '../Data/PlayByPlay/LuckAdjusted/Store',
+        'download_manifest': '../Data/PlayByPlay/Standard/manifest.jsonl',
+        'processed_manifest': '../Data/Possessions/processed_manifest.jsonl',
+        'players_on_court': '../Data/PeriodStarters/pap_{}.csv',
+        'lineups': '../Data/Lineups/lineups_{}.csv',
+        'stats': '../Data/SeasonStats/General/{}/{}_{}.csv',
+        'possessions': '../Data/Possessions/Standard/Games/possessions_{}.csv',
+        'season_possessions': '../Data/Possessions/Standard/Seasons/possessions_{}_{}.csv',
+        'all_possessions': '../Data/Possessions/Standard/possessions_all.csv',
+        'luck_adjusted_possessions': '../Data/Possessions/LuckAdjusted/Games/possessions_{}.csv',
+        'luck_adjusted_season_possessions': '../Data/Possessions/LuckAdjusted/Seasons/possessions_{}_{}.csv',
+        'luck_adjusted_all_possessions': '../Data/Possessions/LuckAdjusted/possessions_all.csv',
+        'possessions_matrix': '../Data/Possessions/Standard/Matrix',
+        'luck_adjusted_possessions_matrix': '../Data/Possessions/LuckAdjusted/Matrix',
+        'players_and_ids': '../Data/players_and_ids.csv',
+        'player_registry': '../Data/player_registry.csv',
+    }
+    update_possessions(season, season_types, schedule_url, filenames)
@@ -0,0 +1,90 @@
+import pickle
+
+from parallel_helpers import *
+from rapm import *
+
+# Possession matrices and player names already loaded by this process, keyed by their files
+# Matrices are memory mapped, so every worker reads the same pages from disk instead of getting its own copy
+loaded_matrices = {}
+loaded_player_names = {}
+
+
+# Load a possession matrix once per process
+def get_loaded_matrix(matrix_directory):
+    if matrix_directory not in loaded_matrices:
+        loaded_matrices[matrix_directory] = load_possession_matrix(matrix_directory)
+    return loaded_matrices[matrix_directory]
+
+
+# Load the player names and IDs from the registry once per process
+def get_loaded_player_names(registry_filename):
+    if registry_filename not in loaded_player_names:
+        loaded_player_names[registry_filename] = load_player_registry(registry_filename)[[player_id, 'PLAYER_NAME']]
+    return loaded_player_names[registry_filename]
+
+
+# Get every (target, first season, last season, lambda) job for windows of each length
+# The longest windows are started first, so the pool is not left waiting on them at the end
+def get_rapm_jobs(targets, seasons, lengths, lambdas):
+    jobs = []
+    for length in sorted(lengths, reverse=True):
+        for i in range(len(seasons) - length + 1):
+            for lambda_value in lambdas:
+                for target in targets:
+                    jobs.append((target, seasons[i], seasons[i + length - 1], lambda_value))
+    return jobs
+
+
+# Fit RAPM for a single job and save it, returning the file it was saved to
+# Only the job and the file names are sent to the worker, which reads the possessions from the memory mapped matrix
+def fit_rapm_job(job, matrix_directories, season_types, registry_filename, folds, save_file, stints):
+    target, start_season, end_season, lambda_value = job
+    matrix = get_loaded_matrix(matrix_directories[target])
+    player_names_and_ids = get_loaded_player_names(registry_filename)
+
+    # Fit the possessions in the window with a single lambda
+    possessions = select_possession_matrix_seasons(matrix, start_season, end_season, season_types)
+    save_filename = save_file.format(target, start_season, end_season, lambda_value)
+    calculate_rapm_matrix(possessions, player_names_and_ids, folds, [lambda_value], save_filename, stints=stints)
+
+    return save_filename
+
+
+# Calculate RAPM for every window of each length, lambda, and target (e.g. standard or luck-adjusted) on a pool of
+# processes, saving each RAPM as soon as it is fit
+def calculate_rapm_batch(matrix_directories, seasons, season_types, lengths, lambdas, registry_filename, folds,
+                         save_file, failed_filename, stints=None, max_processes=default_max_processes):
+    # Keep track of failed jobs
+    failures = {}
+
+    # Fit every job on a pool of processes
+    jobs = get_rapm_jobs(list(matrix_directories), seasons, lengths, lambdas)
+    args = (matrix_directories, season_types, registry_filename, folds, save_file, stints)
+    results = run_jobs_as_completed(fit_rapm_job, jobs, args, max_processes=max_processes)
+    for i, (job, _, failure) in enumerate(results):
+        print(f'{((i + 1) / len(jobs)):.2%}: {job[0]} {job[1]} to {job[2]}, lambda {job[3]}')
+
+        # Keep track of failed jobs
+        if failure is not None:
+            print(f'Error occurred: {failure[0]}')
+            print(failure[1])
+            failures[job] = failure
+
+    # Save failed jobs
+    with open(failed_filename, 'wb') as fp:
+        pickle.dump(failures, fp)
+
+
+if __name__ == '__main__':
+    seasons = range(1996, 2024)
+    seasons = [f'{season}-{((season % 100) + 1) % 100:02}' for season in seasons]
+    season_types = ['Regular Season']
+    matrix_directories = {
+        'Standard': '../Data/Possessions/Standard/Matrix',
+        'LuckAdjusted': '../Data/Possessions/LuckAdjusted/Matrix',
+    }
+    registry_filename = '../Data/player_registry.csv'
+
+    # Fit the 1, 3, and 5 season RAPMs for each lambda and target
+    calculate_rapm_batch(matrix_directories, seasons, season_types, [1, 3, 5], [0.01, 0.05, 0.1], registry_filename, 5,
+                         '../Data/RAPM/{}/Batch/rapm_regular_season_{}_{}_{}.csv', 'Fails/failed_rapm_batch.pkl')
@@ -0,0 +1,127 @@
+from parallel_helpers import *
+from rapm import *
+
+# Stats that get bootstrap standard errors and intervals
+bootstrap_stat_names = ['O-RAPM', 'D-RAPM', 'RAPM']
+
+# Game indices already loaded by this process, keyed by their files
+loaded_game_indices = {}
+
+
+# Load a game index once per process
+def get_loaded_game_index(game_index_filename):
+    if game_index_filename not in loaded_game_indices:
+        loaded_game_indices[game_index_filename] = load_statistics_index(game_index_filename)
+    return loaded_game_indices[game_index_filename]
+
+
+# Get the weight of each game for a bootstrap replicate
+# 'multinomial' resamples the games with replacement, and 'poisson' gives each game an independent Poisson(1) weight,
+# which is nearly the same but does not need the number of games to be fixed
+def get_bootstrap_weights(rng, n_games, resampling):
+    if resampling == 'multinomial':
+        return rng.multinomial(n_games, np.full(n_games, 1 / n_games))
+    if resampling == 'poisson':
+        return rng.poisson(1.0, n_games)
+    raise ValueError(f'Unknown resampling option: {resampling}')
+
+
+# Fit the RAPM coefficients for a batch of bootstrap replicates
+# Each replicate reweights the statistics of each game and solves with the lambda chosen for all the possessions, so no
+# possessions are read and no cross validation is repeated. Returns coefficients with shape (replicates, 2P).
+def get_bootstrap_replicates(replicates, game_index_filename, columns, lambda_value, resampling, seed):
+    game_index = get_loaded_game_index(game_index_filename)
+    n_games = len(game_index['game_ids'])
+
+    coefs = []
+    for replicate in replicates:
+        # Each replicate has its own random generator, so results do not depend on how replicates are batched
+        rng = np.random.default_rng([seed, replicate])
+        weights = get_bootstrap_weights(rng, n_games, resampling)
+
+        # Solve for the players in the full fit
+        statistics = restrict_sufficient_statistics(get_weighted_game_statistics(game_index, weights), columns)
+        replicate_coefs, _ = solve_ridge_path(statistics, [lambda_to_alpha(lambda_value, statistics['n'])])
+        coefs.append(replicate_coefs[0, 0])
+
+    return np.array(coefs)
+
+
+# Add the standard error and percentile interval of each stat from the bootstrap replicates next to the stat
+def add_bootstrap_intervals(rapms, replicate_coefs, confidence):
+    n_players = len(rapms)
+    replicate_stats = {
+        'O-RAPM': replicate_coefs[:, :n_players],
+        'D-RAPM': replicate_coefs[:, n_players:],
+        'RAPM': replicate_coefs[:, :n_players] + replicate_coefs[:, n_players:],
+    }
+
+    # Add the standard error, low, and high columns right after each stat
+    tail = 100 * (1 - confidence) / 2
+    for stat_name in bootstrap_stat_names:
+        values = replicate_stats[stat_name]
+        position = rapms.columns.get_loc(stat_name)
+        rapms.insert(position + 1, f'{stat_name}_SE', np.std(values, axis=0, ddof=1))
+        rapms.insert(position + 2, f'{stat_name}_Low', np.percentile(values, tail, axis=0))
+        rapms.insert(position + 3, f'{stat_name}_High', np.percentile(values, 100 - tail, axis=0))
+
+    return rapms
+
+
+# Calculate RAPM with bootstrap standard errors and percentile intervals by resampling games
+# The statistics of each game are built once and saved to a game index, which the workers load, so every replicate
+# only reweights those statistics and solves. Replicates are split into one batch per process, or one per replicate
+# when there are fewer replicates than processes.
+def calculate_rapm_bootstrap(possessions, player_names_and_ids, folds, lambdas, replicates, game_index_filename,
+                             save_file, resampling='multinomial', confidence=0.95, seed=0,
+                             max_processes=default_max_processes):
+    # Check there is at least one replicate to fit
+    if replicates < 1:
+        raise ValueError(f'Bootstrap needs at least 1 replicate, got {replicates}')
+
+    # Build and save the statistics of each game
+    game_index = get_game_index(possessions)
+    save_statistics_index(game_index, game_index_filename)
+
+    # Fit all the games, choosing lambda with folds of contiguous games
+    n_games = len(game_index['game_ids'])
+    statistics, fold_statistics = get_weighted_game_folds_statistics(game_index, np.ones(n_games), folds)
+    model, unique_ids = fit_rapm_statistics(statistics, fold_statistics, game_index['players'], lambdas)
+    _, columns = get_active_players(statistics, len(game_index['players']))
+    lambda_value = 2 * model.alpha_[0] / statistics['n']
+
+    # Fit the replicates on a pool of processes, with no more batches than replicates so none are empty
+    n_batches = min(replicates, max(max_processes, 1))
+    batches = [tuple(batch.tolist()) for batch in np.array_split(np.arange(replicates), n_batches)]
+    args = (game_index_filename, columns, lambda_value, resampling, seed)
+    replicate_coefs = []
+    for batch, result, failure in run_jobs_as_completed(get_bootstrap_replicates, batches, args,
+                                                        max_processes=max_processes):
+        print(f'Bootstrap replicates {batch[0] + 1} to {batch[-1] + 1} of {replicates}')
+        if failure is not None:
+            raise_failure(f'bootstrap replicates {batch[0] + 1} to {batch[-1] + 1}', failure)
+        replicate_coefs.append(result)
+
+    # Get the RAPM values for every player with their standard errors and intervals
+    rapms = extract_coefficients_for_players_ridge(model, 'RAPM', unique_ids)
+    rapms = add_bootstrap_intervals(rapms, np.concatenate(replicate_coefs), confidence)
+
+    # Merge with player names, round, and save
+    rapms = player_names_and_ids.merge(rapms, how='inner', on=player_id)
+    rapms = np.round(rapms, decimals=3)
+    rapms.to_csv(save_file, index=False)
+
+
+if __name__ == '__main__':
+    season_types = ['Regular Season']
+    possession_matrix_directory = '../Data/Possessions/Standard/Matrix'
+    registry_filename = '../Data/player_registry.csv'
+
+    matrix = load_possession_matrix(possession_matrix_directory)
+    player_names_and_ids = load_player_registry(registry_filename)[[player_id, 'PLAYER_NAME']]
+
+    # Find the 2023-24 RAPM with 95% bootstrap intervals from 200 replicates
+    possessions = select_possession_matrix_seasons(matrix, '2023-24', '2023-24', season_types)
+    calculate_rapm_bootstrap(possessions, player_names_and_ids, 5, [0.01, 0.05, 0.1], 200,
+                             '../Data/RAPM/Standard/game_index_2023-24.npz',
+                             '../Data/RAPM/Standard/Bootstrap/rapm_regular_season_2023-24_2023-24.csv')
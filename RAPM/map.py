@@ -1,11 +1,17 @@
-import pymc as pm
 import pandas as pd
+from scipy.optimize import minimize
 
+from Possessions.player_registry import load_player_registry
+from Possessions.possession_matrix import load_possession_matrix, select_possession_matrix_seasons
 from rapm_helpers import *
+from ridge import get_sufficient_statistics
 
 
 # Create a Bayesian model and find RAPM values using maximum a posteriori estimation
+# pymc is only imported here, so the sparse model can be used without it
 def make_map_model(train_x, train_y):
+    import pymc as pm
+
     basic_model = pm.Model()
     with basic_model:
         alpha = pm.Normal('alpha', mu=1.1, sigma=0.1)
@@ -17,6 +23,59 @@ def make_map_model(train_x, train_y):
     return idata
 
 
+# Find RAPM values using maximum a posteriori estimation from the sufficient statistics of a sparse training set
+# This is the same model as make_map_model, y ~ Normal(alpha + X beta, sigma) with Normal priors on alpha and beta, but
+# the training set is reduced to its sparse Gram matrix and the log posterior is maximized with L-BFGS, so memory grows
+# with the nonzero entries of X instead of the size of the dense matrix.
+# The prior means and standard deviations of beta can be scalars or have one value per column, for informative priors
+# on each player.
+def make_sparse_map_model(train_x, train_y, beta_mu=0.0, beta_sigma=0.02, alpha_mu=1.1, alpha_sigma=0.1, sigma=1.0,
+                          weights=None):
+    # Get the sufficient statistics of the training set, with every row weighted equally unless told otherwise
+    if weights is None:
+        weights = np.ones(train_x.shape[0])
+    statistics = get_sufficient_statistics(train_x.tocsr(), train_y, weights, sparse=True)
+    xx, xy, x = statistics['xx'], statistics['xy'][:, 0], statistics['x']
+    y, yy, n = statistics['y'][0], statistics['yy'][0], statistics['n']
+
+    # Get the prior for every column of beta
+    n_columns = train_x.shape[1]
+    beta_mu = np.broadcast_to(np.asarray(beta_mu, dtype=np.float64), n_columns)
+    beta_precision = 1 / np.broadcast_to(np.asarray(beta_sigma, dtype=np.float64), n_columns) ** 2
+
+    # Negative log posterior and its gradient, with alpha stored after beta
+    def negative_log_posterior(parameters):
+        beta, alpha = parameters[:-1], parameters[-1]
+        xx_beta = xx @ beta
+        squared_errors = (yy - 2 * alpha * y - 2 * beta @ xy + alpha ** 2 * n + 2 * alpha * beta @ x +
+                          beta @ xx_beta)
+        beta_error = beta - beta_mu
+        value = (squared_errors / (2 * sigma ** 2) + np.sum(beta_precision * beta_error ** 2) / 2 +
+                 (alpha - alpha_mu) ** 2 / (2 * alpha_sigma ** 2))
+        gradient_beta = (xx_beta + alpha * x - xy) / sigma ** 2 + beta_precision * beta_error
+        gradient_alpha = (alpha * n + beta @ x - y) / sigma ** 2 + (alpha - alpha_mu) / alpha_sigma ** 2
+        return value, np.append(gradient_beta, gradient_alpha)
+
+    # Maximize the posterior starting from the prior means
+    result = minimize(negative_log_posterior, np.append(beta_mu, alpha_mu), jac=True, method='L-BFGS-B',
+                      options={'maxiter': 10000, 'maxcor': 20, 'ftol': 1e-15, 'gtol': 1e-8})
+
+    # Don't return the last iterate as the MAP values if the optimizer stopped early
+    if not result.success:
+        raise Exception(f'MAP estimation did not converge: {result.message}')
+    return {'alpha': result.x[-1], 'beta': result.x[:-1]}
+
+
+# Get the prior means of beta for each player from earlier RAPM values (e.g. the previous season)
+# Players without earlier RAPM values get the default mean
+def get_player_prior_means(unique_ids, prior_rapms, stat_name='RAPM', default_mu=0.0):
+    prior_rapms = prior_rapms.set_index(player_id)
+    unique_ids = pd.Index(np.asarray(unique_ids, dtype=np.int64))
+    o_mu = prior_rapms[f'O-{stat_name}'].reindex(unique_ids).fillna(default_mu).to_numpy()
+    d_mu = prior_rapms[f'D-{stat_name}'].reindex(unique_ids).fillna(default_mu).to_numpy()
+    return np.concatenate([o_mu, d_mu])
+
+
 # Extract coefficients from the model
 def extract_coefficients_for_players_map(model, stat_name, unique_ids, include_ranks=False):
     # Convert unique player IDs from vector to matrix
@@ -52,26 +111,19 @@ if __name__ == '__main__':
     seasons = range(1996, 2024)
     seasons = [f'{season}-{((season % 100) + 1) % 100:02}' for season in seasons]
     season_types = ['Regular Season']
-    all_possessions_filename = '../Data/Possessions/Standard/possessions_all.csv'
-    players_and_ids_filename = '../Data/players_and_ids.csv'
-
-    possessions = pd.read_csv(all_possessions_filename)
-    player_names_and_ids = pd.read_csv(players_and_ids_filename)
-
-    possessions = possessions[possessions['season'] == '2023-24'].copy()
+    possession_matrix_directory = '../Data/Possessions/Standard/Matrix'
+    registry_filename = '../Data/player_registry.csv'
 
-    # Find unique player IDs
-    unique_ids = find_unique_ids(possessions)
+    matrix = load_possession_matrix(possession_matrix_directory)
+    player_names_and_ids = load_player_registry(registry_filename)[[player_id, 'PLAYER_NAME']]
 
-    # Calculate the points per 100 possessions
-    possessions[points_per_100_column] = 100 * possessions[points_column].values / possessions[
-        possessions_column].values
+    possessions = select_possession_matrix_seasons(matrix, '2023-24', '2023-24', season_types)
 
     # Create training set for the model
-    train_x, train_y, num_possessions = create_training_set(possessions, points_per_100_column, unique_ids)
+    train_x, train_y, num_possessions, unique_ids = create_training_set_from_matrix(possessions)
 
-    # Create ridge regression model
-    model = make_map_model(train_x.todense(), train_y)
+    # Find the MAP RAPM values without densifying the training set
+    model = make_sparse_map_model(train_x, train_y)
 
     # Get the RAPM values for every player
     rapms = extract_coefficients_for_players_map(model, 'RAPM', unique_ids)
@@ -1,9 +1,56 @@
+import os
+import pickle
+
+from Possessions.player_registry import load_player_registry
+from Possessions.possession_matrix import date_to_day, load_possession_matrix, select_possession_matrix_seasons
+from compare import compare_luck_adjustment_with_basic
 from rapm_helpers import *
 from ridge import *
+from sufficient_statistics import *
+
+
+# Save the RAPM values from a fit model
+def save_rapms(model, unique_ids, player_names_and_ids, save_file):
+    # Get the RAPM values for every player
+    rapms = extract_coefficients_for_players_ridge(model, 'RAPM', unique_ids)
+
+    # Merge with player names to provide insight beyond just player ID
+    rapms = player_names_and_ids.merge(rapms, how='inner', on=player_id)
+
+    # Round the values for ease of reading
+    rapms = np.round(rapms, decimals=3)
+
+    # Save RAPM values to a .csv file
+    rapms.to_csv(save_file, index=False)
+
+
+# Get the RAPM values for each target of a model fit on several targets at once, one data frame per target
+# The values are rounded the same way as saved RAPM values
+def get_target_rapms(model, unique_ids, player_names_and_ids, stat_names):
+    target_rapms = []
+    for target, stat_name in enumerate(stat_names):
+        target_model = SimpleNamespace(coef_=model.coef_[[target]], intercept_=model.intercept_[[target]])
+        rapms = extract_coefficients_for_players_ridge(target_model, stat_name, unique_ids)
+        rapms = player_names_and_ids.merge(rapms, how='inner', on=player_id)
+        target_rapms.append(np.round(rapms, decimals=3))
+    return target_rapms
+
+
+# Merge possessions into stints within each game ('game') or across all possessions ('window'), or leave them as
+# single possessions (None)
+def get_stints(possessions, stints, compress_function):
+    if stints is None:
+        return possessions
+    if stints not in ['game', 'window']:
+        raise ValueError(f'Unknown stints option: {stints}')
+    return compress_function(possessions, by_game=stints == 'game')
 
 
 # Calculate RAPM from possessions data
-def calculate_rapm(possessions, player_names_and_ids, folds, lambdas, save_file):
+def calculate_rapm(possessions, player_names_and_ids, folds, lambdas, save_file, stints=None):
+    # Merge possessions into stints
+    possessions = get_stints(possessions, stints, compress_stints)
+
     # Find unique player IDs
     unique_ids = find_unique_ids(possessions)
 
@@ -16,41 +63,133 @@ def calculate_rapm(possessions, player_names_and_ids, folds, lambdas, save_file)
     # Create ridge regression model
     model = make_ridge_model(train_x.tocsr(), train_y, folds, num_possessions, lambdas)
 
-    # Get the RAPM values for every player
-    rapms = extract_coefficients_for_players_ridge(model, 'RAPM', unique_ids)
+    # Save the RAPM values for every player
+    save_rapms(model, unique_ids, player_names_and_ids, save_file)
 
-    # Merge with player names to provide insight beyond just player ID
-    rapms = player_names_and_ids.merge(rapms, how='inner', on=player_id)
 
-    # Round the values for ease of reading
-    rapms = np.round(rapms, decimals=3)
+# Calculate RAPM from possessions selected from a possession matrix
+def calculate_rapm_matrix(possessions, player_names_and_ids, folds, lambdas, save_file, stints=None):
+    # Merge possessions into stints
+    possessions = get_stints(possessions, stints, compress_matrix_stints)
+
+    # Create training set for the model
+    train_x, train_y, num_possessions, unique_ids = create_training_set_from_matrix(possessions)
+
+    # Create ridge regression model
+    model = make_ridge_model(train_x, train_y, folds, num_possessions, lambdas)
+
+    # Save the RAPM values for every player
+    save_rapms(model, unique_ids, player_names_and_ids, save_file)
 
-    # Save RAPM values to a .csv file
-    rapms.to_csv(save_file, index=False)
+
+# Calculate standard and luck-adjusted RAPM from the same possessions selected from the standard and luck-adjusted
+# possession matrices, and save the comparison of the two
+# Both targets share one design matrix, so they are fit together from one Gram matrix and one eigendecomposition,
+# with lambda chosen separately for each
+def calculate_luck_adjustment_comparison_matrix(standard_possessions, luck_adjusted_possessions, player_names_and_ids,
+                                                folds, lambdas, save_file):
+    # Create training set for the model with a target for each set of points
+    possessions = stack_matrix_targets([standard_possessions, luck_adjusted_possessions])
+    train_x, train_y, num_possessions, unique_ids = create_training_set_from_matrix(possessions)
+
+    # Create ridge regression model for both targets
+    model = make_ridge_model(train_x, train_y, folds, num_possessions, lambdas)
+
+    # Get the RAPM values for each target and compare them
+    basic, luck_adjusted = get_target_rapms(model, unique_ids, player_names_and_ids, ['RAPM', 'LA-RAPM'])
+    basic = basic[[player_id, 'PLAYER_NAME', 'RAPM', 'O-RAPM', 'D-RAPM']]
+    luck_adjusted = luck_adjusted[[player_id, 'PLAYER_NAME', 'LA-RAPM', 'O-LA-RAPM', 'D-LA-RAPM']]
+    compare_luck_adjustment_with_basic(basic, luck_adjusted, save_file)
 
 
 # Calculate RAPM over a custom range of seasons
-def calculate_rapm_season_range(all_possessions, start_season, end_season, player_names_and_ids, folds, lambdas, save_file):
+def calculate_rapm_season_range(all_possessions, start_season, end_season, player_names_and_ids, folds, lambdas, save_file,
+                                stints=None):
     # Get all possessions in season range
     possessions_in_range = all_possessions[(all_possessions['season'] >= start_season) &
                                            (all_possessions['season'] <= end_season)].copy()
 
     # Calculate RAPM over custom range
-    calculate_rapm(possessions_in_range, player_names_and_ids, folds, lambdas, save_file)
+    calculate_rapm(possessions_in_range, player_names_and_ids, folds, lambdas, save_file, stints=stints)
 
 
 # Calculate RAPM over a custom range of dates
-def calculate_rapm_date_range(all_possessions, start_date, end_date, player_names_and_ids, folds, lambdas, save_file):
+def calculate_rapm_date_range(all_possessions, start_date, end_date, player_names_and_ids, folds, lambdas, save_file,
+                              stints=None):
     # Get all possessions in date range
     possessions_in_range = all_possessions[(all_possessions['date'] >= start_date) &
                                            (all_possessions['date'] <= end_date)].copy()
 
     # Calculate RAPM over custom range
-    calculate_rapm(possessions_in_range, player_names_and_ids, folds, lambdas, save_file)
+    calculate_rapm(possessions_in_range, player_names_and_ids, folds, lambdas, save_file, stints=stints)
+
+
+# Calculate RAPM over a custom range of dates from a date index of sufficient statistics
+# The statistics for the range are looked up from the index instead of filtering and refitting the possessions, and
+# the folds split the dates in the range into contiguous groups
+def calculate_rapm_date_range_statistics(date_index, start_date, end_date, player_names_and_ids, folds, lambdas,
+                                         save_file):
+    # Get the statistics for the dates in the range
+    start_day, end_day = date_to_day([start_date, end_date])
+    statistics, fold_statistics = get_date_range_statistics(date_index, start_day, end_day, folds)
+
+    # Fit the players who played in the range and save their RAPM values
+    model, unique_ids = fit_rapm_statistics(statistics, fold_statistics, date_index['players'], lambdas)
+    save_rapms(model, unique_ids, player_names_and_ids, save_file)
+
+
+# Calculate RAPM from possessions read in chunks from a possession matrix or a .csv file
+# Memory depends on the number of players rather than the number of possessions, so any range of seasons can be fit,
+# up to every possession ever
+def calculate_rapm_streaming(chunks, players, player_names_and_ids, folds, lambdas, save_file):
+    # Add up the statistics of every chunk
+    statistics, fold_statistics = get_streaming_statistics(chunks, folds)
+
+    # Fit the players who played and save their RAPM values
+    model, unique_ids = fit_rapm_statistics(statistics, fold_statistics, players, lambdas)
+    save_rapms(model, unique_ids, player_names_and_ids, save_file)
+
+
+# Calculate time-decayed "current form" RAPM as of a date, where each game's weight halves every half life (in days)
+# The decayed statistics are saved after each run with the games in them, so the next run only decays them and adds
+# the games up to the date that are not in them yet, without going back to earlier possessions. Starting from scratch
+# (or when the saved statistics can't be brought forward, see can_update_decayed_statistics) builds the statistics from
+# every game up to the date.
+def calculate_decayed_rapm(possessions, current_date, half_life, decayed_statistics_filename, player_names_and_ids,
+                           folds, lambdas, save_file):
+    current_day = date_to_day([current_date])[0]
+    dates = np.asarray(possessions['dates'])
+
+    # Load the decayed statistics from the last run if they can be updated
+    decayed = None
+    if os.path.exists(decayed_statistics_filename):
+        with open(decayed_statistics_filename, 'rb') as fp:
+            decayed = pickle.load(fp)
+        if not can_update_decayed_statistics(decayed, possessions, current_day, half_life, folds):
+            decayed = None
+
+    # Build the statistics from every game, or update them with the games that are not in them yet
+    if decayed is None:
+        game_index = get_game_index(select_possession_rows(possessions, np.flatnonzero(dates <= current_day)))
+        decayed = get_decayed_statistics(game_index, current_day, half_life, folds)
+    else:
+        new_rows = np.flatnonzero(~np.isin(possessions['game_ids'], decayed['game_ids']) & (dates <= current_day))
+        new_game_index = get_game_index(select_possession_rows(possessions, new_rows)) if len(new_rows) > 0 else None
+        decayed = update_decayed_statistics(decayed, new_game_index, current_day)
+
+    # Save the decayed statistics for the next run
+    with open(decayed_statistics_filename, 'wb') as fp:
+        pickle.dump(decayed, fp)
+
+    # Fit the players who played and save their RAPM values
+    model, unique_ids = fit_rapm_statistics(decayed['statistics'], decayed['fold_statistics'], decayed['players'],
+                                            lambdas)
+    save_rapms(model, unique_ids, player_names_and_ids, save_file)
 
 
 # Calculate RAPM for each range of seasons
-def calculate_x_season_rapms(all_possessions, seasons, season_types, length, player_names_and_ids, folds, lambdas, save_file):
+def calculate_x_season_rapms(all_possessions, seasons, season_types, length, player_names_and_ids, folds, lambdas, save_file,
+                             stints=None):
     # Get possessions for corresponding season types
     all_possessions = all_possessions[all_possessions['season_type'].isin(season_types)]
 
@@ -58,22 +197,95 @@ def calculate_x_season_rapms(all_possessions, seasons, season_types, length, pla
     for i in range(len(seasons) - length + 1):
         print(f'{((i + 1) / (len(seasons) - length + 1)):.2%}: {seasons[i]} to {seasons[i + length - 1]}')
         calculate_rapm_season_range(all_possessions, seasons[i], seasons[i + length - 1], player_names_and_ids, folds,
-                                    lambdas, save_file.format(seasons[i], seasons[i + length - 1]))
+                                    lambdas, save_file.format(seasons[i], seasons[i + length - 1]), stints=stints)
+
+
+# Calculate RAPM for each range of seasons from a possession matrix
+def calculate_x_season_rapms_matrix(matrix, seasons, season_types, length, player_names_and_ids, folds, lambdas,
+                                    save_file, stints=None):
+    # Find RAPM for possessions for the current season range
+    for i in range(len(seasons) - length + 1):
+        print(f'{((i + 1) / (len(seasons) - length + 1)):.2%}: {seasons[i]} to {seasons[i + length - 1]}')
+        possessions = select_possession_matrix_seasons(matrix, seasons[i], seasons[i + length - 1], season_types)
+        calculate_rapm_matrix(possessions, player_names_and_ids, folds, lambdas,
+                              save_file.format(seasons[i], seasons[i + length - 1]), stints=stints)
+
+
+# Calculate the comparison of standard and luck-adjusted RAPM for each range of seasons from the standard and
+# luck-adjusted possession matrices
+def calculate_x_season_luck_adjustment_comparisons_matrix(standard_matrix, luck_adjusted_matrix, seasons, season_types,
+                                                          length, player_names_and_ids, folds, lambdas, save_file):
+    # Find both RAPMs for possessions for the current season range
+    for i in range(len(seasons) - length + 1):
+        print(f'{((i + 1) / (len(seasons) - length + 1)):.2%}: {seasons[i]} to {seasons[i + length - 1]}')
+        standard_possessions = select_possession_matrix_seasons(standard_matrix, seasons[i], seasons[i + length - 1],
+                                                                season_types)
+        luck_adjusted_possessions = select_possession_matrix_seasons(luck_adjusted_matrix, seasons[i],
+                                                                     seasons[i + length - 1], season_types)
+        calculate_luck_adjustment_comparison_matrix(standard_possessions, luck_adjusted_possessions,
+                                                    player_names_and_ids, folds, lambdas,
+                                                    save_file.format(seasons[i], seasons[i + length - 1]))
+
+
+# Calculate RAPM for each range of seasons from the sufficient statistics of each season
+# Each window is the previous window plus the statistics of its newest season minus those of the season that fell out
+# of it, so no window is rebuilt from its possessions
+def calculate_x_season_rapms_statistics(seasons_statistics, players, seasons, season_types, length, player_names_and_ids,
+                                        lambdas, save_file):
+    window = None
+    for i, season in enumerate(seasons):
+        # Add the newest season and subtract the season that fell out of the window
+        for season_type in season_types:
+            window = update_window_statistics(window, seasons_statistics[(season, season_type)], 1)
+            if i >= length:
+                window = update_window_statistics(window, seasons_statistics[(seasons[i - length], season_type)], -1)
+
+        # Find RAPM once the window is full
+        if i >= length - 1:
+            print(f'{((i + 2 - length) / (len(seasons) - length + 1)):.2%}: {seasons[i - length + 1]} to {season}')
+            model, unique_ids = fit_rapm_statistics(window[0], window[1], players, lambdas)
+            save_rapms(model, unique_ids, player_names_and_ids, save_file.format(seasons[i - length + 1], season))
 
 
 if __name__ == '__main__':
     seasons = range(1996, 2024)
     seasons = [f'{season}-{((season % 100) + 1) % 100:02}' for season in seasons]
     season_types = ['Regular Season']
-    all_possessions_filename = '../Data/Possessions/Standard/possessions_all.csv'
-    players_and_ids_filename = '../Data/players_and_ids.csv'
+    possession_matrix_directory = '../Data/Possessions/Standard/Matrix'
+    registry_filename = '../Data/player_registry.csv'
 
-    all_possessions = pd.read_csv(all_possessions_filename)
-    player_names_and_ids = pd.read_csv(players_and_ids_filename)
+    matrix = load_possession_matrix(possession_matrix_directory)
+    player_names_and_ids = load_player_registry(registry_filename)[[player_id, 'PLAYER_NAME']]
 
     # Test different lambda values
     lambdas = [0.01, 0.05, 0.1]
     folds = 5
 
-    calculate_x_season_rapms(all_possessions, seasons, season_types, 1, player_names_and_ids, folds, lambdas,
-                             '../Data/RAPM/Standard/Seasons/rapm_regular_season_{}_{}.csv')
+    # Find the 1, 3, and 5 season RAPMs from the statistics of each season
+    seasons_statistics = get_seasons_statistics(matrix, seasons, season_types, folds)
+    for length in [1, 3, 5]:
+        calculate_x_season_rapms_statistics(seasons_statistics, matrix['players'], seasons, season_types, length,
+                                            player_names_and_ids, lambdas,
+                                            '../Data/RAPM/Standard/Seasons/rapm_regular_season_{}_{}.csv')
+
+    # Find the RAPM over every season at once, streaming the possessions from the matrix
+    calculate_rapm_streaming(get_matrix_chunks(matrix, seasons[0], seasons[-1], season_types), matrix['players'],
+                             player_names_and_ids, folds, lambdas,
+                             '../Data/RAPM/Standard/rapm_regular_season_{}_{}.csv'.format(seasons[0], seasons[-1]))
+
+    # Find the current form RAPM at the end of the 2023-24 regular season, with a 60 day half life
+    calculate_decayed_rapm(select_possession_matrix_seasons(matrix, seasons[-3], seasons[-1], season_types),
+                           '2024-04-14', 60, '../Data/RAPM/Standard/decayed_statistics.pkl', player_names_and_ids,
+                           folds, lambdas, '../Data/RAPM/Standard/rapm_current_form.csv')
+
+    # Compare the 1 season standard and luck-adjusted RAPMs, fitting both from the same design matrix
+    luck_adjusted_matrix = load_possession_matrix('../Data/Possessions/LuckAdjusted/Matrix')
+    calculate_x_season_luck_adjustment_comparisons_matrix(matrix, luck_adjusted_matrix, seasons, season_types, 1,
+                                                          player_names_and_ids, folds, lambdas,
+                                                          '../Data/RAPM/Combined/Seasons/rapm_regular_season_{}_{}.csv')
+
+    # Build the date index once, then find RAPM since the 2024 trade deadline from it
+    date_index = get_date_index(select_possession_matrix_seasons(matrix, seasons[0], seasons[-1], season_types))
+    save_statistics_index(date_index, '../Data/RAPM/Standard/date_index.npz')
+    calculate_rapm_date_range_statistics(date_index, '2024-02-08', '2024-04-14', player_names_and_ids, folds, lambdas,
+                                         '../Data/RAPM/Standard/rapm_since_trade_deadline_2024.csv')
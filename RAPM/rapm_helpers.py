@@ -1,5 +1,5 @@
 import numpy as np
-from scipy.sparse import lil_matrix
+from scipy.sparse import coo_matrix
 
 # Constants used for column names
 offense_player_id = 'offensive_player{}'
@@ -10,46 +10,41 @@ points_column = 'points'
 possessions_column = 'possessions'
 points_per_100_column = 'points_per_100'
 player_id = 'PLAYER_ID'
+game_id_column = 'game_id'
+date_column = 'date'
 
 
 # Get sorted list of unique player IDs from the possessions data
 def find_unique_ids(possessions):
-    players = list(set(
-        list(possessions[offense_player_id.format(1)].unique()) + list(possessions[offense_player_id.format(2)].unique()) +
-        list(possessions[offense_player_id.format(3)].unique()) + list(possessions[offense_player_id.format(4)].unique()) +
-        list(possessions[offense_player_id.format(5)].unique()) + list(possessions[defense_player_id.format(1)].unique()) +
-        list(possessions[defense_player_id.format(2)].unique()) + list(possessions[defense_player_id.format(3)].unique()) +
-        list(possessions[defense_player_id.format(4)].unique()) + list(possessions[defense_player_id.format(5)].unique())
-    ))
-    players.sort()
-    return players
+    return np.unique(possessions[offense_player_ids + defense_player_ids].to_numpy().ravel()).tolist()
 
 
-# Create a sparse encoded row in the training matrix from the possessions matrix
-def create_training_row(row_in, unique_ids):
-    # Initialize a sparse row for efficiency
-    row_out = lil_matrix((1, len(unique_ids) * 2))
+# Create the sparse one-hot encoded training matrix from lineups of player indices, five offensive players and then
+# five defensive players for each row
+# Every nonzero value is written at once from (row, column, value) triplets instead of one row at a time
+def create_design_matrix(lineups, n_players, dtype=np.float32):
+    n_possessions = lineups.shape[0]
 
-    # If player was on offense, set to 1
-    for i in range(5):
-        row_out[0, unique_ids.index(row_in[i])] = 1
+    # If player was on offense, set to 1 in the first half of the columns
+    # If player was on defense, set to -1 in the second half of the columns
+    rows = np.repeat(np.arange(n_possessions), 10)
+    columns = (lineups + np.repeat([0, n_players], 5)).ravel()
+    values = np.tile(np.repeat(np.array([1, -1], dtype=dtype), 5), n_possessions)
 
-    # If player was on defense, set to -1
-    for i in range(5, 10):
-        row_out[0, unique_ids.index(row_in[i]) + len(unique_ids)] = -1
-
-    return row_out
+    return coo_matrix((values, (rows, columns)), shape=(n_possessions, 2 * n_players)).tocsr()
 
 
 # Create the one-hot encoded training set from the possessions data
 def create_training_set(possessions, target_column, unique_ids):
-    # Get the sparse encodings for the player IDs from the possessions data
+    # Map the player IDs from the possessions data to their positions in the sorted unique IDs
     stints_x = possessions[offense_player_ids + defense_player_ids].to_numpy()
+    unique_ids_array = np.asarray(unique_ids)
+    lineups = np.minimum(np.searchsorted(unique_ids_array, stints_x), len(unique_ids_array) - 1)
+    if not np.array_equal(unique_ids_array[lineups], stints_x):
+        raise ValueError('Possessions include players that are not in the unique IDs')
 
-    # Convert each possession to a sparse one-hot encoded row
-    stints_x_sparse = lil_matrix((stints_x.shape[0], len(unique_ids) * 2))
-    for i in range(stints_x.shape[0]):
-        stints_x_sparse[i, :] = create_training_row(stints_x[i, :], unique_ids)
+    # Convert every possession to a sparse one-hot encoded row
+    stints_x_sparse = create_design_matrix(lineups, len(unique_ids))
 
     # Get the target column
     stints_y = possessions[[target_column]].to_numpy()
@@ -58,3 +53,100 @@ def create_training_set(possessions, target_column, unique_ids):
     possessions_vector = possessions[possessions_column].to_numpy()
 
     return stints_x_sparse, stints_y, possessions_vector
+
+
+# Get the points per 100 possessions and the possessions weights for possessions selected from a possession matrix
+# Points can have one column per target, giving points per 100 possessions with the same columns
+def get_matrix_targets(possessions):
+    possessions_vector = np.asarray(possessions['possessions'], dtype=np.float64)
+    points = np.asarray(possessions['points'], dtype=np.float64)
+    if points.ndim == 1:
+        points = points.reshape(-1, 1)
+    stints_y = 100 * points / possessions_vector[:, None]
+    return stints_y, possessions_vector
+
+
+# Combine the same possessions selected from several possession matrices (e.g. standard and luck-adjusted) into one
+# set of possessions with a column of points for each
+# The lineups and number of possessions must be the same in every matrix, so only the points differ
+def stack_matrix_targets(possessions_list):
+    possessions = dict(possessions_list[0])
+    for other in possessions_list[1:]:
+        if (not np.array_equal(other['lineups'], possessions['lineups']) or
+                not np.array_equal(other['possessions'], possessions['possessions'])):
+            raise ValueError('Possessions do not match across possession matrices')
+    possessions['points'] = np.column_stack([other['points'] for other in possessions_list])
+    return possessions
+
+
+# Create the one-hot encoded training set from possessions selected from a possession matrix
+# The lineups are already integer indices, so no player IDs have to be looked up
+def create_training_set_from_matrix(possessions):
+    # Find the players in the possessions and each lineup as indices into them
+    player_indices, lineups = np.unique(possessions['lineups'], return_inverse=True)
+    lineups = lineups.reshape(-1, 10)
+    unique_ids = possessions['players'][player_indices].tolist()
+    n_players = len(unique_ids)
+
+    # Convert every possession to a sparse one-hot encoded row
+    stints_x_sparse = create_design_matrix(lineups, n_players)
+
+    # Calculate the points per 100 possessions
+    stints_y, possessions_vector = get_matrix_targets(possessions)
+
+    return stints_x_sparse, stints_y, possessions_vector, unique_ids
+
+
+# Merge possessions with the same offensive and defensive lineups into stints, weighted by their number of possessions
+# Stints can be merged within each game or across all the possessions given. Fitting on stints gives the same RAPM as
+# fitting on the possessions they were merged from, with a much smaller training set.
+def compress_stints(possessions, by_game=False):
+    group_columns = offense_player_ids + defense_player_ids
+    if by_game:
+        group_columns = [game_id_column] + group_columns
+
+    # Add up the points and possessions for each stint
+    stints = possessions.groupby(group_columns, sort=False, as_index=False).agg(
+        **{points_column: (points_column, 'sum'), possessions_column: (possessions_column, 'sum')})
+
+    # Keep the date of each game
+    if by_game:
+        dates = possessions.drop_duplicates(subset=game_id_column).set_index(game_id_column)[date_column]
+        stints[date_column] = stints[game_id_column].map(dates)
+
+    return stints
+
+
+# Merge possessions selected from a possession matrix into stints, the same way as compress_stints
+# Stints are kept in the order they first appear, like compress_stints, so contiguous cross validation folds of stints
+# are still blocks of time rather than blocks of lineups
+def compress_matrix_stints(possessions, by_game=False):
+    # Find each unique lineup, or each unique lineup in each game
+    keys = np.asarray(possessions['lineups'], dtype=np.int64)
+    if by_game:
+        keys = np.column_stack([possessions['game_ids'], keys])
+    keys, first_rows, stint_rows = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+
+    # Put the stints in the order of their first possessions instead of the order of their lineups
+    order = np.argsort(first_rows)
+    keys = keys[order]
+    first_rows = first_rows[order]
+    stint_positions = np.empty(len(order), dtype=np.int64)
+    stint_positions[order] = np.arange(len(order))
+    stint_rows = stint_positions[stint_rows.ravel()]
+
+    # Add up the points and possessions for each stint
+    stints = {
+        'players': possessions['players'],
+        'lineups': keys[:, -10:].astype(np.int32),
+        'points': np.bincount(stint_rows, weights=possessions['points'], minlength=len(keys)),
+        'possessions': np.bincount(stint_rows, weights=possessions['possessions'], minlength=len(keys)),
+    }
+
+    # Keep the game and date of each stint
+    if by_game:
+        stints['game_ids'] = np.asarray(possessions['game_ids'])[first_rows]
+        stints['dates'] = np.asarray(possessions['dates'])[first_rows]
+
+    return stints
+
@@ -1,4 +1,6 @@
-from sklearn.linear_model import RidgeCV
+from types import SimpleNamespace
+
+from scipy.sparse import diags
 import pandas as pd
 import numpy as np
 
@@ -8,18 +10,144 @@ def lambda_to_alpha(lambda_value, samples):
     return (lambda_value * samples) / 2.0
 
 
+# Get the sufficient statistics of a weighted training set, which are all a ridge regression needs
+# With weights W, these are the Gram matrix XᵀWX, XᵀWy, the weighted column sums Xᵀw, the weighted sums of y and of y²,
+# and the total weight. They are only 2P x 2P no matter how many possessions there are, and the statistics of two sets
+# of rows add up to the statistics of both together.
+# The Gram matrix can be kept sparse for training sets whose columns cover many more players than play together.
+def get_sufficient_statistics(train_x, train_y, weights, sparse=False):
+    train_y = np.asarray(train_y, dtype=np.float64)
+    if train_y.ndim == 1:
+        train_y = train_y.reshape(-1, 1)
+    weights = np.asarray(weights, dtype=np.float64)
+    weighted_x = diags(weights) @ train_x
+    xx = (train_x.T @ weighted_x).tocsr()
+    return {
+        'xx': xx if sparse else xx.toarray(),
+        'xy': np.asarray(weighted_x.T @ train_y),
+        'x': np.asarray(weighted_x.sum(axis=0)).ravel(),
+        'y': weights @ train_y,
+        'yy': weights @ (train_y ** 2),
+        'n': weights.sum(),
+    }
+
+
+# Add the sufficient statistics of two sets of rows
+def add_sufficient_statistics(statistics, added_statistics):
+    return {key: statistics[key] + added_statistics[key] for key in statistics}
+
+
+# Subtract the sufficient statistics of some rows from the sufficient statistics of a set that includes them
+def subtract_sufficient_statistics(statistics, removed_statistics):
+    return {key: statistics[key] - removed_statistics[key] for key in statistics}
+
+
+# Scale the sufficient statistics of a set of rows, as if every row's weight were multiplied by a factor
+def scale_sufficient_statistics(statistics, factor):
+    return {key: statistics[key] * factor for key in statistics}
+
+
+# Keep only some columns of sufficient statistics, as a dense Gram matrix ready to be solved
+def restrict_sufficient_statistics(statistics, columns):
+    xx = statistics['xx'][columns][:, columns]
+    restricted = dict(statistics)
+    restricted['xx'] = xx.toarray() if hasattr(xx, 'toarray') else xx
+    restricted['xy'] = statistics['xy'][columns]
+    restricted['x'] = statistics['x'][columns]
+    return restricted
+
+
+# Get the first and last row of each fold, splitting the rows into contiguous folds the same way as KFold
+def get_fold_bounds(n_rows, folds):
+    fold_sizes = np.full(folds, n_rows // folds)
+    fold_sizes[:n_rows % folds] += 1
+    bounds = np.concatenate([[0], np.cumsum(fold_sizes)])
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+# Solve a ridge regression with an unpenalized intercept for every alpha from sufficient statistics
+# Centering the Gram matrix removes the intercept, and one eigendecomposition of the centered Gram matrix gives the
+# solution for every alpha at the cost of a matrix-vector product each.
+# Returns coefficients with shape (alphas, targets, 2P) and intercepts with shape (alphas, targets).
+def solve_ridge_path(statistics, alphas):
+    # Center the Gram matrix and XᵀWy on the weighted means
+    centered_xx = statistics['xx'] - np.outer(statistics['x'], statistics['x']) / statistics['n']
+    centered_xy = statistics['xy'] - np.outer(statistics['x'], statistics['y']) / statistics['n']
+
+    # Solve for every alpha using the eigendecomposition
+    eigenvalues, eigenvectors = np.linalg.eigh(centered_xx)
+    projected_xy = eigenvectors.T @ centered_xy
+    coefs = np.stack([(eigenvectors @ (projected_xy / (eigenvalues + alpha)[:, None])).T for alpha in alphas])
+
+    # The intercept makes the weighted mean of the predictions equal the weighted mean of y
+    intercepts = (statistics['y'] - coefs @ statistics['x']) / statistics['n']
+
+    return coefs, intercepts
+
+
+# Score ridge regression solutions on a set of rows from its sufficient statistics using the weighted R²
+# Weighting by possessions scores a stint the same as the single possessions it was merged from. This is the score
+# RidgeCV uses with sample weights in recent versions of scikit-learn, but older versions used the unweighted R², so
+# with uneven weights they could choose a different alpha.
+# Returns scores with shape (alphas, targets)
+def score_ridge_path(statistics, coefs, intercepts):
+    # Weighted sum of squared errors, expanded so that it only needs the sufficient statistics
+    squared_errors = (statistics['yy'] - 2 * np.sum(coefs * statistics['xy'].T, axis=2) -
+                      2 * intercepts * statistics['y'] + np.sum(coefs * (coefs @ statistics['xx']), axis=2) +
+                      2 * intercepts * (coefs @ statistics['x']) + intercepts ** 2 * statistics['n'])
+
+    # Weighted total sum of squares
+    total_squares = statistics['yy'] - statistics['y'] ** 2 / statistics['n']
+
+    return 1 - squared_errors / total_squares
+
+
+# Fit a ridge regression from the sufficient statistics of all the rows and of each fold, choosing the alpha with the
+# best mean cross validation score for each target
+def fit_ridge_path(statistics, fold_statistics, alphas):
+    # Fit all the rows with every alpha
+    coefs, intercepts = solve_ridge_path(statistics, alphas)
+    targets = np.arange(coefs.shape[1])
+
+    # A single alpha needs no cross validation, as there is nothing to choose between
+    if len(alphas) == 1:
+        return SimpleNamespace(coef_=coefs[0], intercept_=intercepts[0], alpha_=np.full(len(targets), alphas[0]))
+
+    # Score every alpha on each fold, training on the statistics of all the other folds
+    if len(fold_statistics) < 2:
+        raise ValueError(f'Choosing between {len(alphas)} alphas needs at least 2 folds, got {len(fold_statistics)}')
+    scores = []
+    for test_statistics in fold_statistics:
+        train_statistics = subtract_sufficient_statistics(statistics, test_statistics)
+        scores.append(score_ridge_path(test_statistics, *solve_ridge_path(train_statistics, alphas)))
+    best_alphas = np.argmax(np.mean(scores, axis=0), axis=0)
+
+    # Keep the best alpha for each target
+    return SimpleNamespace(coef_=coefs[best_alphas, targets], intercept_=intercepts[best_alphas, targets],
+                           alpha_=np.asarray(alphas)[best_alphas])
+
+
 # Create a cross validation ridge regression model to fit data
+# The Gram matrix of the whole training set and of each fold is built once, so every lambda is fit from the same
+# small matrices instead of the possessions. The model has coef_ with shape (targets, 2P), intercept_ with shape
+# (targets,), and the chosen alpha_ for each target, and fits the same as RidgeCV with contiguous folds when folds are
+# scored with the weighted R² (see score_ridge_path).
+# Lambdas are scaled by the total number of possessions rather than the number of rows, so stints weighted by their
+# possessions are regularized the same as the single possessions they were merged from
 def make_ridge_model(train_x, train_y, folds, weights, lambdas):
     # Convert lambdas to alphas
-    alphas = [lambda_to_alpha(l, train_x.shape[0]) for l in lambdas]
+    alphas = [lambda_to_alpha(l, np.sum(weights)) for l in lambdas]
 
-    # Create a cross validation ridge regression model
-    model = RidgeCV(alphas=alphas, cv=folds, fit_intercept=True)
+    # Get the sufficient statistics of the whole training set and of each fold
+    train_x = train_x.tocsr()
+    train_y = np.asarray(train_y, dtype=np.float64).reshape(train_x.shape[0], -1)
+    weights = np.asarray(weights, dtype=np.float64)
+    statistics = get_sufficient_statistics(train_x, train_y, weights)
+    fold_statistics = [get_sufficient_statistics(train_x[start:stop], train_y[start:stop], weights[start:stop])
+                       for start, stop in get_fold_bounds(train_x.shape[0], folds)]
 
     # Fit the training data
-    fit_model = model.fit(train_x, train_y, sample_weight=weights)
-
-    return fit_model
+    return fit_ridge_path(statistics, fold_statistics, alphas)
 
 
 # Extract coefficients from the model
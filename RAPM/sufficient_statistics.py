@@ -0,0 +1,386 @@
+from scipy.sparse import coo_matrix
+
+from Possessions.player_registry import ids_to_indices
+from Possessions.possession_matrix import matrix_arrays, select_possession_matrix_seasons
+from rapm_helpers import *
+from ridge import *
+
+# Number of possessions read at a time when streaming possessions
+default_chunksize = 500000
+
+
+# Get the sufficient statistics for possessions from a possession matrix
+# Columns are the registry indices of every player in the matrix rather than only the players in the possessions, so
+# the statistics of any possessions can be added together. The Gram matrix is kept sparse, as only a small share of
+# all players ever play together.
+def get_matrix_statistics(possessions):
+    train_x = create_design_matrix(np.asarray(possessions['lineups']), len(possessions['players']))
+    train_y, weights = get_matrix_targets(possessions)
+    return get_sufficient_statistics(train_x, train_y, weights, sparse=True)
+
+
+# Add up a list of sufficient statistics
+def sum_sufficient_statistics(statistics_list):
+    total = statistics_list[0]
+    for statistics in statistics_list[1:]:
+        total = add_sufficient_statistics(total, statistics)
+    return total
+
+
+# Get the sufficient statistics for a single season and season type, along with the statistics of each of its folds
+# Each season is split into contiguous folds, so the folds of a range of seasons are the sums of the same fold of each
+# season
+def get_season_statistics(matrix, season, season_type, folds):
+    possessions = select_possession_matrix_seasons(matrix, season, season, [season_type])
+    fold_statistics = []
+    for start, stop in get_fold_bounds(len(possessions['lineups']), folds):
+        fold_possessions = {key: value[start:stop] for key, value in possessions.items() if key != 'players'}
+        fold_possessions['players'] = possessions['players']
+        fold_statistics.append(get_matrix_statistics(fold_possessions))
+    return sum_sufficient_statistics(fold_statistics), fold_statistics
+
+
+# Get the sufficient statistics for every season and season type, keyed by (season, season type)
+def get_seasons_statistics(matrix, seasons, season_types, folds):
+    seasons_statistics = {}
+    for season in seasons:
+        for season_type in season_types:
+            print(f'Statistics: {season} {season_type}')
+            seasons_statistics[(season, season_type)] = get_season_statistics(matrix, season, season_type, folds)
+    return seasons_statistics
+
+
+# Get the registry indices of the players who played in some sufficient statistics, and the offensive and defensive
+# columns for them
+def get_active_players(statistics, n_players):
+    diagonal = statistics['xx'].diagonal()
+    players = np.flatnonzero((diagonal[:n_players] > 0) | (diagonal[n_players:] > 0))
+    return players, np.concatenate([players, players + n_players])
+
+
+# Fit RAPM from sufficient statistics and the statistics of each fold, keeping only the players who played
+# Returns the ridge regression model and the player IDs for its coefficients
+def fit_rapm_statistics(statistics, fold_statistics, players, lambdas):
+    # Keep only the columns of players who played
+    active_players, columns = get_active_players(statistics, len(players))
+    statistics = restrict_sufficient_statistics(statistics, columns)
+    fold_statistics = [restrict_sufficient_statistics(fold, columns) for fold in fold_statistics]
+
+    # Convert lambdas to alphas and fit
+    alphas = [lambda_to_alpha(l, statistics['n']) for l in lambdas]
+    model = fit_ridge_path(statistics, fold_statistics, alphas)
+
+    return model, players[active_players].tolist()
+
+
+# Add or subtract the sufficient statistics of a season to the statistics of a window of seasons
+def update_window_statistics(window, season_statistics, sign):
+    update = add_sufficient_statistics if sign > 0 else subtract_sufficient_statistics
+    statistics, fold_statistics = season_statistics
+    if window is None:
+        return season_statistics
+    return (update(window[0], statistics),
+            [update(window_fold, fold) for window_fold, fold in zip(window[1], fold_statistics)])
+
+
+# Select some rows of possessions from a possession matrix
+def select_possession_rows(possessions, rows):
+    selected = {key: np.asarray(value)[rows] for key, value in possessions.items() if key != 'players'}
+    selected['players'] = possessions['players']
+    return selected
+
+
+# Build an index of the sufficient statistics of each group of possessions (e.g. each game or each date)
+# The statistics of each group are stored one after another in order of the groups: the nonzero entries of the Gram
+# matrix, Xᵀw, and XᵀWy as (position, value) lists with the position where each group starts, and the scalar statistics
+# as one row per group. Any set of groups, or any weighting of them, can then be added up without the possessions.
+def get_group_index(possessions, groups):
+    # Sort the possessions by group
+    groups = np.asarray(groups)
+    order = np.argsort(groups, kind='stable')
+    unique_groups, group_starts = np.unique(groups[order], return_index=True)
+    group_bounds = np.append(group_starts, len(order))
+
+    # Get the statistics for each group
+    entries = {'xx_rows': [], 'xx_columns': [], 'xx_values': [], 'x_index': [], 'x_values': [], 'xy_index': [],
+               'xy_values': [], 'y': [], 'yy': [], 'n': []}
+    for start, stop in zip(group_bounds[:-1], group_bounds[1:]):
+        statistics = get_matrix_statistics(select_possession_rows(possessions, order[start:stop]))
+        xx = statistics['xx'].tocoo()
+        entries['xx_rows'].append(xx.row)
+        entries['xx_columns'].append(xx.col)
+        entries['xx_values'].append(xx.data)
+        x_index = np.flatnonzero(statistics['x'])
+        entries['x_index'].append(x_index)
+        entries['x_values'].append(statistics['x'][x_index])
+        xy_index = np.flatnonzero(np.any(statistics['xy'] != 0, axis=1))
+        entries['xy_index'].append(xy_index)
+        entries['xy_values'].append(statistics['xy'][xy_index])
+        entries['y'].append(statistics['y'])
+        entries['yy'].append(statistics['yy'])
+        entries['n'].append(statistics['n'])
+
+    # Store the lists one after another with the position where each group starts
+    group_index = {'groups': unique_groups, 'players': possessions['players']}
+    for name in ['xx', 'x', 'xy']:
+        lengths = [len(values) for values in entries[f'{name}_values']]
+        group_index[f'{name}_offsets'] = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    for name in ['xx_rows', 'xx_columns', 'xx_values', 'x_index', 'x_values', 'xy_index', 'xy_values']:
+        group_index[name] = np.concatenate(entries[name])
+    for name in ['y', 'yy', 'n']:
+        group_index[name] = np.array(entries[name])
+
+    return group_index
+
+
+# Build a date index of sufficient statistics for possessions from a possession matrix
+# The statistics of each game date are stored in date order, with the scalar statistics as cumulative sums, so the
+# statistics for any range of dates are a contiguous slice of each list, found with two lookups
+def get_date_index(possessions):
+    date_index = get_group_index(possessions, possessions['dates'])
+    date_index['dates'] = date_index.pop('groups')
+
+    # Store the scalar statistics as cumulative sums, starting from zero before the first date
+    for name in ['y', 'yy', 'n']:
+        values = date_index[name]
+        date_index[name] = np.concatenate([np.zeros((1, *values.shape[1:])), np.cumsum(values, axis=0)])
+
+    return date_index
+
+
+# Build a game index of sufficient statistics for possessions from a possession matrix, with the date of each game
+def get_game_index(possessions):
+    game_index = get_group_index(possessions, possessions['game_ids'])
+    game_index['game_ids'] = game_index.pop('groups')
+    _, first_rows = np.unique(np.asarray(possessions['game_ids']), return_index=True)
+    game_index['dates'] = np.asarray(possessions['dates'])[first_rows]
+    return game_index
+
+
+# Save an index of sufficient statistics to a .npz file
+def save_statistics_index(statistics_index, statistics_index_filename):
+    np.savez(statistics_index_filename, **statistics_index)
+
+
+# Load an index of sufficient statistics from a .npz file
+def load_statistics_index(statistics_index_filename):
+    with np.load(statistics_index_filename) as statistics_index:
+        return {name: statistics_index[name] for name in statistics_index.files}
+
+
+# Add up the sufficient statistics of every group in a game index, each scaled by its own weight
+# A weight of zero leaves a game out, so this also gives the statistics of any set of games
+def get_weighted_game_statistics(game_index, weights):
+    n_columns = 2 * len(game_index['players'])
+    weights = np.asarray(weights, dtype=np.float64)
+
+    # Scale each entry by the weight of its game
+    xx_weights = np.repeat(weights, np.diff(game_index['xx_offsets']))
+    x_weights = np.repeat(weights, np.diff(game_index['x_offsets']))
+    xy_weights = np.repeat(weights, np.diff(game_index['xy_offsets']))
+
+    # Add up the scaled entries
+    xx = coo_matrix((game_index['xx_values'] * xx_weights, (game_index['xx_rows'], game_index['xx_columns'])),
+                    shape=(n_columns, n_columns)).tocsr()
+    x = np.bincount(game_index['x_index'], weights=game_index['x_values'] * x_weights, minlength=n_columns)
+    xy = np.zeros((n_columns, game_index['xy_values'].shape[1]))
+    np.add.at(xy, game_index['xy_index'], game_index['xy_values'] * xy_weights[:, None])
+
+    return {
+        'xx': xx,
+        'xy': xy,
+        'x': x,
+        'y': weights @ game_index['y'],
+        'yy': weights @ game_index['yy'],
+        'n': weights @ game_index['n'],
+    }
+
+
+# Get the sufficient statistics of every game in a game index, each scaled by its own weight, along with the statistics
+# of each fold, where the folds split the games into contiguous groups
+def get_weighted_game_folds_statistics(game_index, weights, folds):
+    fold_statistics = []
+    for start, stop in get_fold_bounds(len(game_index['game_ids']), folds):
+        fold_weights = np.zeros(len(game_index['game_ids']))
+        fold_weights[start:stop] = np.asarray(weights, dtype=np.float64)[start:stop]
+        fold_statistics.append(get_weighted_game_statistics(game_index, fold_weights))
+    return sum_sufficient_statistics(fold_statistics), fold_statistics
+
+
+# Get the sufficient statistics for the dates between two positions in a date index
+def get_date_positions_statistics(date_index, first, last):
+    n_columns = 2 * len(date_index['players'])
+
+    # Add up the Gram matrix entries of each date, summing entries repeated across dates
+    xx_start, xx_stop = date_index['xx_offsets'][first], date_index['xx_offsets'][last]
+    xx = coo_matrix((date_index['xx_values'][xx_start:xx_stop],
+                     (date_index['xx_rows'][xx_start:xx_stop], date_index['xx_columns'][xx_start:xx_stop])),
+                    shape=(n_columns, n_columns)).tocsr()
+
+    # Add up the entries of Xᵀw and XᵀWy of each date
+    x_start, x_stop = date_index['x_offsets'][first], date_index['x_offsets'][last]
+    x = np.bincount(date_index['x_index'][x_start:x_stop], weights=date_index['x_values'][x_start:x_stop],
+                    minlength=n_columns)
+    xy_start, xy_stop = date_index['xy_offsets'][first], date_index['xy_offsets'][last]
+    xy = np.zeros((n_columns, date_index['xy_values'].shape[1]))
+    np.add.at(xy, date_index['xy_index'][xy_start:xy_stop], date_index['xy_values'][xy_start:xy_stop])
+
+    return {
+        'xx': xx,
+        'xy': xy,
+        'x': x,
+        'y': date_index['y'][last] - date_index['y'][first],
+        'yy': date_index['yy'][last] - date_index['yy'][first],
+        'n': date_index['n'][last] - date_index['n'][first],
+    }
+
+
+# Get the sufficient statistics for a range of dates (as days since 1970-01-01, inclusive) from a date index, along
+# with the statistics of each fold, where the folds split the dates in the range into contiguous groups
+# A date is never split between folds, so there are at most as many folds as dates in the range
+def get_date_range_statistics(date_index, start_day, end_day, folds):
+    first = np.searchsorted(date_index['dates'], start_day, side='left')
+    last = np.searchsorted(date_index['dates'], end_day, side='right')
+    if last == first:
+        raise ValueError(f'No possessions between days {start_day} and {end_day}')
+    fold_statistics = [get_date_positions_statistics(date_index, first + start, first + stop)
+                       for start, stop in get_fold_bounds(last - first, min(folds, last - first))]
+    return sum_sufficient_statistics(fold_statistics), fold_statistics
+
+
+# Get the rows of a possession matrix for a range of seasons and season types in chunks
+# Each chunk is a slice of the memory mapped arrays, so only the chunk being used is ever read into memory
+def get_matrix_chunks(matrix, start_season, end_season, season_types, chunksize=default_chunksize):
+    seasons = matrix['seasons']
+    seasons = seasons[(seasons['season'] >= start_season) & (seasons['season'] <= end_season) &
+                      (seasons['season_type'].isin(season_types))]
+    for season_start, season_stop in zip(seasons['start'], seasons['stop']):
+        for start in range(season_start, season_stop, chunksize):
+            stop = min(start + chunksize, season_stop)
+            chunk = {name: matrix[name][start:stop] for name in matrix_arrays}
+            chunk['players'] = matrix['players']
+            yield chunk
+
+
+# Read combined possessions from a .csv file in chunks, in the same form as rows of a possession matrix
+# Players are given their indices in the player registry, so the statistics of every chunk have the same columns
+def read_possessions_chunks(possessions_filename, registry, season_types=None, chunksize=default_chunksize):
+    players = registry[player_id].to_numpy()
+    columns = offense_player_ids + defense_player_ids + [points_column, possessions_column, 'season_type']
+    for possessions in pd.read_csv(possessions_filename, usecols=columns, chunksize=chunksize):
+        if season_types is not None:
+            possessions = possessions[possessions['season_type'].isin(season_types)]
+        if len(possessions) == 0:
+            continue
+        yield {
+            'players': players,
+            'lineups': ids_to_indices(registry, possessions[offense_player_ids + defense_player_ids].to_numpy()),
+            'points': possessions[points_column].to_numpy(dtype=np.float64),
+            'possessions': possessions[possessions_column].to_numpy(dtype=np.float64),
+        }
+
+
+# Get the sufficient statistics of possessions read in chunks, along with the statistics of each fold
+# Each chunk is split into contiguous folds and each piece is added to the same fold as the others, so only one chunk
+# and the sparse statistics, which grow with the number of players rather than possessions, are in memory at once
+def get_streaming_statistics(chunks, folds):
+    fold_statistics = None
+    for i, chunk in enumerate(chunks):
+        print(f'Chunk {i + 1}')
+        chunk_statistics = []
+        for start, stop in get_fold_bounds(len(chunk['lineups']), folds):
+            fold_possessions = {key: value[start:stop] for key, value in chunk.items() if key != 'players'}
+            fold_possessions['players'] = chunk['players']
+            chunk_statistics.append(get_matrix_statistics(fold_possessions))
+        if fold_statistics is None:
+            fold_statistics = chunk_statistics
+        else:
+            fold_statistics = [add_sufficient_statistics(fold, added)
+                               for fold, added in zip(fold_statistics, chunk_statistics)]
+    return sum_sufficient_statistics(fold_statistics), fold_statistics
+
+
+# Get the exponential time decay weight of each game as of a day, halving every half life (in days)
+# Games after the day get no weight
+def get_decay_weights(game_days, current_day, half_life):
+    ages = current_day - np.asarray(game_days, dtype=np.float64)
+    return np.where(ages >= 0, 0.5 ** (np.maximum(ages, 0) / half_life), 0.0)
+
+
+# Get time-decayed sufficient statistics as of a day from a game index, along with the statistics of each fold
+# Games are put in folds by their game IDs, so new games can be added to the same folds later
+def get_decayed_statistics(game_index, current_day, half_life, folds):
+    weights = get_decay_weights(game_index['dates'], current_day, half_life)
+    game_folds = np.asarray(game_index['game_ids']) % folds
+    fold_statistics = [get_weighted_game_statistics(game_index, np.where(game_folds == fold, weights, 0.0))
+                       for fold in range(folds)]
+    return {
+        'day': current_day,
+        'half_life': half_life,
+        'players': np.asarray(game_index['players']),
+        'game_ids': np.sort(np.asarray(game_index['game_ids'])),
+        'statistics': sum_sufficient_statistics(fold_statistics),
+        'fold_statistics': fold_statistics,
+    }
+
+
+# Pad sufficient statistics for the players in a registry to the players in a larger registry, where new players were
+# added after the old ones
+# The new players have no possessions, so their rows and columns are all zero
+def pad_player_statistics(statistics, n_players, new_n_players):
+    columns = np.concatenate([np.arange(n_players), np.arange(n_players) + new_n_players])
+    xx = statistics['xx'].tocoo()
+    padded = dict(statistics)
+    padded['xx'] = coo_matrix((xx.data, (columns[xx.row], columns[xx.col])),
+                              shape=(2 * new_n_players, 2 * new_n_players)).tocsr()
+    padded['xy'] = np.zeros((2 * new_n_players, statistics['xy'].shape[1]))
+    padded['xy'][columns] = statistics['xy']
+    padded['x'] = np.zeros(2 * new_n_players)
+    padded['x'][columns] = statistics['x']
+    return padded
+
+
+# Bring time-decayed sufficient statistics forward to a new day, adding the games played since
+# Every earlier game decays by the same factor, so the old statistics are scaled once and the new games are added with
+# their own weights, without going back to earlier games. If players were added to the registry since, the old
+# statistics are padded to the new players first.
+def update_decayed_statistics(decayed, new_game_index, current_day):
+    factor = 0.5 ** ((current_day - decayed['day']) / decayed['half_life'])
+    statistics = scale_sufficient_statistics(decayed['statistics'], factor)
+    fold_statistics = [scale_sufficient_statistics(fold, factor) for fold in decayed['fold_statistics']]
+    players = decayed['players']
+    game_ids = decayed['game_ids']
+
+    # Add the new games
+    if new_game_index is not None:
+        new_players = np.asarray(new_game_index['players'])
+        if len(new_players) > len(players):
+            statistics = pad_player_statistics(statistics, len(players), len(new_players))
+            fold_statistics = [pad_player_statistics(fold, len(players), len(new_players)) for fold in fold_statistics]
+            players = new_players
+        new = get_decayed_statistics(new_game_index, current_day, decayed['half_life'], len(fold_statistics))
+        statistics = add_sufficient_statistics(statistics, new['statistics'])
+        fold_statistics = [add_sufficient_statistics(fold, new_fold)
+                           for fold, new_fold in zip(fold_statistics, new['fold_statistics'])]
+        game_ids = np.union1d(game_ids, new['game_ids'])
+
+    return {
+        'day': current_day,
+        'half_life': decayed['half_life'],
+        'players': players,
+        'game_ids': game_ids,
+        'statistics': statistics,
+        'fold_statistics': fold_statistics,
+    }
+
+
+# Check if time-decayed statistics saved by an earlier run can be brought forward for possessions as of a day
+# They can't if the half life or folds changed, if they are from a later day, if players other than new ones were added
+# to the end of the registry, or if any game in them is no longer in the possessions (e.g. the seasons changed)
+def can_update_decayed_statistics(decayed, possessions, current_day, half_life, folds):
+    players = np.asarray(possessions['players'])
+    n_players = len(decayed['players'])
+    return (decayed['half_life'] == half_life and len(decayed['fold_statistics']) == folds and
+            decayed['day'] <= current_day and len(players) >= n_players and
+            np.array_equal(players[:n_players], decayed['players']) and
+            np.all(np.isin(decayed['game_ids'], possessions['game_ids'])))
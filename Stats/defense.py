@@ -1,6 +1,4 @@
 import pickle
-import time
-import traceback
 
 from api_helpers import *
 
@@ -25,9 +23,6 @@ def get_defense_stats_single_day(date, season, season_type, defense_category, sa
     defense_stats = extract_data(url)
     defense_stats.to_csv(save_filename.format(defense_category, season, season_type, date), index=False)
 
-    # Sleep for 0.75 seconds to stay under the rate limit
-    time.sleep(0.75)
-
 
 # Get defense stats day-by-day for multiple seasons
 def get_defense_stats_every_day(seasons, season_types, schedule_filename, save_filename, fail_filename):
@@ -39,20 +34,25 @@ def get_defense_stats_every_day(seasons, season_types, schedule_filename, save_f
 
             # Extract the dates from the schedule
             dates = schedule['GAME_DATE'].unique()
-            n_dates = len(dates)
-            n_defense_categories = len(defense_categories)
+
+            # Build the URL and save file for each day and defense category in schedule
+            urls = []
+            save_filenames = []
+            keys = []
+            for date in dates:
+                for defense_category in defense_categories:
+                    urls.append(defense_url.format(start_date=date,
+                                                   end_date=date,
+                                                   per_mode='Totals',
+                                                   defense_category=defense_category,
+                                                   season=season,
+                                                   season_type=season_type))
+                    save_filenames.append(save_filename.format(defense_category, season, season_type, date))
+                    keys.append(date)
 
             # Get defense stats for each day in schedule
-            for i, date in enumerate(dates):
-                for j, defense_category in enumerate(defense_categories):
-                    print(f'{((i * n_defense_categories + j) / (n_dates * n_defense_categories)):.2%} '
-                          f'{season} {season_type}: {date} {defense_category}')
-                    try:
-                        get_defense_stats_single_day(date, season, season_type, defense_category, save_filename)
-                    except Exception as error:
-                        print(error)
-                        traceback.print_exc()
-                        failed_dates[date] = str(error), traceback.format_exc()
+            print(f'{season} {season_type}: {len(urls)} requests')
+            failed_dates.update(save_data_batch(urls, save_filenames, keys))
 
         # Save failed dates
         with open(fail_filename, 'wb') as fp:
@@ -73,35 +73,27 @@ def get_defense_stats_whole_season(season, season_type, defense_category, save_f
     defense_stats = extract_data(url)
     defense_stats.to_csv(save_filename.format(defense_category, season, season_type), index=False)
 
-    # Sleep for 0.75 seconds to stay under the rate limit
-    time.sleep(0.75)
-
 
 # Get defense stats for entire seasons
 def get_defense_stats_seasons(seasons, season_types, save_filename, fail_filename):
-    # Keep track of failed seasons
-    failed_seasons = {}
-
-    # Constants for finding completion percentage
-    n_seasons = len(seasons)
-    n_season_types = len(season_types)
-    n_defense_categories = len(defense_categories)
-
-    # Get defense stats for each season
-    for i, season in enumerate(seasons):
-        for j, season_type in enumerate(season_types):
-            for k, defense_category in enumerate(defense_categories):
-                percent_done = (((i * n_season_types * n_defense_categories) + (j * n_defense_categories) + k) /
-                                (n_seasons * n_season_types * n_defense_categories))
-                print(f'{percent_done:.2%} {season} {season_type}: {defense_category}')
-
-                # Get defense stats
-                try:
-                    get_defense_stats_whole_season(season, season_type, defense_category, save_filename)
-                except Exception as error:
-                    print(error)
-                    traceback.print_exc()
-                    failed_seasons[f'{season} {season_type} {defense_category}'] = str(error), traceback.format_exc()
+    # Build the URL and save file for each season, season type, and defense category
+    urls = []
+    save_filenames = []
+    keys = []
+    for season in seasons:
+        for season_type in season_types:
+            for defense_category in defense_categories:
+                urls.append(defense_url.format(start_date='',
+                                               end_date='',
+                                               per_mode='Totals',
+                                               defense_category=defense_category,
+                                               season=season,
+                                               season_type=season_type))
+                save_filenames.append(save_filename.format(defense_category, season, season_type))
+                keys.append(f'{season} {season_type} {defense_category}')
+
+    # Get defense stats, keeping track of failed seasons
+    failed_seasons = save_data_batch(urls, save_filenames, keys)
 
     # Save failed seasons
     with open(fail_filename, 'wb') as fp:
@@ -1,6 +1,4 @@
 import pickle
-import time
-import traceback
 
 from api_helpers import *
 
@@ -25,9 +23,6 @@ def get_general_stats_single_day(date, season, season_type, measure_type, save_f
     general_stats = extract_data(url)
     general_stats.to_csv(save_filename.format(measure_type, season, season_type, date), index=False)
 
-    # Sleep for 0.75 seconds to stay under the rate limit
-    time.sleep(0.75)
-
 
 # Get general stats day-by-day for multiple seasons
 def get_general_stats_every_day(seasons, season_types, schedule_filename, save_filename, fail_filename):
@@ -39,19 +34,25 @@ def get_general_stats_every_day(seasons, season_types, schedule_filename, save_f
 
             # Extract the dates from the schedule
             dates = schedule['GAME_DATE'].unique()
-            n_dates = len(dates)
-            n_types = len(measure_types)
+
+            # Build the URL and save file for each day and measure type in schedule
+            urls = []
+            save_filenames = []
+            keys = []
+            for date in dates:
+                for measure_type in measure_types:
+                    urls.append(general_url.format(start_date=date,
+                                                   end_date=date,
+                                                   per_mode='Totals',
+                                                   measure_type=measure_type,
+                                                   season=season,
+                                                   season_type=season_type))
+                    save_filenames.append(save_filename.format(measure_type, season, season_type, date))
+                    keys.append(date)
 
             # Get general stats for each day in schedule
-            for i, date in enumerate(dates):
-                for j, measure_type in enumerate(measure_types):
-                    print(f'{((i * n_types + j) / (n_dates * n_types)):.2%} {season} {season_type}: {date} {measure_type}')
-                    try:
-                        get_general_stats_single_day(date, season, season_type, measure_type, save_filename)
-                    except Exception as error:
-                        print(error)
-                        traceback.print_exc()
-                        failed_dates[date] = str(error), traceback.format_exc()
+            print(f'{season} {season_type}: {len(urls)} requests')
+            failed_dates.update(save_data_batch(urls, save_filenames, keys))
 
         # Save failed dates
         with open(fail_filename, 'wb') as fp:
@@ -72,35 +73,27 @@ def get_general_stats_whole_season(season, season_type, measure_type, save_filen
     general_stats = extract_data(url)
     general_stats.to_csv(save_filename.format(measure_type, season, season_type), index=False)
 
-    # Sleep for 0.75 seconds to stay under the rate limit
-    time.sleep(0.75)
-
 
 # Get general stats for entire seasons
 def get_general_stats_seasons(seasons, season_types, save_filename, fail_filename):
-    # Keep track of failed seasons
-    failed_seasons = {}
-
-    # Constants for finding completion percentage
-    n_seasons = len(seasons)
-    n_season_types = len(season_types)
-    n_measure_types = len(measure_types)
-
-    # Get general stats for each season
-    for i, season in enumerate(seasons):
-        for j, season_type in enumerate(season_types):
-            for k, measure_type in enumerate(measure_types):
-                percent_done = (((i * n_season_types * n_measure_types) + (j * n_measure_types) + k) /
-                                (n_seasons * n_season_types * n_measure_types))
-                print(f'{percent_done:.2%} {season} {season_type}: {measure_type}')
-
-                # Get general stats
-                try:
-                    get_general_stats_whole_season(season, season_type, measure_type, save_filename)
-                except Exception as error:
-                    print(error)
-                    traceback.print_exc()
-                    failed_seasons[f'{season} {season_type} {measure_type}'] = str(error), traceback.format_exc()
+    # Build the URL and save file for each season, season type, and measure type
+    urls = []
+    save_filenames = []
+    keys = []
+    for season in seasons:
+        for season_type in season_types:
+            for measure_type in measure_types:
+                urls.append(general_url.format(start_date='',
+                                               end_date='',
+                                               per_mode='Totals',
+                                               measure_type=measure_type,
+                                               season=season,
+                                               season_type=season_type))
+                save_filenames.append(save_filename.format(measure_type, season, season_type))
+                keys.append(f'{season} {season_type} {measure_type}')
+
+    # Get general stats, keeping track of failed seasons
+    failed_seasons = save_data_batch(urls, save_filenames, keys)
 
     # Save failed seasons
     with open(fail_filename, 'wb') as fp:
@@ -1,6 +1,4 @@
 import pickle
-import time
-import traceback
 
 from api_helpers import *
 
@@ -23,41 +21,31 @@ def get_hustle_stats_single_day(date, season, season_type, save_filename):
     hustle_stats = extract_data(url)
     hustle_stats.to_csv(save_filename.format(season, season_type, date), index=False)
 
-    # Sleep for 0.75 seconds to stay under the rate limit
-    time.sleep(0.75)
-
 
 # Get hustle stats day-by-day for multiple seasons
 def get_hustle_stats_every_day(seasons, season_types, schedule_filename, save_filename, fail_filename):
     # Keep track of failed dates
     failed_dates = {}
 
-    # Constants for calculating completion percentage
-    n_seasons = len(seasons)
-    n_season_types = len(season_types)
-
-    for i, season in enumerate(seasons):
-        for j, season_type in enumerate(season_types):
+    for season in seasons:
+        for season_type in season_types:
             # Read schedule
             schedule = pd.read_csv(schedule_filename.format(season, season_type), dtype=str)
 
             # Extract the dates from the schedule
             dates = schedule['GAME_DATE'].unique()
-            n_dates = len(dates)
+
+            # Build the URL and save file for each day in schedule
+            urls = [hustle_url.format(start_date=date,
+                                      end_date=date,
+                                      per_mode='Totals',
+                                      season=season,
+                                      season_type=season_type) for date in dates]
+            save_filenames = [save_filename.format(season, season_type, date) for date in dates]
 
             # Get hustle stats for each day in schedule
-            for k, date in enumerate(dates):
-                percent_done = (((i * n_season_types * n_dates) + (j * n_dates) + k) /
-                                (n_seasons * n_season_types * n_dates))
-                print(f'{percent_done:.2%} {season} {season_type}: {date}')
-
-                # Get hustle stats
-                try:
-                    get_hustle_stats_single_day(date, season, season_type, save_filename)
-                except Exception as error:
-                    print(error)
-                    traceback.print_exc()
-                    failed_dates[date] = str(error), traceback.format_exc()
+            print(f'{season} {season_type}: {len(urls)} requests')
+            failed_dates.update(save_data_batch(urls, save_filenames, list(dates)))
 
         # Save failed seasons
         with open(fail_filename, 'wb') as fp:
@@ -77,32 +65,25 @@ def get_hustle_stats_whole_season(season, season_type, save_filename):
     hustle_stats = extract_data(url)
     hustle_stats.to_csv(save_filename.format(season, season_type), index=False)
 
-    # Sleep for 0.75 seconds to stay under the rate limit
-    time.sleep(0.75)
-
 
 # Get hustle stats for entire seasons
 def get_hustle_stats_seasons(seasons, season_types, save_filename, fail_filename):
-    # Keep track of failed seasons
-    failed_seasons = {}
-
-    # Constants for finding completion percentage
-    n_seasons = len(seasons)
-    n_season_types = len(season_types)
-
-    # Get hustle stats for each season
-    for i, season in enumerate(seasons):
-        for j, season_type in enumerate(season_types):
-            percent_done = ((i * n_season_types + j) / (n_seasons * n_season_types))
-            print(f'{percent_done:.2%} {season} {season_type}')
-
-            # Get hustle stats
-            try:
-                get_hustle_stats_whole_season(season, season_type, save_filename)
-            except Exception as error:
-                print(error)
-                traceback.print_exc()
-                failed_seasons[f'{season} {season_type}'] = str(error), traceback.format_exc()
+    # Build the URL and save file for each season and season type
+    urls = []
+    save_filenames = []
+    keys = []
+    for season in seasons:
+        for season_type in season_types:
+            urls.append(hustle_url.format(start_date='',
+                                          end_date='',
+                                          per_mode='Totals',
+                                          season=season,
+                                          season_type=season_type))
+            save_filenames.append(save_filename.format(season, season_type))
+            keys.append(f'{season} {season_type}')
+
+    # Get hustle stats, keeping track of failed seasons
+    failed_seasons = save_data_batch(urls, save_filenames, keys)
 
     # Save failed dates
     with open(fail_filename, 'wb') as fp:
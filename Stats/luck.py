@@ -4,7 +4,8 @@ import pickle
 import pandas as pd
 
 from Possessions.play_by_play_helpers import *
-from Possessions.make_possessions import string_to_list
+from Possessions.event_lineups import add_event_lineups, read_event_lineups, team_id_columns, team_player_columns
+from Possessions.play_by_play_store import read_play_by_play
 
 # Initial data structure for storing shooting splits for a player based on which teammates and opponents are on floor
 initial_shooting_splits_with_players_on_court = {
@@ -62,7 +63,7 @@ initial_luck_splits = {
 # Get shooting splits for each player, split based on who was on the court for the shot
 # First key is shooter ID, second key is ID for players who were on the court for the shot
 def get_shooting_splits_with_players_on_court_single_season(season, season_type, schedule_filename,
-                                                            play_by_play_filename, period_starters_filename,
+                                                            play_by_play_filename, lineups_filename,
                                                             teammates_and_opponents_filename):
     # Get the schedule for the season
     schedule = pd.read_csv(schedule_filename.format(season, season_type), dtype=str)
@@ -79,65 +80,37 @@ def get_shooting_splits_with_players_on_court_single_season(season, season_type,
         print(f'{((i + 1) / n_games):.2%} {season} {season_type}: {game_id}')
 
         # Get the play-by-play for the game
-        play_by_play = pd.read_csv(play_by_play_filename.format(game_id))
-
-        # Get the starters for each period of the game
-        period_starters = pd.read_csv(period_starters_filename.format(game_id))
+        play_by_play = read_play_by_play(game_id, play_by_play_filename)
 
         # Fill NA descriptions with empty strings
         play_by_play[home_description] = play_by_play[home_description].fillna("")
         play_by_play[neutral_description] = play_by_play[home_description].fillna("")
         play_by_play[away_description] = play_by_play[away_description].fillna("")
 
-        # Keep track of the players on the court for each team for each period
-        sub_map = {}
-
-        # Pre-populate the map with the players at the start of each period
-        for _, period in period_starters.iterrows():
-            sub_map[period[period_column]] = {period['TEAM_ID_1']: string_to_list(period['TEAM_1_PLAYERS']),
-                                              period['TEAM_ID_2']: string_to_list(period['TEAM_2_PLAYERS'])}
+        # Classify every event
+        classify_events(play_by_play)
 
-        # Get team IDs for both teams
-        team_ids = [period_starters.iloc[0]['TEAM_ID_1'], period_starters.iloc[0]['TEAM_ID_2']]
+        # Add the players on the court for every event
+        add_event_lineups(play_by_play, read_event_lineups(game_id, lineups_filename))
 
         # Loop over each event in the play-by-play
         for _, event in play_by_play.iterrows():
-            # Get the period for the event
-            period = event[period_column]
-
             # Get the type of event
-            e_type = EventType.from_number(event[event_type])
-
-            # If the event is a substitution, sub out the players on the court
-            if e_type == EventType.Substitution:
-                # Get the team who is substituting
-                team_id = event[player1_team_id]
-
-                # Get substitution players
-                player_in = str(event[player2_id])
-                player_out = str(event[player1_id])
-
-                # Get players on court before substitution
-                players = sub_map[period][team_id]
-
-                # Replace player being subbed out with player being subbed in
-                players[players.index(player_out)] = player_in
-
-                # Sort the new list of players
-                players.sort()
-
-                # Update the players on the court
-                sub_map[period][team_id] = players
+            e_type = EventType.from_number(event[event_type_code])
 
             # If the event is a three-point shot attempt or a free throw attempt
-            elif is_three(event) or e_type == EventType.FreeThrow:
+            if e_type != EventType.Substitution and (is_three(event) or e_type == EventType.FreeThrow):
                 # Get the shooter, team of the shooter, and opposing team
                 shooter_id = event[player1_id]
                 shooter_team_id = int(event[player1_team_id])
-                if shooter_team_id == team_ids[0]:
-                    opponent_team_id = team_ids[1]
-                else:
-                    opponent_team_id = team_ids[0]
+                team_ids = [event[team_id_columns[0]], event[team_id_columns[1]]]
+                if shooter_team_id not in team_ids:
+                    raise KeyError(shooter_team_id)
+                shooter_team = team_ids.index(shooter_team_id)
+
+                # Get the players on the court for each team
+                teammate_ids = [str(event[column]) for column in team_player_columns[shooter_team]]
+                opponent_ids = [str(event[column]) for column in team_player_columns[1 - shooter_team]]
 
                 # Initialize shooter teammates and opponents if not done so already
                 if shooter_id not in all_players_teammates_opponents:
@@ -150,7 +123,7 @@ def get_shooting_splits_with_players_on_court_single_season(season, season_type,
                     all_players_teammates_opponents[shooter_id]['TOTAL']['FG3M' if is_three(event) else 'FTM'] += 1
 
                 # Add teammates on the court for the shot
-                for teammate_id in sub_map[period][shooter_team_id]:
+                for teammate_id in teammate_ids:
                     # Do not add shooter to own list of teammates
                     if teammate_id == str(shooter_id):
                         continue
@@ -166,7 +139,7 @@ def get_shooting_splits_with_players_on_court_single_season(season, season_type,
                         all_players_teammates_opponents[shooter_id]['TEAMMATES'][teammate_id]['FG3M' if is_three(event) else 'FTM'] += 1
 
                 # Add opponents on the court for the shot
-                for opponent_id in sub_map[period][opponent_team_id]:
+                for opponent_id in opponent_ids:
                     # Initialize the shooting splits if they have not been
                     if opponent_id not in all_players_teammates_opponents[shooter_id]['OPPONENTS']:
                         all_players_teammates_opponents[shooter_id]['OPPONENTS'][opponent_id] = (
@@ -184,13 +157,13 @@ def get_shooting_splits_with_players_on_court_single_season(season, season_type,
 
 # Get all teammates and opponents for each player season-by-season
 def get_shooting_splits_with_players_on_court_seasons(seasons, season_types, schedule_filename, play_by_play_filename,
-                                                      period_starters_filename, teammates_and_opponents_filename):
+                                                      lineups_filename, teammates_and_opponents_filename):
     # Loop over every season
     for season in seasons:
         for season_type in season_types:
             # Get all teammates and opponents for each player for a single season
             get_shooting_splits_with_players_on_court_single_season(season, season_type, schedule_filename,
-                                                                    play_by_play_filename, period_starters_filename,
+                                                                    play_by_play_filename, lineups_filename,
                                                                     teammates_and_opponents_filename)
 
 
@@ -432,13 +405,13 @@ if __name__ == '__main__':
     season_types = ['Regular Season', 'Playoffs']
     schedule_filename = '../Data/Schedules/schedule_{}_{}.csv'
     play_by_play_filename = '../Data/PlayByPlay/Standard/pbp_{}.csv'
-    period_starters_filename = '../Data/PeriodStarters/pap_{}.csv'
+    lineups_filename = '../Data/Lineups/lineups_{}.csv'
     teammates_and_opponents_filename = '../Data/SeasonStats/Luck/TeammatesOpponents/{}_{}.pkl'
     luck_splits_filename = '../Data/SeasonStats/Luck/LuckSplits/{}_{}.pkl'
     possessions_filename = '../Data/SeasonStats/Possessions/{}_{}.csv'
     luck_adjustments_filename = '../Data/SeasonStats/Luck/LuckAdjustments/{}_{}.csv'
     # get_shooting_splits_with_players_on_court_seasons(seasons, season_types, schedule_filename, play_by_play_filename,
-    #                                                   period_starters_filename, teammates_and_opponents_filename)
+    #                                                   lineups_filename, teammates_and_opponents_filename)
     # get_luck_splits_seasons(seasons, season_types, teammates_and_opponents_filename, luck_splits_filename)
     get_luck_adjustments_single_season('2023-24', 'Regular Season', luck_splits_filename, possessions_filename,
                                        luck_adjustments_filename)
@@ -1,6 +1,4 @@
 import pickle
-import time
-import traceback
 
 from api_helpers import *
 
@@ -25,46 +23,29 @@ def get_playtype_stats_whole_season(season, season_type, play_type, off_def, sav
     playtype_stats = extract_data(url)
     playtype_stats.to_csv(save_filename.format(play_type, season, season_type, off_def), index=False)
 
-    # Sleep for 0.75 seconds to stay under the rate limit
-    time.sleep(0.75)
-
 
 # Get play type stats for entire seasons
 def get_playtype_stats_seasons(seasons, season_types, save_filename, fail_filename):
-    # Keep track of failed seasons
-    failed_seasons = {}
-
-    # Constants for finding completion percentage
-    n_seasons = len(seasons)
-    n_season_types = len(season_types)
-    n_play_types = len(play_types)
-
-    # Get play type stats for each season
-    for i, season in enumerate(seasons):
-        for j, season_type in enumerate(season_types):
-            play_types_zip = zip(play_types, defenses)
-            for k, (play_type, defense) in enumerate(play_types_zip):
-                percent_done = (((i * n_season_types * n_play_types) + (j * n_play_types) + k) /
-                                (n_seasons * n_season_types * n_play_types))
-                print(f'{percent_done:.2%} {season} {season_type}: {play_type}')
-
-                # Get play type offensive stats
-                try:
-                    get_playtype_stats_whole_season(season, season_type, play_type, 'offensive', save_filename)
-                except Exception as error:
-                    print(error)
-                    traceback.print_exc()
-                    failed_seasons[f'{season} {season_type} {play_type} offensive'] = str(error), traceback.format_exc()
-
-                # Get play type defensive stats
-                if defense:
-                    try:
-                        get_playtype_stats_whole_season(season, season_type, play_type, 'defensive', save_filename)
-                    except Exception as error:
-                        print(error)
-                        traceback.print_exc()
-                        failed_seasons[f'{season} {season_type} {play_type} defensive'] = str(
-                            error), traceback.format_exc()
+    # Build the URL and save file for each season, season type, and play type
+    urls = []
+    save_filenames = []
+    keys = []
+    for season in seasons:
+        for season_type in season_types:
+            for play_type, defense in zip(play_types, defenses):
+                # Get play type offensive stats, and defensive stats if they exist for this play type
+                off_defs = ['offensive', 'defensive'] if defense else ['offensive']
+                for off_def in off_defs:
+                    urls.append(playtype_url.format(per_mode='Totals',
+                                                    play_type=play_type,
+                                                    season=season,
+                                                    season_type=season_type,
+                                                    off_def=off_def))
+                    save_filenames.append(save_filename.format(play_type, season, season_type, off_def))
+                    keys.append(f'{season} {season_type} {play_type} {off_def}')
+
+    # Get play type stats, keeping track of failed seasons
+    failed_seasons = save_data_batch(urls, save_filenames, keys)
 
     # Save failed seasons
     with open(fail_filename, 'wb') as fp:
@@ -1,6 +1,4 @@
 import pickle
-import time
-import traceback
 
 from api_helpers import *
 
@@ -28,9 +26,6 @@ def get_shooting_stats_single_day(date, season, season_type, distance_range, mea
     shooting_stats = extract_data_two_headers(url)
     shooting_stats.to_csv(save_filename.format(distance_range, season, season_type, measure_type, date), index=False)
 
-    # Sleep for 0.75 seconds to stay under the rate limit
-    time.sleep(0.75)
-
 
 # Get shooting stats day-by-day for multiple seasons
 def get_shooting_stats_every_day(seasons, season_types, schedule_filename, save_filename, fail_filename):
@@ -42,24 +37,28 @@ def get_shooting_stats_every_day(seasons, season_types, schedule_filename, save_
 
             # Extract the dates from the schedule
             dates = schedule['GAME_DATE'].unique()
-            n_dates = len(dates)
-            n_distance_ranges = len(distance_ranges)
-            n_measure_types = len(measure_types)
+
+            # Build the URL and save file for each day, distance range, and measure type in schedule
+            urls = []
+            save_filenames = []
+            keys = []
+            for date in dates:
+                for distance_range in distance_ranges:
+                    for measure_type in measure_types:
+                        urls.append(shooting_url.format(start_date=date,
+                                                        end_date=date,
+                                                        per_mode='Totals',
+                                                        distance_range=distance_range,
+                                                        measure_type=measure_type,
+                                                        season=season,
+                                                        season_type=season_type))
+                        save_filenames.append(save_filename.format(distance_range, season, season_type, measure_type,
+                                                                   date))
+                        keys.append(date)
 
             # Get shooting stats for each day in schedule
-            for i, date in enumerate(dates):
-                for j, distance_range in enumerate(distance_ranges):
-                    for k, measure_type in enumerate(measure_types):
-                        print(
-                            f'{((i * n_distance_ranges * n_measure_types + j * n_measure_types + k) / (n_dates * n_distance_ranges * n_measure_types)):.2%} '
-                            f'{season} {season_type}: {date} {distance_range} {measure_type}')
-                        try:
-                            get_shooting_stats_single_day(date, season, season_type, distance_range, measure_type,
-                                                          save_filename)
-                        except Exception as error:
-                            print(error)
-                            traceback.print_exc()
-                            failed_dates[date] = str(error), traceback.format_exc()
+            print(f'{season} {season_type}: {len(urls)} requests')
+            failed_dates.update(save_data_batch(urls, save_filenames, keys, two_headers=True))
 
         # Save failed dates
         with open(fail_filename, 'wb') as fp:
@@ -81,37 +80,29 @@ def get_shooting_stats_whole_season(season, season_type, distance_range, measure
     shooting_stats = extract_data_two_headers(url)
     shooting_stats.to_csv(save_filename.format(distance_range, season, season_type, measure_type), index=False)
 
-    # Sleep for 0.75 seconds to stay under the rate limit
-    time.sleep(0.75)
-
 
 # Get shooting stats for entire seasons
 def get_shooting_stats_seasons(seasons, season_types, save_filename, fail_filename):
-    # Keep track of failed seasons
-    failed_seasons = {}
-
-    # Constants for finding completion percentage
-    n_seasons = len(seasons)
-    n_season_types = len(season_types)
-    n_distance_ranges = len(distance_ranges)
-    n_measure_types = len(measure_types)
-
-    # Get shooting stats for each season
-    for i, season in enumerate(seasons):
-        for j, season_type in enumerate(season_types):
-            for k, distance_range in enumerate(distance_ranges):
-                for l, measure_type in enumerate(measure_types):
-                    percent_done = (((i * n_season_types * n_distance_ranges * n_measure_types) + (j * n_distance_ranges * n_measure_types) + (k * n_measure_types) + l) /
-                                    (n_seasons * n_season_types * n_distance_ranges * n_measure_types))
-                    print(f'{percent_done:.2%} {season} {season_type}: {distance_range} {measure_type}')
-
-                    # Get shooting stats
-                    try:
-                        get_shooting_stats_whole_season(season, season_type, distance_range, measure_type, save_filename)
-                    except Exception as error:
-                        print(error)
-                        traceback.print_exc()
-                        failed_seasons[f'{season} {season_type} {distance_range} {measure_type}'] = str(error), traceback.format_exc()
+    # Build the URL and save file for each season, season type, distance range, and measure type
+    urls = []
+    save_filenames = []
+    keys = []
+    for season in seasons:
+        for season_type in season_types:
+            for distance_range in distance_ranges:
+                for measure_type in measure_types:
+                    urls.append(shooting_url.format(start_date='',
+                                                    end_date='',
+                                                    per_mode='Totals',
+                                                    distance_range=distance_range,
+                                                    measure_type=measure_type,
+                                                    season=season,
+                                                    season_type=season_type))
+                    save_filenames.append(save_filename.format(distance_range, season, season_type, measure_type))
+                    keys.append(f'{season} {season_type} {distance_range} {measure_type}')
+
+    # Get shooting stats, keeping track of failed seasons
+    failed_seasons = save_data_batch(urls, save_filenames, keys, two_headers=True)
 
     # Save failed seasons
     with open(fail_filename, 'wb') as fp:
@@ -1,6 +1,6 @@
 import pandas as pd
 
-from Possessions.make_possessions import string_to_list
+from Possessions.event_lineups import string_to_list
 
 
 # Convert dictionary to a dataframe
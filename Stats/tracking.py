@@ -1,6 +1,4 @@
 import pickle
-import time
-import traceback
 
 from api_helpers import *
 
@@ -26,9 +24,6 @@ def get_tracking_stats_single_day(date, season, season_type, track_type, save_fi
     track_stats = extract_data(url)
     track_stats.to_csv(save_filename.format(track_type, season, season_type, date), index=False)
 
-    # Sleep for 0.75 seconds to stay under the rate limit
-    time.sleep(0.75)
-
 
 # Get tracking stats day-by-day for multiple seasons
 def get_tracking_stats_every_day(seasons, season_types, schedule_filename, save_filename, fail_filename):
@@ -40,20 +35,25 @@ def get_tracking_stats_every_day(seasons, season_types, schedule_filename, save_
 
             # Extract the dates from the schedule
             dates = schedule['GAME_DATE'].unique()
-            n_dates = len(dates)
-            n_types = len(track_types)
+
+            # Build the URL and save file for each day and tracking type in schedule
+            urls = []
+            save_filenames = []
+            keys = []
+            for date in dates:
+                for track_type in track_types:
+                    urls.append(track_url.format(start_date=date,
+                                                 end_date=date,
+                                                 per_mode='Totals',
+                                                 track_type=track_type,
+                                                 season=season,
+                                                 season_type=season_type))
+                    save_filenames.append(save_filename.format(track_type, season, season_type, date))
+                    keys.append(date)
 
             # Get tracking stats for each day in schedule
-            for i, date in enumerate(dates):
-                for j, track_type in enumerate(track_types):
-                    print(
-                        f'{((i * n_types + j) / (n_dates * n_types)):.2%} {season} {season_type}: {date} {track_type}')
-                    try:
-                        get_tracking_stats_single_day(date, season, season_type, track_type, save_filename)
-                    except Exception as error:
-                        print(error)
-                        traceback.print_exc()
-                        failed_dates[date] = str(error), traceback.format_exc()
+            print(f'{season} {season_type}: {len(urls)} requests')
+            failed_dates.update(save_data_batch(urls, save_filenames, keys))
 
         # Save failed dates
         with open(fail_filename, 'wb') as fp:
@@ -74,35 +74,27 @@ def get_tracking_stats_whole_season(season, season_type, track_type, save_filena
     track_stats = extract_data(url)
     track_stats.to_csv(save_filename.format(track_type, season, season_type), index=False)
 
-    # Sleep for 0.75 seconds to stay under the rate limit
-    time.sleep(0.75)
-
 
 # Get tracking stats for entire seasons
 def get_tracking_stats_seasons(seasons, season_types, save_filename, fail_filename):
-    # Keep track of failed seasons
-    failed_seasons = {}
-
-    # Constants for finding completion percentage
-    n_seasons = len(seasons)
-    n_season_types = len(season_types)
-    n_track_types = len(track_types)
-
-    # Get tracking stats for each season
-    for i, season in enumerate(seasons):
-        for j, season_type in enumerate(season_types):
-            for k, track_type in enumerate(track_types):
-                percent_done = (((i * n_season_types * n_track_types) + (j * n_track_types) + k) /
-                                (n_seasons * n_season_types * n_track_types))
-                print(f'{percent_done:.2%} {season} {season_type}: {track_type}')
-
-                # Get tracking stats
-                try:
-                    get_tracking_stats_whole_season(season, season_type, track_type, save_filename)
-                except Exception as error:
-                    print(error)
-                    traceback.print_exc()
-                    failed_seasons[f'{season} {season_type} {track_type}'] = str(error), traceback.format_exc()
+    # Build the URL and save file for each season, season type, and tracking type
+    urls = []
+    save_filenames = []
+    keys = []
+    for season in seasons:
+        for season_type in season_types:
+            for track_type in track_types:
+                urls.append(track_url.format(start_date='',
+                                             end_date='',
+                                             per_mode='Totals',
+                                             track_type=track_type,
+                                             season=season,
+                                             season_type=season_type))
+                save_filenames.append(save_filename.format(track_type, season, season_type))
+                keys.append(f'{season} {season_type} {track_type}')
+
+    # Get tracking stats, keeping track of failed seasons
+    failed_seasons = save_data_batch(urls, save_filenames, keys)
 
     # Save failed seasons
     with open(fail_filename, 'wb') as fp:
@@ -1,5 +1,14 @@
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import TokenBucket
+from response_cache import ResponseCache, default_cache_dir
 
 stats_nba_com_headers = {
     'Connection': 'keep-alive',
@@ -14,17 +23,91 @@ stats_nba_com_headers = {
     'Accept-Language': 'en-US,en;q=0.9',
 }
 
+# Constants for the fetch engine
+default_max_workers = 4
+default_timeout = 60
 
-# Extract the JSON data from HTTP response from stats.nba.com
-def extract_data(url, headers=None):
+# Shared session so every request reuses pooled keep-alive connections instead of a new TCP/TLS handshake
+session = None
+session_pool_size = 0
+session_lock = threading.Lock()
+
+# Shared token bucket for capping the request rate across every thread and process
+rate_limiter = TokenBucket()
+
+# Shared on-disk cache of raw responses
+# Set NBA_OFFLINE=1 to serve every request from the cache without touching the network
+response_cache = ResponseCache(cache_dir=os.environ.get('NBA_CACHE_DIR', default_cache_dir),
+                               offline=os.environ.get('NBA_OFFLINE', '0') == '1')
+
+
+# Get the shared HTTP session, creating it the first time it is needed
+# The connection pool only ever grows, so asking for a larger pool than the session has remounts it with the new size
+def get_session(pool_size=default_max_workers):
+    global session, session_pool_size
+
+    with session_lock:
+        if session is None:
+            session = requests.Session()
+        if pool_size > session_pool_size:
+            # Keep enough pooled connections open for every worker thread
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session_pool_size = pool_size
+        return session
+
+
+# Replace the shared rate limiter, e.g. to change the request rate or share it through a different state file
+def configure_rate_limiter(**kwargs):
+    global rate_limiter
+    rate_limiter = TokenBucket(**kwargs)
+
+
+# Replace the shared response cache, e.g. to switch to offline mode, or pass None to disable caching
+def configure_response_cache(cache=None, **kwargs):
+    global response_cache
+    response_cache = cache if cache is not None or not kwargs else ResponseCache(**kwargs)
+
+
+# Send a request to stats.nba.com and get the JSON response
+def get_json_response(url, headers=None):
     # Initialize headers if none given
     if headers is None:
         headers = stats_nba_com_headers
 
+    # Serve the response from the cache if possible
+    if response_cache is not None:
+        cached_response = response_cache.get(url)
+        if cached_response is not None:
+            return cached_response
+        if response_cache.offline:
+            raise Exception(f'Offline and no cached response for {url}')
+
+    # Wait until the request is allowed under the rate limit
+    rate_limiter.acquire()
+
     # Send request and get response
-    response = requests.get(url, headers=headers)
+    response = get_session().get(url, headers=headers, timeout=default_timeout)
+
+    # Let the rate limiter adjust to how the server responded
+    retry_after = response.headers.get('Retry-After')
+    rate_limiter.report(response.status_code,
+                        retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+    # Fail on error responses instead of trying to parse them
+    response.raise_for_status()
     response = response.json()
 
+    # Save the response for next time
+    if response_cache is not None:
+        response_cache.put(url, response)
+
+    return response
+
+
+# Convert a JSON response from stats.nba.com into a data frame
+def parse_data(response):
     # Get headers and rows from response
     result = response['resultSets'][0]
     columns = result['headers']
@@ -37,16 +120,8 @@ def extract_data(url, headers=None):
     return result_df
 
 
-# Extract the JSON data from HTTP response from stats.nba.com when tables have two levels for column names
-def extract_data_two_headers(url, headers=None):
-    # Initialize headers if none given
-    if headers is None:
-        headers = stats_nba_com_headers
-
-    # Send request and get response
-    response = requests.get(url, headers=headers)
-    response = response.json()
-
+# Convert a JSON response from stats.nba.com into a data frame when tables have two levels for column names
+def parse_data_two_headers(response):
     # Get headers from response
     result = response['resultSets']
     higher_columns = result['headers'][0]
@@ -68,4 +143,70 @@ def extract_data_two_headers(url, headers=None):
     result_df = pd.DataFrame(rows)
     result_df.columns = combined_columns
 
-    return result_df
\ No newline at end of file
+    return result_df
+
+
+# Extract the JSON data from HTTP response from stats.nba.com
+def extract_data(url, headers=None):
+    return parse_data(get_json_response(url, headers=headers))
+
+
+# Extract the JSON data from HTTP response from stats.nba.com when tables have two levels for column names
+def extract_data_two_headers(url, headers=None):
+    return parse_data_two_headers(get_json_response(url, headers=headers))
+
+
+# Extract the data for many URLs concurrently, yielding (index, result) pairs as each request completes
+# The result is the data frame for the URL, or the exception raised while getting it
+def iterate_data_batch(urls, headers=None, two_headers=False, max_workers=default_max_workers):
+    # Choose how the responses are converted into data frames
+    parse = parse_data_two_headers if two_headers else parse_data
+
+    # Get and parse a single URL, returning any error instead of raising it
+    def extract(url):
+        try:
+            return parse(get_json_response(url, headers=headers))
+        except Exception as error:
+            error.traceback = traceback.format_exc()
+            return error
+
+    # Make sure the connection pool is large enough for every worker
+    get_session(pool_size=max_workers)
+
+    # Send the requests on a pool of threads
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(extract, url): i for i, url in enumerate(urls)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+# Extract the data for many URLs concurrently and return the results in the same order as the URLs
+def extract_data_batch(urls, headers=None, two_headers=False, max_workers=default_max_workers):
+    results = [None] * len(urls)
+    for i, result in iterate_data_batch(urls, headers=headers, two_headers=two_headers, max_workers=max_workers):
+        results[i] = result
+    return results
+
+
+# Download many URLs concurrently and save each data frame to csv as soon as it arrives
+# Returns a dictionary of failures keyed by the corresponding failure key
+def save_data_batch(urls, save_filenames, failure_keys, headers=None, two_headers=False,
+                    max_workers=default_max_workers):
+    # Keep track of failed downloads
+    failures = {}
+
+    n_urls = len(urls)
+    for n_done, (i, result) in enumerate(iterate_data_batch(urls, headers=headers, two_headers=two_headers,
+                                                            max_workers=max_workers)):
+        print(f'{((n_done + 1) / n_urls):.2%}: {failure_keys[i]}')
+
+        # Record the failure if there was an error
+        if isinstance(result, Exception):
+            print(f'Error occurred: {result}')
+            failures[failure_keys[i]] = str(result), result.traceback
+            continue
+
+        # Save the data
+        result.to_csv(save_filenames[i], index=False)
+
+    return failures
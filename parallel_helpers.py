@@ -0,0 +1,64 @@
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import repeat
+
+# Constants for the game runner
+default_max_processes = os.cpu_count() or 1
+chunks_per_process = 4
+
+
+# Run a function for a single game, capturing any failure so that one bad game never stops the rest
+def run_single_game(function, game_id, args):
+    try:
+        return function(game_id, *args), None
+    except Exception as error:
+        return None, (str(error), traceback.format_exc())
+
+
+# Run a function for every game on a pool of processes
+# The function is called as function(game_id, *args) and must be defined at the top level of a module so it can be
+# sent to the worker processes. Yields (game_id, result, failure) tuples in the same order as the game IDs, where
+# failure is None on success or (error message, traceback) otherwise, so callers see the same results in the same
+# order no matter how many processes are used. A single process runs every game in the calling process.
+def run_games(function, game_ids, args=(), max_processes=default_max_processes, chunksize=None):
+    game_ids = list(game_ids)
+
+    # Run serially if only one process is needed
+    if max_processes <= 1 or len(game_ids) <= 1:
+        for game_id in game_ids:
+            yield (game_id, *run_single_game(function, game_id, args))
+        return
+
+    # Send games to the workers in chunks to cut down on inter-process communication
+    if chunksize is None:
+        chunksize = max(1, len(game_ids) // (max_processes * chunks_per_process))
+
+    with ProcessPoolExecutor(max_workers=max_processes) as executor:
+        results = executor.map(run_single_game, repeat(function), game_ids, repeat(args), chunksize=chunksize)
+        for game_id, result in zip(game_ids, results):
+            yield (game_id, *result)
+
+
+# Run a function for every job on a pool of processes, yielding each job as soon as it finishes
+# Works like run_games, except that (job, result, failure) tuples are yielded in the order the jobs finish, so callers
+# can save each result right away instead of waiting on slower jobs that came before it
+def run_jobs_as_completed(function, jobs, args=(), max_processes=default_max_processes):
+    jobs = list(jobs)
+
+    # Run serially if only one process is needed
+    if max_processes <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield (job, *run_single_game(function, job, args))
+        return
+
+    with ProcessPoolExecutor(max_workers=max_processes) as executor:
+        futures = {executor.submit(run_single_game, function, job, args): job for job in jobs}
+        for future in as_completed(futures):
+            yield (futures[future], *future.result())
+
+
+# Raise an exception for a failed game, for stages that stop at the first failure
+def raise_failure(game_id, failure):
+    print(failure[1])
+    raise Exception(f'Game {game_id} failed: {failure[0]}')
@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+# File locks are used to share the rate limit between processes where they are available (not on Windows)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Constants for the default rate limit
+default_state_filename = os.path.join(tempfile.gettempdir(), 'stats_nba_com_rate_limit.json')
+default_requests_per_second = 1.25
+default_min_requests_per_second = 0.1
+default_capacity = 1.0
+default_backoff_factor = 0.5
+default_recovery_step = 0.05
+
+
+# Token bucket rate limiter shared by every thread and process that uses the same state file
+# A request takes a token from the bucket and the bucket refills at the current rate, so the time a request takes
+# counts towards the wait before the next one. The rate is cut when the server pushes back (429 or 5xx responses)
+# and slowly recovers back to the maximum rate after successful responses.
+class TokenBucket:
+    def __init__(self, state_filename=default_state_filename, requests_per_second=default_requests_per_second,
+                 min_requests_per_second=default_min_requests_per_second, capacity=default_capacity,
+                 backoff_factor=default_backoff_factor, recovery_step=default_recovery_step):
+        self.state_filename = state_filename
+        self.max_rate = requests_per_second
+        self.min_rate = min(min_requests_per_second, requests_per_second)
+        self.capacity = capacity
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step
+        self.thread_lock = threading.Lock()
+
+    # Read the bucket state, let the function update it, and write it back while holding the thread and file locks
+    def update_state(self, update):
+        with self.thread_lock:
+            with open(self.state_filename, 'a+') as fp:
+                if fcntl is not None:
+                    fcntl.flock(fp, fcntl.LOCK_EX)
+                try:
+                    # Read the current state, starting with a full bucket if there is no valid state yet
+                    fp.seek(0)
+                    try:
+                        state = json.loads(fp.read())
+                    except ValueError:
+                        state = {'tokens': self.capacity, 'rate': self.max_rate, 'updated': time.time()}
+
+                    # Refill the bucket for the time passed since the last update
+                    now = time.time()
+                    state['rate'] = min(max(state['rate'], self.min_rate), self.max_rate)
+                    state['tokens'] = min(self.capacity,
+                                          state['tokens'] + max(0.0, now - state['updated']) * state['rate'])
+                    state['updated'] = now
+
+                    # Apply the update
+                    result = update(state)
+
+                    # Save the new state
+                    fp.seek(0)
+                    fp.truncate()
+                    fp.write(json.dumps(state))
+                    fp.flush()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(fp, fcntl.LOCK_UN)
+        return result
+
+    # Block until a token is available and take it
+    def acquire(self):
+        # Take a token if there is one, otherwise find how long until there will be one
+        def take_token(state):
+            if state['tokens'] >= 1:
+                state['tokens'] -= 1
+                return 0.0
+            return (1 - state['tokens']) / state['rate']
+
+        # Sleep outside the locks until a token is taken
+        wait = self.update_state(take_token)
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.update_state(take_token)
+
+    # Adjust the rate based on the status code of a response
+    def report(self, status_code, retry_after=None):
+        # Slow down when the server is rate limiting or struggling
+        if status_code == 429 or status_code >= 500:
+            def back_off(state):
+                state['rate'] = max(self.min_rate, state['rate'] * self.backoff_factor)
+                state['tokens'] = min(state['tokens'], 0.0)
+
+                # Respect the server's requested wait by putting the bucket into debt
+                if retry_after is not None:
+                    state['tokens'] = min(state['tokens'], -retry_after * state['rate'])
+
+            self.update_state(back_off)
+
+        # Slowly recover back to the maximum rate after successful responses
+        elif status_code < 400:
+            def recover(state):
+                state['rate'] = min(self.max_rate, state['rate'] + self.recovery_step)
+
+            self.update_state(recover)
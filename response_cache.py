@@ -0,0 +1,165 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from season_helpers import is_finished_season, season_from_game_id
+
+# Constants for the default cache
+default_cache_dir = '../Data/Cache/Responses'
+default_max_bytes = 5 * 1024 ** 3
+default_ttl = 6 * 60 * 60
+
+# How long responses for the current season stay fresh for each endpoint (in seconds)
+# Responses for finished seasons never expire
+endpoint_ttls = {
+    'leaguegamelog': 60 * 60,
+    'playbyplayv2': 24 * 60 * 60,
+    'boxscoretraditionalv2': 24 * 60 * 60,
+}
+
+# Query parameters that say which season a request is for
+season_parameters = ['season', 'seasonyear']
+game_id_parameters = ['gameid']
+
+
+# Normalize a URL so that equivalent requests share a cache entry
+# The scheme is ignored, the host and path are lower-cased, and query parameters are sorted by name
+def normalize_url(url):
+    parts = urlsplit(url)
+    path = parts.path.lower().rstrip('/')
+    parameters = sorted((name.lower(), value) for name, value in parse_qsl(parts.query, keep_blank_values=True))
+    return f'{parts.netloc.lower()}{path}?{urlencode(parameters)}'
+
+
+# Get the content address of a URL in the cache
+def get_cache_key(url):
+    return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+
+# Get the endpoint name of a URL, e.g. 'leaguegamelog'
+def get_endpoint(url):
+    return urlsplit(url).path.lower().rstrip('/').split('/')[-1]
+
+
+# Get the season a URL requests data for, or None if it cannot be found
+def get_season(url):
+    parameters = {name.lower(): value for name, value in parse_qsl(urlsplit(url).query)}
+    for name in season_parameters:
+        if parameters.get(name):
+            return parameters[name]
+    for name in game_id_parameters:
+        if parameters.get(name):
+            return season_from_game_id(parameters[name])
+    return None
+
+
+# On-disk cache of raw JSON responses from stats.nba.com, keyed by normalized URL
+# Responses are stored gzip-compressed and the least recently used entries are evicted once the cache grows past
+# its size limit. In offline mode, nothing is fetched and every request must be served from the cache.
+class ResponseCache:
+    def __init__(self, cache_dir=default_cache_dir, max_bytes=default_max_bytes, offline=False, ttls=None,
+                 ttl=default_ttl):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.ttls = endpoint_ttls if ttls is None else ttls
+        self.ttl = ttl
+        self.size = None
+        self.size_lock = threading.Lock()
+
+    # Get the filename for a URL's cache entry
+    def get_filename(self, url):
+        key = get_cache_key(url)
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json.gz')
+
+    # Get how long a URL's response stays fresh, or None if it never expires
+    def get_ttl(self, url):
+        season = get_season(url)
+        if season is not None and is_finished_season(season):
+            return None
+        return self.ttls.get(get_endpoint(url), self.ttl)
+
+    # Get the cached response for a URL, or None if it is missing or expired
+    def get(self, url):
+        filename = self.get_filename(url)
+        try:
+            with gzip.open(filename, 'rt', encoding='utf-8') as fp:
+                entry = json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+        # Ignore expired entries, unless offline where a stale response is better than none
+        ttl = self.get_ttl(url)
+        if not self.offline and ttl is not None and time.time() - entry['fetched'] > ttl:
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(filename)
+        except OSError:
+            pass
+
+        return entry['response']
+
+    # Save the response for a URL
+    def put(self, url, response):
+        filename = self.get_filename(url)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        # Write to a temporary file first so readers never see a partial entry
+        temporary_filename = f'{filename}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with gzip.open(temporary_filename, 'wt', encoding='utf-8') as fp:
+            json.dump({'url': url, 'fetched': time.time(), 'response': response}, fp)
+        n_bytes = os.path.getsize(temporary_filename)
+
+        # Replace any existing entry, keeping track of how much the cache grew
+        with self.size_lock:
+            try:
+                old_bytes = os.path.getsize(filename)
+            except OSError:
+                old_bytes = 0
+            os.replace(temporary_filename, filename)
+
+            # Evict old entries if the cache has grown too large
+            if self.size is None:
+                self.size = self.get_size()
+            else:
+                self.size += n_bytes - old_bytes
+            if self.size > self.max_bytes:
+                self.size = self.evict()
+
+    # Get every cache entry as (filename, last used time, size) tuples
+    def get_entries(self):
+        entries = []
+        for directory, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename.endswith('.json.gz'):
+                    path = os.path.join(directory, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    # Get the total size of the cache in bytes
+    def get_size(self):
+        return sum(size for _, _, size in self.get_entries())
+
+    # Remove the least recently used entries until the cache is back under 90% of its size limit
+    def evict(self):
+        entries = sorted(self.get_entries(), key=lambda entry: entry[1])
+        size = sum(entry[2] for entry in entries)
+        for path, _, entry_size in entries:
+            if size <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                size -= entry_size
+            except OSError:
+                pass
+        return size
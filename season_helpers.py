@@ -0,0 +1,46 @@
+import datetime
+
+
+# Format the starting year of a season as a season string, e.g. 2023 -> '2023-24'
+def format_season(year):
+    return f'{year}-{((year % 100) + 1) % 100:02}'
+
+
+# Get the starting year of a season string, e.g. '2023-24' -> 2023
+def season_start_year(season):
+    return int(season[:4])
+
+
+# Get the current season
+# Seasons are treated as finished once July starts, so the off-season belongs to the upcoming season
+def current_season(today=None):
+    if today is None:
+        today = datetime.date.today()
+    year = today.year if today.month >= 7 else today.year - 1
+    return format_season(year)
+
+
+# Check if a season is finished, meaning its data will never change again
+def is_finished_season(season, today=None):
+    return season_start_year(season) < season_start_year(current_season(today))
+
+
+# Get the season a game was played in from its game ID, e.g. '0021800001' -> '2018-19'
+def season_from_game_id(game_id):
+    year = int(str(game_id).zfill(10)[3:5])
+    return format_season(year + 1900 if year >= 46 else year + 2000)
+
+
+# Season types for the digit after the league in a game ID, e.g. '0021800001' -> 'Regular Season'
+game_id_season_types = {
+    '1': 'Pre Season',
+    '2': 'Regular Season',
+    '3': 'All Star',
+    '4': 'Playoffs',
+    '5': 'PlayIn',
+}
+
+
+# Get the season type of a game from its game ID, e.g. '0041800101' -> 'Playoffs'
+def season_type_from_game_id(game_id):
+    return game_id_season_types[str(game_id).zfill(10)[2]]
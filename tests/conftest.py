@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The modules are run as scripts from their own directories, so put the repository root and the RAPM directory on
+# the path the same way
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in [root, os.path.join(root, 'RAPM')]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,60 @@
+import api_helpers
+from rate_limiter import TokenBucket
+
+
+# Response from a fake session, with the parts of requests.Response the fetch engine uses
+class FakeResponse:
+    def __init__(self, url):
+        self.url = url
+        self.status_code = 500 if 'fail' in url else 200
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f'{self.status_code} error for {self.url}')
+
+    def json(self):
+        return {'resultSets': [{'headers': ['URL'], 'rowSet': [[self.url]]}]}
+
+
+# Session that answers every request without the network
+class FakeSession:
+    def get(self, url, headers=None, timeout=None):
+        return FakeResponse(url)
+
+
+# Use a fresh session, a fast rate limiter, and no response cache
+def use_fake_fetch(monkeypatch, tmp_path, session):
+    monkeypatch.setattr(api_helpers, 'session', session)
+    monkeypatch.setattr(api_helpers, 'session_pool_size', 0)
+    monkeypatch.setattr(api_helpers, 'rate_limiter',
+                        TokenBucket(state_filename=str(tmp_path / 'rate_limit.json'), requests_per_second=1000,
+                                    capacity=1000))
+    monkeypatch.setattr(api_helpers, 'response_cache', None)
+
+
+# A batch with more workers than the session's pool should grow the pool instead of keeping the first size
+def test_get_session_grows_pool(monkeypatch, tmp_path):
+    use_fake_fetch(monkeypatch, tmp_path, None)
+    session = api_helpers.get_session()
+    assert session.get_adapter('https://stats.nba.com')._pool_maxsize == api_helpers.default_max_workers
+
+    assert api_helpers.get_session(pool_size=16) is session
+    assert session.get_adapter('https://stats.nba.com')._pool_maxsize == 16
+
+    # A smaller pool keeps the larger one
+    api_helpers.get_session(pool_size=2)
+    assert session.get_adapter('https://stats.nba.com')._pool_maxsize == 16
+
+
+# Batch results come back in the order of the URLs, with the errors of failed requests in place of their data
+def test_extract_data_batch(monkeypatch, tmp_path):
+    use_fake_fetch(monkeypatch, tmp_path, FakeSession())
+    monkeypatch.setattr(api_helpers, 'session_pool_size', 8)
+    urls = [f'https://stats.nba.com/stats/{name}' for name in ['a', 'b', 'fail', 'c']]
+    results = api_helpers.extract_data_batch(urls, max_workers=3)
+
+    assert [result['URL'].iloc[0] for i, result in enumerate(results) if i != 2] == [urls[0], urls[1], urls[3]]
+    assert isinstance(results[2], Exception)
+    assert '500 error' in str(results[2])
+    assert 'Traceback' in results[2].traceback
@@ -0,0 +1,56 @@
+import pickle
+
+import pandas as pd
+import pytest
+
+from Possessions.player_registry import load_player_registry
+from Possessions.possession_matrix import (load_possession_matrix, select_possession_matrix_seasons,
+                                           write_possession_matrix)
+from batch import calculate_rapm_batch, get_rapm_jobs
+from rapm import calculate_rapm_matrix
+from test_possession_matrix import write_seasons
+
+seasons = ['2016-17', '2017-18', '2018-19']
+season_types = ['Regular Season']
+lambdas = [0.01, 0.1]
+
+
+# Longer windows should come first, with every window, lambda, and target covered once
+def test_rapm_jobs_start_with_longest_windows():
+    jobs = get_rapm_jobs(['Standard', 'LuckAdjusted'], seasons, [1, 3, 2], [0.01])
+    windows = [(start_season, end_season) for _, start_season, end_season, _ in jobs]
+    assert windows == [('2016-17', '2018-19')] * 2 + [('2016-17', '2017-18')] * 2 + [('2017-18', '2018-19')] * 2 + \
+        [(season, season) for season in seasons for _ in range(2)]
+    assert len(set(jobs)) == len(jobs)
+    assert {target for target, _, _, _ in jobs} == {'Standard', 'LuckAdjusted'}
+
+
+# Every job should save the same RAPM values as fitting its window directly, and a target whose matrix can't be loaded
+# should have its jobs recorded as failures without stopping the rest
+@pytest.mark.parametrize('max_processes', [1, 2])
+def test_rapm_batch_matches_single_fits(tmp_path, max_processes):
+    season_possessions_filename = write_seasons(tmp_path, seasons, season_types)
+    registry_filename = str(tmp_path / 'registry.csv')
+    write_possession_matrix(seasons, season_types, season_possessions_filename, registry_filename,
+                            str(tmp_path / 'matrix'))
+    matrix_directories = {'Standard': str(tmp_path / 'matrix'), 'Missing': str(tmp_path / 'missing')}
+    save_file = str(tmp_path / 'rapm_{}_{}_{}_{}.csv')
+    failed_filename = str(tmp_path / 'failed.pkl')
+    calculate_rapm_batch(matrix_directories, seasons, season_types, [1, 2], lambdas, registry_filename, 3, save_file,
+                         failed_filename, max_processes=max_processes)
+
+    # Compare each saved file with a direct fit of the window
+    matrix = load_possession_matrix(str(tmp_path / 'matrix'))
+    player_names_and_ids = load_player_registry(registry_filename)[['PLAYER_ID', 'PLAYER_NAME']]
+    jobs = get_rapm_jobs(['Standard'], seasons, [1, 2], lambdas)
+    for target, start_season, end_season, lambda_value in jobs:
+        possessions = select_possession_matrix_seasons(matrix, start_season, end_season, season_types)
+        expected_filename = str(tmp_path / 'expected.csv')
+        calculate_rapm_matrix(possessions, player_names_and_ids, 3, [lambda_value], expected_filename)
+        rapms = pd.read_csv(save_file.format(target, start_season, end_season, lambda_value))
+        pd.testing.assert_frame_equal(rapms, pd.read_csv(expected_filename))
+
+    # Only the jobs of the missing matrix failed
+    with open(failed_filename, 'rb') as fp:
+        failures = pickle.load(fp)
+    assert set(failures) == set(get_rapm_jobs(['Missing'], seasons, [1, 2], lambdas))
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bootstrap import calculate_rapm_bootstrap
+from test_sufficient_statistics import make_possessions
+
+
+# Run the bootstrap on the test possessions and read back the saved RAPM values
+def run_bootstrap(tmp_path, replicates, max_processes):
+    possessions = make_possessions()
+    player_names_and_ids = pd.DataFrame({'PLAYER_ID': possessions['players'],
+                                         'PLAYER_NAME': [f'Player {i}' for i in possessions['players']]})
+    save_file = str(tmp_path / 'rapm.csv')
+    calculate_rapm_bootstrap(possessions, player_names_and_ids, 3, [0.01, 0.05], replicates,
+                             str(tmp_path / 'game_index.npz'), save_file, max_processes=max_processes)
+    return pd.read_csv(save_file)
+
+
+# Fewer replicates than processes should fit each replicate in its own batch, with the same result as one process
+def test_bootstrap_fewer_replicates_than_processes(tmp_path):
+    rapms = run_bootstrap(tmp_path, 3, 4)
+    assert np.all(np.isfinite(rapms['RAPM_SE']))
+    pd.testing.assert_frame_equal(rapms, run_bootstrap(tmp_path, 3, 1))
+
+
+# The bootstrap needs at least one replicate
+def test_bootstrap_without_replicates(tmp_path):
+    with pytest.raises(ValueError):
+        run_bootstrap(tmp_path, 0, 4)
@@ -0,0 +1,43 @@
+import os
+
+import pandas as pd
+
+from Possessions.combine_possessions import append_games_possessions
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+games = pd.DataFrame({'GAME_ID': ['0021800000', '0021800003'], 'GAME_DATE': ['2018-10-16', '2018-10-17']})
+
+
+# Append the fixture games to season and all-seasons files in a directory
+def append_games(tmp_path, games):
+    append_games_possessions(games, '2018-19', 'Regular Season', os.path.join(fixtures, 'possessions_{}.csv'),
+                             str(tmp_path / 'possessions_{}_{}.csv'), str(tmp_path / 'possessions_all.csv'))
+
+
+# Count the possessions of each game in a possessions file
+def count_game_possessions(filename):
+    return pd.read_csv(filename)['game_id'].value_counts().sort_index().to_dict()
+
+
+# Appending games that are already in the files should not duplicate their possessions
+def test_append_games_possessions_is_idempotent(tmp_path):
+    append_games(tmp_path, games)
+    season_counts = count_game_possessions(tmp_path / 'possessions_2018-19_Regular Season.csv')
+    all_counts = count_game_possessions(tmp_path / 'possessions_all.csv')
+    assert season_counts == all_counts
+    assert list(season_counts) == [21800000, 21800003]
+
+    append_games(tmp_path, games)
+    assert count_game_possessions(tmp_path / 'possessions_2018-19_Regular Season.csv') == season_counts
+    assert count_game_possessions(tmp_path / 'possessions_all.csv') == all_counts
+
+
+# A run that crashed after appending to the season file should only append to the all-seasons file when run again
+def test_append_games_possessions_after_crash(tmp_path):
+    append_games(tmp_path, games)
+    expected = pd.read_csv(tmp_path / 'possessions_all.csv')
+
+    # Lose the second game from the all-seasons file, as if the run crashed before appending it there
+    expected[expected['game_id'] == 21800000].to_csv(tmp_path / 'possessions_all.csv', index=False)
+    append_games(tmp_path, games)
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'possessions_all.csv'), expected)
@@ -0,0 +1,89 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from Possessions.possession_matrix import day_to_date
+from rapm import calculate_decayed_rapm
+from sufficient_statistics import select_possession_rows
+from test_sufficient_statistics import make_possessions
+
+half_life = 3
+folds = 3
+lambdas = [0.01, 0.05]
+
+
+# Run the decayed RAPM as of a day, returning the saved RAPM values and decayed statistics
+def run_decayed_rapm(tmp_path, possessions, day, name='decayed'):
+    player_names_and_ids = pd.DataFrame({'PLAYER_ID': possessions['players'],
+                                         'PLAYER_NAME': [f'Player {i}' for i in possessions['players']]})
+    statistics_filename = str(tmp_path / f'{name}.pkl')
+    save_file = str(tmp_path / f'{name}.csv')
+    calculate_decayed_rapm(possessions, day_to_date([day])[0], half_life, statistics_filename, player_names_and_ids,
+                           folds, lambdas, save_file)
+    with open(statistics_filename, 'rb') as fp:
+        decayed = pickle.load(fp)
+    return pd.read_csv(save_file), decayed
+
+
+# Check that decayed statistics brought forward by nightly runs match statistics built from scratch
+def assert_decayed_equal(decayed, expected):
+    assert decayed['day'] == expected['day']
+    np.testing.assert_array_equal(decayed['players'], expected['players'])
+    np.testing.assert_array_equal(decayed['game_ids'], expected['game_ids'])
+    for statistics, expected_statistics in zip([decayed['statistics'], *decayed['fold_statistics']],
+                                               [expected['statistics'], *expected['fold_statistics']]):
+        np.testing.assert_allclose(statistics['xx'].toarray(), expected_statistics['xx'].toarray(), atol=1e-9)
+        for name in ['xy', 'x', 'y', 'yy', 'n']:
+            np.testing.assert_allclose(statistics[name], expected_statistics[name], atol=1e-9)
+
+
+# A game that finishes after a run on the same day should be added by the next run
+def test_decayed_rapm_adds_late_game_on_same_day(tmp_path):
+    possessions = make_possessions()
+    late_game = possessions['game_ids'].max()
+    early = select_possession_rows(possessions, possessions['game_ids'] != late_game)
+    day = possessions['dates'].max()
+
+    run_decayed_rapm(tmp_path, early, day)
+    rapms, decayed = run_decayed_rapm(tmp_path, possessions, day)
+    expected_rapms, expected = run_decayed_rapm(tmp_path, possessions, day, name='scratch')
+    assert late_game in decayed['game_ids']
+    assert_decayed_equal(decayed, expected)
+    pd.testing.assert_frame_equal(rapms, expected_rapms, atol=1e-3)
+
+
+# Players who debut after a run should be added to the saved statistics
+def test_decayed_rapm_adds_new_players(tmp_path):
+    # Two players are added to the registry and debut in the games of the last two dates
+    possessions = make_possessions()
+    last_day = possessions['dates'].max()
+    debut_rows = possessions['dates'] >= last_day - 1
+    possessions['lineups'][debut_rows, 0] = 20
+    possessions['lineups'][debut_rows, 5] = 21
+    possessions['players'] = np.append(possessions['players'], [1020, 1021])
+
+    # The earlier run is before the new players were added to the registry, without the games they played in
+    before = select_possession_rows(possessions, ~debut_rows)
+    before['players'] = possessions['players'][:20]
+    run_decayed_rapm(tmp_path, before, last_day - 1)
+
+    # One of the debut games is on the day of the earlier run, so it is only added by its game ID
+    rapms, decayed = run_decayed_rapm(tmp_path, possessions, last_day)
+    expected_rapms, expected = run_decayed_rapm(tmp_path, possessions, last_day, name='scratch')
+    assert_decayed_equal(decayed, expected)
+    pd.testing.assert_frame_equal(rapms, expected_rapms, atol=1e-3)
+    assert {1020, 1021} <= set(rapms['PLAYER_ID'])
+
+
+# Saved statistics with games that are no longer in the possessions should be rebuilt instead of brought forward
+def test_decayed_rapm_rebuilds_when_games_change(tmp_path):
+    possessions = make_possessions()
+    last_day = possessions['dates'].max()
+    run_decayed_rapm(tmp_path, possessions, last_day - 1)
+
+    later = select_possession_rows(possessions, possessions['dates'] >= possessions['dates'].min() + 2)
+    rapms, decayed = run_decayed_rapm(tmp_path, later, last_day)
+    expected_rapms, expected = run_decayed_rapm(tmp_path, later, last_day, name='scratch')
+    assert_decayed_equal(decayed, expected)
+    pd.testing.assert_frame_equal(rapms, expected_rapms, atol=1e-3)
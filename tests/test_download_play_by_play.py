@@ -0,0 +1,67 @@
+import json
+import pickle
+
+import pandas as pd
+
+import Possessions.download_play_by_play as download
+from Possessions.manifest import load_manifest, status_failed, status_ok
+
+schedule_url = 'https://stats.nba.com/stats/leaguegamelog?season={}&seasonType={}'
+play_by_play_url = 'https://stats.nba.com/stats/playbyplayv2?gameId={}'
+
+
+# Stand in for the concurrent fetch engine, recording every URL requested and failing the given games
+def fake_fetch(monkeypatch, requested, failing_game_ids=()):
+    def iterate_data_batch(urls, max_workers=None):
+        for i, url in enumerate(urls):
+            requested.append(url)
+            if any(game_id in url for game_id in failing_game_ids):
+                error = Exception(f'500 error for {url}')
+                error.traceback = 'Traceback'
+                yield i, error
+            else:
+                yield i, pd.DataFrame({'GAME_ID': [url[-10:]] * 3, 'EVENTNUM': [0, 1, 2]})
+
+    monkeypatch.setattr(download, 'iterate_data_batch', iterate_data_batch)
+
+
+# Download the play-by-play for the saved schedule of a finished season
+def run_download(tmp_path):
+    download.download_play_by_play(schedule_url, ['2018-19'], ['Regular Season'], str(tmp_path / 'schedule_{}_{}.csv'),
+                                   play_by_play_url, str(tmp_path / 'pbp_{}.csv'), str(tmp_path / 'failed.pkl'),
+                                   str(tmp_path / 'manifest.jsonl'))
+    with open(tmp_path / 'failed.pkl', 'rb') as fp:
+        return pickle.load(fp)
+
+
+# Later runs should only download the games that failed, are missing, or whose files no longer match the manifest
+def test_download_resumes_from_manifest(tmp_path, monkeypatch):
+    game_ids = ['0021800001', '0021800002', '0021800003']
+    pd.DataFrame({'GAME_ID': game_ids, 'WL': ['W'] * 3}).to_csv(
+        tmp_path / 'schedule_2018-19_Regular Season.csv', index=False)
+
+    # The first run downloads every game, and one of them fails
+    requested = []
+    fake_fetch(monkeypatch, requested, failing_game_ids=['0021800002'])
+    failures = run_download(tmp_path)
+    assert len(requested) == 3
+    assert list(failures) == ['0021800002']
+    manifest = load_manifest(str(tmp_path / 'manifest.jsonl'))
+    assert [manifest[game_id]['STATUS'] for game_id in game_ids] == [status_ok, status_failed, status_ok]
+
+    # The next run only retries the failed game, even with a partial line left in the manifest by a crash
+    with open(tmp_path / 'manifest.jsonl', 'a') as fp:
+        fp.write(json.dumps({'KEY': '0021800003', 'STATUS': status_ok})[:20])
+    requested = []
+    fake_fetch(monkeypatch, requested)
+    assert run_download(tmp_path) == {}
+    assert requested == [play_by_play_url.format('0021800002')]
+
+    # A file that was changed since it was downloaded is downloaded again
+    with open(tmp_path / 'pbp_0021800001.csv', 'a') as fp:
+        fp.write('0021800001,3\n')
+    requested = []
+    fake_fetch(monkeypatch, requested)
+    run_download(tmp_path)
+    assert requested == [play_by_play_url.format('0021800001')]
+    assert not list(tmp_path.glob('*.tmp'))
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from Possessions.event_lineups import (add_event_lineups, get_event_lineups, get_sub_map, lineup_columns,
+                                       team_player_columns)
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Players on the court at the start of each period, in the players at period file's format
+players_at_period = pd.DataFrame({
+    'PERIOD': [1, 2],
+    'TEAM_ID_1': [100, 100],
+    'TEAM_1_PLAYERS': ['[1, 2, 3, 4, 5]', '[1, 2, 3, 4, 11]'],
+    'TEAM_ID_2': [200, 200],
+    'TEAM_2_PLAYERS': ['[6, 7, 8, 9, 10]', '[6, 7, 8, 9, 10]'],
+})
+
+
+# Make a play-by-play with the columns needed to replay substitutions, from (type, period, player out, team, player in)
+def make_play_by_play(events):
+    play_by_play = pd.DataFrame(events, columns=['EVENTMSGTYPE', 'PERIOD', 'PLAYER1_ID', 'PLAYER1_TEAM_ID',
+                                                 'PLAYER2_ID'])
+    play_by_play.insert(0, 'EVENTNUM', np.arange(len(play_by_play)))
+    play_by_play.insert(0, 'GAME_ID', 21800001)
+    return play_by_play
+
+
+# Substitutions should change the lineups from the substitution event on, and each period starts from its starters
+def test_replay_substitutions():
+    play_by_play = make_play_by_play([
+        (1, 1, 1, 100, 0),
+        (8, 1, 3, 100, 11),
+        (2, 1, 6, 200, 0),
+        (8, 1, 6, 200, 12),
+        (8, 1, 11, 100, 13),
+        (1, 2, 11, 100, 0),
+    ])
+    lineups = get_event_lineups(play_by_play, get_sub_map(players_at_period))
+    team1 = lineups[team_player_columns[0]].to_numpy().tolist()
+    team2 = lineups[team_player_columns[1]].to_numpy().tolist()
+
+    # After a substitution, players are sorted by their string IDs, so 11 and 13 come before 2
+    assert team1 == [[1, 2, 3, 4, 5], [1, 11, 2, 4, 5], [1, 11, 2, 4, 5], [1, 11, 2, 4, 5], [1, 13, 2, 4, 5],
+                     [1, 2, 3, 4, 11]]
+    assert team2[:3] == [[6, 7, 8, 9, 10]] * 3
+    assert team2[3:5] == [[10, 12, 7, 8, 9]] * 2
+    assert team2[5] == [6, 7, 8, 9, 10]
+    assert (lineups['TEAM1_ID'] == 100).all() and (lineups['TEAM2_ID'] == 200).all()
+
+
+# Substituting out a player who is not on the court, or an event in a period without starters, should fail the game
+def test_replay_errors():
+    sub_map = get_sub_map(players_at_period)
+    with pytest.raises(ValueError):
+        get_event_lineups(make_play_by_play([(8, 1, 11, 100, 12)]), sub_map)
+    with pytest.raises(KeyError):
+        get_event_lineups(make_play_by_play([(8, 1, 1, 300, 12)]), sub_map)
+    with pytest.raises(KeyError):
+        get_event_lineups(make_play_by_play([(1, 3, 1, 100, 0)]), sub_map)
+
+
+# Every event of a real game should have five different players for each team, and adding the lineups to the
+# play-by-play should check that they are for the same events
+def test_fixture_game_lineups():
+    play_by_play = pd.read_csv(os.path.join(fixtures, 'pbp_0021800000.csv'))
+    sub_map = get_sub_map(pd.read_csv(os.path.join(fixtures, 'pap_0021800000.csv')))
+    lineups = get_event_lineups(play_by_play, sub_map)
+    for columns in team_player_columns:
+        assert all(len(set(players)) == 5 for players in lineups[columns].to_numpy())
+
+    # Each substitution puts the player coming in on the court and takes the player going out off it
+    substitutions = play_by_play['EVENTMSGTYPE'] == 8
+    on_court = lineups[team_player_columns[0] + team_player_columns[1]].to_numpy()[substitutions]
+    assert all(player_in in players and player_out not in players for player_in, player_out, players in
+               zip(play_by_play.loc[substitutions, 'PLAYER2_ID'], play_by_play.loc[substitutions, 'PLAYER1_ID'],
+                   on_court))
+
+    add_event_lineups(play_by_play, lineups)
+    assert all(column in play_by_play.columns for column in lineup_columns)
+    with pytest.raises(ValueError):
+        add_event_lineups(play_by_play.iloc[1:].copy(), lineups)
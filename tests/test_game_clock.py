@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from Possessions.game_clock import get_seconds_left, get_time_elapsed_in_game, get_time_elapsed_in_period
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+# Game clock strings should parse to the seconds left, including single-digit minutes and the end of a period
+def test_get_seconds_left():
+    np.testing.assert_array_equal(get_seconds_left(['12:00', '11:42', '5:07', '0:00', '00:59']),
+                                  [720, 702, 307, 0, 59])
+
+
+# Time elapsed should use 12 minute quarters and 5 minute overtime periods
+def test_time_elapsed():
+    clock = ['12:00', '0:00', '5:00', '2:30', '0:00']
+    periods = [1, 4, 5, 6, 7]
+    np.testing.assert_array_equal(get_time_elapsed_in_period(clock, periods), [0, 720, 0, 150, 300])
+    np.testing.assert_array_equal(get_time_elapsed_in_game(clock, periods), [0, 2880, 2880, 3330, 3780])
+
+
+# Parsing a whole game at once should match parsing each event on its own
+def test_time_elapsed_matches_single_events():
+    play_by_play = pd.read_csv(os.path.join(fixtures, 'pbp_0021800000.csv'))
+    clock, periods = play_by_play['PCTIMESTRING'], play_by_play['PERIOD']
+    elapsed = get_time_elapsed_in_game(clock, periods)
+    assert elapsed.max() > 2880
+    for i in range(0, len(clock), 25):
+        minutes, seconds = clock[i].split(':')
+        period_length = 720 if periods[i] <= 4 else 300
+        period_start = 720 * min(periods[i] - 1, 4) + 300 * max(periods[i] - 5, 0)
+        assert elapsed[i] == period_start + period_length - int(minutes) * 60 - int(seconds)
@@ -0,0 +1,62 @@
+import os
+
+import pandas as pd
+import pytest
+
+from Possessions.luck_adjust_play_by_play import luck_adjust_play_by_play_single_game, luck_adjust_play_by_plays
+from Possessions.play_by_play_store import get_store_filename, read_store_game
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+# Luck-adjusting a game should give the same play-by-play as the event-by-event implementation it replaced
+def test_luck_adjust_matches_previous_implementation(tmp_path):
+    stats = pd.read_csv(os.path.join(fixtures, 'stats.csv'))
+    luck_adjust_play_by_play_single_game('0021800003', stats, os.path.join(fixtures, 'pbp_{}.csv'),
+                                         str(tmp_path / 'pbp_{}.csv'))
+    luck_adjusted = pd.read_csv(tmp_path / 'pbp_0021800003.csv')
+    expected = pd.read_csv(os.path.join(fixtures, 'luck_adjusted_pbp_0021800003.csv'))
+    pd.testing.assert_frame_equal(luck_adjusted, expected)
+
+
+# A shooter missing from the season stats should fail the game
+def test_luck_adjust_missing_player(tmp_path):
+    stats = pd.read_csv(os.path.join(fixtures, 'stats.csv'))
+    stats = stats[stats['PLAYER_ID'] != 977]
+    with pytest.raises(KeyError):
+        luck_adjust_play_by_play_single_game('0021800003', stats, os.path.join(fixtures, 'pbp_{}.csv'),
+                                             str(tmp_path / 'pbp_{}.csv'))
+
+
+# Write a schedule with the fixture games for the 2018-19 regular season
+def write_schedule(tmp_path, game_ids):
+    schedule_filename = str(tmp_path / 'schedule_{}_{}.csv')
+    pd.DataFrame({'GAME_ID': game_ids}).to_csv(schedule_filename.format('2018-19', 'Regular Season'), index=False)
+    return schedule_filename
+
+
+# Luck-adjusting a season into a store should give the same play-by-play as writing one csv per game
+def test_luck_adjust_season_to_store(tmp_path):
+    schedule_filename = write_schedule(tmp_path, ['0021800000', '0021800003'])
+    store_directory = str(tmp_path / 'store')
+    luck_adjust_play_by_plays(['2018-19'], ['Regular Season'], schedule_filename, os.path.join(fixtures, 'stats.csv'),
+                              os.path.join(fixtures, 'pbp_{}.csv'), store_directory, max_processes=1)
+
+    luck_adjusted = read_store_game('0021800003', store_directory)
+    expected = pd.read_csv(os.path.join(fixtures, 'luck_adjusted_pbp_0021800003.csv'))
+    assert luck_adjusted['POINTS'].tolist() == expected['POINTS'].tolist()
+    assert luck_adjusted['EVENTNUM'].tolist() == expected['EVENTNUM'].tolist()
+    assert os.listdir(os.path.dirname(get_store_filename(store_directory, '2018-19', 'Regular Season'))) == [
+        'Regular Season.parquet']
+
+
+# A failed game should stop the season without leaving a temporary or partial store file behind
+def test_luck_adjust_season_to_store_failure(tmp_path):
+    schedule_filename = write_schedule(tmp_path, ['0021800003', '0021800099'])
+    store_directory = str(tmp_path / 'store')
+    with pytest.raises(Exception, match='0021800099'):
+        luck_adjust_play_by_plays(['2018-19'], ['Regular Season'], schedule_filename,
+                                  os.path.join(fixtures, 'stats.csv'), os.path.join(fixtures, 'pbp_{}.csv'),
+                                  store_directory, max_processes=1)
+
+    assert os.listdir(os.path.dirname(get_store_filename(store_directory, '2018-19', 'Regular Season'))) == []
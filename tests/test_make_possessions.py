@@ -0,0 +1,24 @@
+import os
+
+import pandas as pd
+import pytest
+
+from Possessions.event_lineups import get_event_lineups_single_game
+from Possessions.make_possessions import get_possessions_single_game
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+# The single-pass parser should give exactly the possessions saved from the row-by-row parser it replaced
+@pytest.mark.parametrize('game_id', ['0021800000', '0021800003'])
+def test_possessions_match_previous_parser(tmp_path, game_id):
+    play_by_play_filename = os.path.join(fixtures, 'pbp_{}.csv')
+    lineups_filename = str(tmp_path / 'lineups_{}.csv')
+    possessions_filename = str(tmp_path / 'possessions_{}.csv')
+    get_event_lineups_single_game(game_id, play_by_play_filename, os.path.join(fixtures, 'pap_{}.csv'),
+                                  lineups_filename)
+    get_possessions_single_game(game_id, play_by_play_filename, lineups_filename, possessions_filename)
+
+    possessions = pd.read_csv(possessions_filename.format(game_id))
+    expected = pd.read_csv(os.path.join(fixtures, f'possessions_{game_id}.csv'))
+    pd.testing.assert_frame_equal(possessions, expected)
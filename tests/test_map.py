@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import map as map_module
+from map import make_sparse_map_model
+from test_ridge import make_training_set
+
+
+# Solve for the MAP values directly, as the posterior of the linear model with Normal priors is Normal
+# Alpha is the last column of the design matrix, with its own prior
+def solve_map_exactly(train_x, train_y, weights, beta_mu, beta_sigma, alpha_mu, alpha_sigma, sigma):
+    design = np.column_stack([train_x.toarray(), np.ones(train_x.shape[0])])
+    prior_mu = np.append(np.broadcast_to(beta_mu, train_x.shape[1]), alpha_mu)
+    prior_precision = 1 / np.append(np.broadcast_to(beta_sigma, train_x.shape[1]), alpha_sigma) ** 2
+    lhs = design.T @ (weights[:, None] * design) / sigma ** 2 + np.diag(prior_precision)
+    rhs = design.T @ (weights * train_y) / sigma ** 2 + prior_precision * prior_mu
+    parameters = np.linalg.solve(lhs, rhs)
+    return parameters[-1], parameters[:-1]
+
+
+# The sparse MAP values should match the exact solution, with scalar and per-player priors and weighted rows
+@pytest.mark.parametrize('seed', range(3))
+def test_sparse_map_matches_exact_solution(seed):
+    train_x, train_y, weights = make_training_set(seed)
+    rng = np.random.default_rng(seed)
+    priors = [
+        {'beta_mu': 0.0, 'beta_sigma': 0.5, 'alpha_mu': 1.1, 'alpha_sigma': 0.1, 'sigma': 3.0},
+        {'beta_mu': rng.normal(size=train_x.shape[1]), 'beta_sigma': rng.uniform(0.2, 2.0, train_x.shape[1]),
+         'alpha_mu': 0.0, 'alpha_sigma': 1.0, 'sigma': 2.0},
+    ]
+    for prior in priors:
+        for row_weights in [None, weights]:
+            model = make_sparse_map_model(train_x, train_y, weights=row_weights, **prior)
+            exact_weights = np.ones(train_x.shape[0]) if row_weights is None else row_weights
+            alpha, beta = solve_map_exactly(train_x, train_y, exact_weights, **prior)
+            np.testing.assert_allclose(model['alpha'], alpha, atol=1e-6)
+            np.testing.assert_allclose(model['beta'], beta, atol=1e-6)
+
+
+# Stopping before convergence should raise with the optimizer's message instead of returning the last iterate
+def test_sparse_map_raises_when_not_converged(monkeypatch):
+    train_x, train_y, weights = make_training_set(0)
+    minimize = map_module.minimize
+
+    # Allow the optimizer a single iteration
+    def minimize_one_iteration(*args, options, **kwargs):
+        return minimize(*args, options={**options, 'maxiter': 1}, **kwargs)
+
+    monkeypatch.setattr(map_module, 'minimize', minimize_one_iteration)
+    with pytest.raises(Exception, match='MAP estimation did not converge: .*ITERATIONS'):
+        make_sparse_map_model(train_x, train_y, beta_sigma=0.5, sigma=3.0, weights=weights)
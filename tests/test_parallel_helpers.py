@@ -0,0 +1,42 @@
+import pytest
+
+from parallel_helpers import raise_failure, run_games, run_jobs_as_completed
+
+
+# Square a game number, failing for games divisible by 3
+def square_or_fail(game_id, offset):
+    if game_id % 3 == 0:
+        raise ValueError(f'Bad game {game_id}')
+    return game_id ** 2 + offset
+
+
+# A failed game should be reported with its error and traceback without stopping the other games, and results should
+# come back in the order of the game IDs no matter how many processes are used
+@pytest.mark.parametrize('max_processes', [1, 3])
+def test_run_games_reports_failures(max_processes):
+    results = list(run_games(square_or_fail, range(1, 11), (1,), max_processes=max_processes, chunksize=2))
+    assert [game_id for game_id, _, _ in results] == list(range(1, 11))
+    for game_id, result, failure in results:
+        if game_id % 3 == 0:
+            assert result is None
+            assert failure[0] == f'Bad game {game_id}'
+            assert 'ValueError' in failure[1]
+        else:
+            assert result == game_id ** 2 + 1
+            assert failure is None
+
+
+# Jobs finish in any order, but every job should be yielded once with its own result or failure
+@pytest.mark.parametrize('max_processes', [1, 3])
+def test_run_jobs_as_completed(max_processes):
+    results = {job: (result, failure) for job, result, failure in
+               run_jobs_as_completed(square_or_fail, range(1, 8), (0,), max_processes=max_processes)}
+    assert sorted(results) == list(range(1, 8))
+    assert results[4] == (16, None)
+    assert results[6][0] is None and results[6][1][0] == 'Bad game 6'
+
+
+# Stages that stop at the first failure should raise with the game ID and error message
+def test_raise_failure():
+    with pytest.raises(Exception, match='Game 0021800003 failed: Bad game'):
+        raise_failure('0021800003', ('Bad game', 'Traceback'))
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+from Possessions.play_by_play_helpers import *
+
+filler = EventType.Unimportant.value
+
+
+# Build a classified play-by-play of filler events with some events replaced
+# Each event is given as position: (event type, player 1, player 2, foul type, free throw type, is miss, time)
+def make_play_by_play(n_events, events):
+    rows = {
+        event_type_code: [filler] * n_events,
+        player1_id: [0] * n_events,
+        player2_id: [0] * n_events,
+        foul_type_code: [-1] * n_events,
+        free_throw_type_code: [-1] * n_events,
+        is_miss_column: [False] * n_events,
+        time_elapsed: [100] * n_events,
+    }
+    for i, (e_type, player1, player2, foul_type, ft_type, miss, time) in events.items():
+        rows[event_type_code][i] = e_type
+        rows[player1_id][i] = player1
+        rows[player2_id][i] = player2
+        rows[foul_type_code][i] = foul_type
+        rows[free_throw_type_code][i] = ft_type
+        rows[is_miss_column][i] = miss
+        rows[time_elapsed][i] = time
+    return pd.DataFrame(rows)
+
+
+# Events used in the tests
+miss = (EventType.MissedShot.value, 1, 0, -1, -1, True, 100)
+made_shot = (EventType.MadeShot.value, 1, 0, -1, -1, False, 100)
+foul = (EventType.Foul.value, 2, 1, FoulType.Shooting.value, -1, False, 100)
+technical = (EventType.Foul.value, 2, 1, FoulType.Technical.value, -1, False, 100)
+
+
+# A free throw by player 1 at a time
+def one_of_one(time):
+    return EventType.FreeThrow.value, 1, 0, -1, FreeThrowType.OneOfOne.value, False, time
+
+
+def test_find_previous():
+    matches = np.array([False, True, False, False, True, False])
+    np.testing.assert_array_equal(find_previous(matches), [-1, -1, 1, 1, 1, 4])
+    np.testing.assert_array_equal(find_previous(np.zeros(3, dtype=bool)), [-1, -1, -1])
+
+
+def test_find_next_for_player():
+    matches = np.array([False, True, False, True, True, False])
+    match_players = [0, 'a', 0, 'b', 'a', 0]
+    players = ['a', 'a', 'b', 'b', 'a', 'a']
+    next_for_player, next_for_same_player = find_next_for_player(matches, match_players, players)
+    np.testing.assert_array_equal(next_for_player, [1, 4, 3, -1, -1, -1])
+    np.testing.assert_array_equal(next_for_same_player, [-1, 4, -1, -1, -1, -1])
+
+
+# A miss exactly 20 events back is found, and one 21 events back falls back to the furthest event in the window
+def test_missed_shot_index_event_window_edge():
+    play_by_play = index_events(make_play_by_play(25, {0: miss}), event_window=20, time_window=10)
+    assert play_by_play[missed_shot_index][20] == 0
+    assert play_by_play[missed_shot_index][21] == 1
+    assert play_by_play[missed_shot_index][0] == 0
+
+
+# A foul exactly 20 events back is found, and one 21 events back falls back to the event before
+def test_foul_index_event_window_edge():
+    play_by_play = index_events(make_play_by_play(25, {0: foul}), event_window=20, time_window=10)
+    assert play_by_play[foul_index][20] == 0
+    assert play_by_play[foul_index][21] == 20
+
+
+# A foul and free throw at exactly 20 events and 10 seconds after a made shot make it an And-1
+def test_and_1_at_window_edges():
+    play_by_play = make_play_by_play(25, {0: made_shot, 1: foul, 20: one_of_one(110)})
+    assert index_events(play_by_play, event_window=20, time_window=10)[is_and_1_column][0]
+
+
+# A free throw 21 events after the made shot is outside the event window
+def test_and_1_outside_event_window():
+    play_by_play = make_play_by_play(25, {0: made_shot, 1: foul, 21: one_of_one(110)})
+    assert not index_events(play_by_play, event_window=20, time_window=10)[is_and_1_column][0]
+
+
+# A free throw 11 seconds after the made shot is outside the time window, even if a later one is inside it
+def test_and_1_outside_time_window():
+    play_by_play = make_play_by_play(25, {0: made_shot, 1: foul, 2: one_of_one(111)})
+    assert not index_events(play_by_play, event_window=20, time_window=10)[is_and_1_column][0]
+    play_by_play = make_play_by_play(25, {0: made_shot, 1: foul, 2: one_of_one(111), 3: one_of_one(105)})
+    assert index_events(play_by_play, event_window=20, time_window=10)[is_and_1_column][0]
+
+
+# Technical fouls do not make a made shot an And-1
+def test_and_1_ignores_technical_fouls():
+    play_by_play = make_play_by_play(25, {0: made_shot, 1: technical, 2: one_of_one(100)})
+    assert not index_events(play_by_play, event_window=20, time_window=10)[is_and_1_column][0]
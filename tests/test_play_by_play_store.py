@@ -0,0 +1,24 @@
+import os
+
+import pandas as pd
+
+from Possessions.play_by_play_store import read_play_by_play, read_store_game, to_store_table, write_store_season
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+# A string column whose values all look like numbers in some game should still be stored as the strings in the csv
+def test_numeric_looking_strings_stay_strings(tmp_path):
+    play_by_play = pd.read_csv(os.path.join(fixtures, 'pbp_0021800003.csv'), dtype=str)
+    # Scoring plays have a margin and every other event is missing one, as in the play-by-play from stats.nba.com
+    expected = [str(i % 7 - 3) if i % 3 == 0 else None for i in range(len(play_by_play))]
+    play_by_play['SCOREMARGIN'] = expected
+    play_by_play.to_csv(tmp_path / 'pbp_0021800003.csv', index=False)
+
+    game = read_play_by_play('0021800003', str(tmp_path / 'pbp_{}.csv'))
+    assert to_store_table(game).column('SCOREMARGIN').to_pylist() == expected
+
+    # The values read back from the store are the same strings
+    write_store_season([game], '2018-19', 'Regular Season', str(tmp_path / 'store'))
+    stored = read_store_game('0021800003', str(tmp_path / 'store'))
+    assert [None if pd.isna(value) else value for value in stored['SCOREMARGIN']] == expected
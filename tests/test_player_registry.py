@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Possessions.player_registry import (add_players_to_registry, ids_to_indices, indices_to_ids, indices_to_names,
+                                         load_player_registry, update_player_registry)
+
+
+# New players should get the next indices in order of their IDs, and players already there should keep theirs
+def test_add_players_keeps_indices(tmp_path):
+    registry = add_players_to_registry(load_player_registry(str(tmp_path / 'registry.csv')),
+                                       pd.DataFrame({'PLAYER_ID': [30, 10, 20], 'PLAYER_NAME': ['C', 'A', '']}))
+    np.testing.assert_array_equal(registry['PLAYER_ID'], [10, 20, 30])
+
+    registry = add_players_to_registry(registry, pd.DataFrame({'PLAYER_ID': ['25', '5', '20', '20'],
+                                                               'PLAYER_NAME': ['D', 'E', '', 'B']}))
+    np.testing.assert_array_equal(registry['PLAYER_INDEX'], np.arange(5))
+    np.testing.assert_array_equal(registry['PLAYER_ID'], [10, 20, 30, 5, 25])
+    np.testing.assert_array_equal(registry['PLAYER_NAME'], ['A', 'B', 'C', 'E', 'D'])
+
+
+# Saving and loading should give back the same registry, and updating from the players file should only add players
+def test_registry_round_trip(tmp_path):
+    registry_filename = str(tmp_path / 'registry.csv')
+    players_filename = str(tmp_path / 'players_and_ids.csv')
+    pd.DataFrame({'PLAYER_ID': [977, 2544], 'PLAYER_NAME': ['Kobe Bryant', 'LeBron James']}).to_csv(
+        players_filename, index=False)
+    registry = update_player_registry(players_filename, registry_filename)
+    pd.testing.assert_frame_equal(load_player_registry(registry_filename), registry)
+
+    pd.DataFrame({'PLAYER_ID': [2544, 1, 977], 'PLAYER_NAME': ['LeBron James', None, 'Kobe Bryant']}).to_csv(
+        players_filename, index=False)
+    registry = update_player_registry(players_filename, registry_filename)
+    np.testing.assert_array_equal(registry['PLAYER_ID'], [977, 2544, 1])
+    assert list(load_player_registry(registry_filename)['PLAYER_NAME']) == ['Kobe Bryant', 'LeBron James', '']
+
+    # A player added without a name gets one once it is known
+    pd.DataFrame({'PLAYER_ID': [1], 'PLAYER_NAME': ['Alaa Abdelnaby']}).to_csv(players_filename, index=False)
+    registry = update_player_registry(players_filename, registry_filename)
+    assert list(registry['PLAYER_NAME']) == ['Kobe Bryant', 'LeBron James', 'Alaa Abdelnaby']
+
+
+# IDs should map to indices and back, whether they are integers or strings, and unknown IDs should raise
+def test_ids_to_indices():
+    registry = add_players_to_registry(load_player_registry('missing.csv'),
+                                       pd.DataFrame({'PLAYER_ID': [300, 100, 200], 'PLAYER_NAME': ['C', 'A', 'B']}))
+    indices = ids_to_indices(registry, [[200, 100], [300, 200]])
+    np.testing.assert_array_equal(indices, [[1, 0], [2, 1]])
+    np.testing.assert_array_equal(ids_to_indices(registry, ['300', '100']), [2, 0])
+    np.testing.assert_array_equal(indices_to_ids(registry, indices), [[200, 100], [300, 200]])
+    np.testing.assert_array_equal(indices_to_names(registry, [2, 0]), ['C', 'A'])
+    with pytest.raises(KeyError, match='400'):
+        ids_to_indices(registry, [100, 400])
+    with pytest.raises(KeyError):
+        ids_to_indices(load_player_registry('missing.csv'), [100])
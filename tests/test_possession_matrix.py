@@ -0,0 +1,118 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from Possessions.player_registry import load_player_registry
+from Possessions.possession_matrix import (date_to_day, day_to_date, lineup_columns, load_possession_matrix,
+                                           select_possession_matrix_seasons, update_possession_matrix_season,
+                                           write_possession_matrix)
+
+seasons = ['2017-18', '2018-19']
+season_types = ['Regular Season', 'Playoffs']
+
+
+# Make the combined possessions for a season, with players drawn from a range of player IDs
+def make_season_possessions(seed, n_rows, first_player=1000, n_players=30):
+    rng = np.random.default_rng(seed)
+    lineups = np.array([rng.choice(n_players, 10, replace=False) + first_player for _ in range(n_rows)])
+    possessions = pd.DataFrame(lineups, columns=lineup_columns)
+    possessions['points'] = rng.integers(0, 4, n_rows)
+    possessions['possessions'] = 1
+    possessions['date'] = '2018-01-0' + pd.Series(rng.integers(1, 10, n_rows)).astype(str)
+    possessions['game_id'] = 21700000 + seed * 100 + rng.integers(0, 5, n_rows)
+    return possessions
+
+
+# Write the combined possessions for every season and season type, returning the season filename template
+def write_seasons(tmp_path, seasons, season_types):
+    season_possessions_filename = str(tmp_path / 'possessions_{}_{}.csv')
+    for i, season in enumerate(seasons):
+        for j, season_type in enumerate(season_types):
+            make_season_possessions(10 * i + j, 50 + 10 * i + j).to_csv(
+                season_possessions_filename.format(season, season_type), index=False)
+    return season_possessions_filename
+
+
+# Check that two possession matrices have the same rows, players, and seasons
+def assert_matrices_equal(matrix_directory, expected_directory):
+    matrix = load_possession_matrix(matrix_directory)
+    expected = load_possession_matrix(expected_directory)
+    for name in ['lineups', 'points', 'possessions', 'dates', 'game_ids', 'players']:
+        np.testing.assert_array_equal(matrix[name], expected[name])
+        assert matrix[name].dtype == expected[name].dtype
+    pd.testing.assert_frame_equal(matrix['seasons'], expected['seasons'])
+
+
+# Writing and loading a matrix should give back the possessions of every season, with lineups as registry indices
+def test_possession_matrix_round_trip(tmp_path):
+    season_possessions_filename = write_seasons(tmp_path, seasons, season_types)
+    registry_filename = str(tmp_path / 'registry.csv')
+    write_possession_matrix(seasons, season_types, season_possessions_filename, registry_filename,
+                            str(tmp_path / 'matrix'))
+    matrix = load_possession_matrix(str(tmp_path / 'matrix'))
+    registry = load_player_registry(registry_filename)
+    np.testing.assert_array_equal(matrix['players'], registry['PLAYER_ID'])
+
+    # Each season and season type is a block of rows holding its possessions
+    for season in seasons:
+        for season_type in season_types:
+            expected = pd.read_csv(season_possessions_filename.format(season, season_type))
+            possessions = select_possession_matrix_seasons(matrix, season, season, [season_type])
+            np.testing.assert_array_equal(matrix['players'][possessions['lineups']], expected[lineup_columns])
+            np.testing.assert_array_equal(possessions['points'], expected['points'])
+            np.testing.assert_array_equal(possessions['possessions'], expected['possessions'])
+            np.testing.assert_array_equal(day_to_date(possessions['dates']), expected['date'])
+            np.testing.assert_array_equal(possessions['game_ids'], expected['game_id'])
+
+    # Seasons that are not next to each other in the matrix are put together
+    both = select_possession_matrix_seasons(matrix, '2017-18', '2018-19', ['Playoffs', 'Regular Season'])
+    assert len(both['lineups']) == sum(len(pd.read_csv(season_possessions_filename.format(season, season_type)))
+                                       for season in seasons for season_type in season_types)
+    assert len(select_possession_matrix_seasons(matrix, '2019-20', '2019-20', season_types)['lineups']) == 0
+
+
+# Dates should convert to days since 1970-01-01 and back
+def test_date_to_day():
+    days = date_to_day(['1970-01-01', '2018-10-16', '2024-02-29'])
+    np.testing.assert_array_equal(days, [0, 17820, 19782])
+    np.testing.assert_array_equal(day_to_date(days), ['1970-01-01', '2018-10-16', '2024-02-29'])
+
+
+# Replacing a season that grew, with a new player, should give the same matrix as writing it from scratch
+def test_update_possession_matrix_season(tmp_path):
+    season_possessions_filename = write_seasons(tmp_path, seasons, season_types)
+    registry_filename = str(tmp_path / 'registry.csv')
+    write_possession_matrix(seasons, season_types, season_possessions_filename, registry_filename,
+                            str(tmp_path / 'matrix'))
+
+    # Append new games to the last regular season, one of them with a new player
+    season_filename = season_possessions_filename.format('2018-19', 'Regular Season')
+    new_games = make_season_possessions(99, 20)
+    new_games.loc[0, 'offensive_player1'] = 5000
+    pd.concat([pd.read_csv(season_filename), new_games]).to_csv(season_filename, index=False)
+    update_possession_matrix_season('2018-19', 'Regular Season', season_possessions_filename, registry_filename,
+                                    str(tmp_path / 'matrix'))
+
+    shutil.copy(registry_filename, tmp_path / 'expected_registry.csv')
+    write_possession_matrix(seasons, season_types, season_possessions_filename, str(tmp_path / 'expected_registry.csv'),
+                            str(tmp_path / 'expected'))
+    assert_matrices_equal(str(tmp_path / 'matrix'), str(tmp_path / 'expected'))
+    assert 5000 in load_possession_matrix(str(tmp_path / 'matrix'))['players']
+    assert not list((tmp_path / 'matrix').glob('*.tmp'))
+
+
+# A new season should go after the other seasons of its season type
+def test_update_possession_matrix_new_season(tmp_path):
+    season_possessions_filename = write_seasons(tmp_path, seasons + ['2019-20'], season_types)
+    registry_filename = str(tmp_path / 'registry.csv')
+    write_possession_matrix(seasons, season_types, season_possessions_filename, registry_filename,
+                            str(tmp_path / 'matrix'))
+    for season_type in season_types:
+        update_possession_matrix_season('2019-20', season_type, season_possessions_filename, registry_filename,
+                                        str(tmp_path / 'matrix'))
+
+    shutil.copy(registry_filename, tmp_path / 'expected_registry.csv')
+    write_possession_matrix(seasons + ['2019-20'], season_types, season_possessions_filename,
+                            str(tmp_path / 'expected_registry.csv'), str(tmp_path / 'expected'))
+    assert_matrices_equal(str(tmp_path / 'matrix'), str(tmp_path / 'expected'))
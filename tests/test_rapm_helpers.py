@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from rapm_helpers import (create_design_matrix, create_training_set, create_training_set_from_matrix,
+                          find_unique_ids, points_per_100_column)
+from test_stints import to_possessions_dataframe
+from test_sufficient_statistics import make_possessions
+
+
+# The design matrix should have 1 for each offensive player and -1 for each defensive player in every row
+def test_create_design_matrix():
+    lineups = np.array([[0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [9, 3, 5, 1, 7, 2, 0, 4, 6, 8]])
+    expected = np.zeros((2, 20))
+    for row, lineup in enumerate(lineups):
+        expected[row, lineup[:5]] = 1
+        expected[row, 10 + lineup[5:]] = -1
+    design_matrix = create_design_matrix(lineups, 10)
+    np.testing.assert_array_equal(design_matrix.toarray(), expected)
+    assert design_matrix.nnz == 20
+
+
+# The training set from a possession matrix should be the same as the one from the possessions dataframe
+def test_training_sets_match():
+    possessions = make_possessions(n_players=25)
+    possessions['players'] = np.arange(5000, 5025) * 7
+    possessions['lineups'] = possessions['lineups'][:, ::-1].copy()
+    possessions_df = to_possessions_dataframe(possessions)
+    possessions_df[points_per_100_column] = 100 * possessions_df['points'] / possessions_df['possessions']
+
+    unique_ids = find_unique_ids(possessions_df)
+    train_x, train_y, weights = create_training_set(possessions_df, points_per_100_column, unique_ids)
+    matrix_x, matrix_y, matrix_weights, matrix_ids = create_training_set_from_matrix(possessions)
+    assert matrix_ids == unique_ids
+    np.testing.assert_array_equal(matrix_x.toarray(), train_x.toarray())
+    np.testing.assert_allclose(matrix_y, train_y)
+    np.testing.assert_array_equal(matrix_weights, weights)
+
+    # Players missing from the unique IDs should be an error instead of being put in the wrong column
+    with pytest.raises(ValueError):
+        create_training_set(possessions_df, points_per_100_column, unique_ids[1:])
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from Possessions.possession_matrix import load_possession_matrix, write_possession_matrix
+from rapm import calculate_x_season_rapms_matrix, calculate_x_season_rapms_statistics
+from sufficient_statistics import get_seasons_statistics, sum_sufficient_statistics, update_window_statistics
+from test_possession_matrix import write_seasons
+
+seasons = ['2015-16', '2016-17', '2017-18', '2018-19']
+season_types = ['Regular Season', 'Playoffs']
+
+
+# Write a possession matrix for the test seasons and get the player names for it
+def make_matrix(tmp_path):
+    season_possessions_filename = write_seasons(tmp_path, seasons, season_types)
+    write_possession_matrix(seasons, season_types, season_possessions_filename, str(tmp_path / 'registry.csv'),
+                            str(tmp_path / 'matrix'))
+    matrix = load_possession_matrix(str(tmp_path / 'matrix'))
+    player_names_and_ids = pd.DataFrame({'PLAYER_ID': matrix['players'],
+                                         'PLAYER_NAME': [f'Player {i}' for i in matrix['players']]})
+    return matrix, player_names_and_ids
+
+
+# Sliding a window by adding and subtracting seasons should give the same statistics as adding up its seasons
+def test_window_statistics_match_sum(tmp_path):
+    matrix, _ = make_matrix(tmp_path)
+    seasons_statistics = get_seasons_statistics(matrix, seasons, season_types, 3)
+    window = None
+    for i, season in enumerate(seasons):
+        for season_type in season_types:
+            window = update_window_statistics(window, seasons_statistics[(season, season_type)], 1)
+            if i >= 2:
+                window = update_window_statistics(window, seasons_statistics[(seasons[i - 2], season_type)], -1)
+
+    expected = [seasons_statistics[(season, season_type)] for season in seasons[2:] for season_type in season_types]
+    expected_statistics = sum_sufficient_statistics([statistics for statistics, _ in expected])
+    np.testing.assert_allclose(window[0]['xx'].toarray(), expected_statistics['xx'].toarray(), atol=1e-9)
+    np.testing.assert_allclose(window[0]['xy'], expected_statistics['xy'], atol=1e-9)
+    assert window[0]['n'] == expected_statistics['n']
+    for fold in range(3):
+        fold_statistics = sum_sufficient_statistics([fold_statistics[fold] for _, fold_statistics in expected])
+        np.testing.assert_allclose(window[1][fold]['xy'], fold_statistics['xy'], atol=1e-9)
+
+
+# With a single lambda there is nothing to cross validate, so every window should match fitting its possessions
+def test_sliding_windows_match_possessions(tmp_path):
+    matrix, player_names_and_ids = make_matrix(tmp_path)
+    seasons_statistics = get_seasons_statistics(matrix, seasons, season_types, 3)
+    calculate_x_season_rapms_statistics(seasons_statistics, matrix['players'], seasons, season_types, 2,
+                                        player_names_and_ids, [0.05], str(tmp_path / 'window_{}_{}.csv'))
+    calculate_x_season_rapms_matrix(matrix, seasons, season_types, 2, player_names_and_ids, 3, [0.05],
+                                    str(tmp_path / 'matrix_{}_{}.csv'))
+
+    for i in range(len(seasons) - 1):
+        window = pd.read_csv(tmp_path / f'window_{seasons[i]}_{seasons[i + 1]}.csv')
+        expected = pd.read_csv(tmp_path / f'matrix_{seasons[i]}_{seasons[i + 1]}.csv')
+        pd.testing.assert_frame_equal(window, expected, atol=2e-3)
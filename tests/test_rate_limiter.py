@@ -0,0 +1,55 @@
+import json
+import time
+
+import pytest
+
+from rate_limiter import TokenBucket
+
+
+# Read the bucket state saved in the state file
+def read_state(bucket):
+    with open(bucket.state_filename) as fp:
+        return json.load(fp)
+
+
+# Errors from the server should cut the rate, down to the minimum, and successful responses should bring it back up
+def test_back_off_and_recover(tmp_path):
+    bucket = TokenBucket(state_filename=str(tmp_path / 'state.json'), requests_per_second=2.0,
+                         min_requests_per_second=0.4, backoff_factor=0.5, recovery_step=0.5)
+    bucket.report(429)
+    assert read_state(bucket)['rate'] == pytest.approx(1.0)
+    assert read_state(bucket)['tokens'] <= 0
+    bucket.report(503)
+    bucket.report(500)
+    assert read_state(bucket)['rate'] == pytest.approx(0.4)
+
+    # Client errors other than 429 leave the rate alone
+    bucket.report(404)
+    assert read_state(bucket)['rate'] == pytest.approx(0.4)
+
+    for _ in range(3):
+        bucket.report(200)
+    assert read_state(bucket)['rate'] == pytest.approx(1.9)
+    bucket.report(200)
+    assert read_state(bucket)['rate'] == pytest.approx(2.0)
+
+
+# A Retry-After header should put the bucket into debt for that long at the current rate
+def test_retry_after(tmp_path):
+    bucket = TokenBucket(state_filename=str(tmp_path / 'state.json'), requests_per_second=2.0, backoff_factor=0.5)
+    bucket.report(429, retry_after=3)
+    state = read_state(bucket)
+    assert state['tokens'] == pytest.approx(-3.0)
+
+
+# Buckets sharing a state file should share one rate limit, so requests through either wait for the other
+def test_shared_state_limits_rate(tmp_path):
+    state_filename = str(tmp_path / 'state.json')
+    buckets = [TokenBucket(state_filename=state_filename, requests_per_second=20.0) for _ in range(2)]
+    start = time.time()
+    for i in range(7):
+        buckets[i % 2].acquire()
+    elapsed = time.time() - start
+
+    # The first request uses the full bucket, and each of the next six waits for a token at 20 per second
+    assert 0.25 <= elapsed < 1.0
@@ -0,0 +1,25 @@
+from response_cache import ResponseCache
+
+url = 'https://stats.nba.com/stats/playbyplayv2?GameID=0021800001'
+
+
+# Overwriting an entry should replace its size instead of adding to it
+def test_put_overwrite_keeps_size(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    cache.put(url, {'rows': [1, 2, 3]})
+    cache.put('https://stats.nba.com/stats/leaguegamelog?Season=2018-19', {'rows': []})
+    for i in range(20):
+        cache.put(url, {'rows': list(range(i))})
+    assert cache.size == cache.get_size()
+
+
+# Overwriting one entry many times should not evict the others
+def test_put_overwrite_does_not_evict(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    other = 'https://stats.nba.com/stats/leaguegamelog?Season=2018-19'
+    cache.put(other, {'rows': []})
+    cache.put(url, {'rows': [0]})
+    cache.max_bytes = 3 * cache.get_size()
+    for _ in range(50):
+        cache.put(url, {'rows': [0]})
+    assert cache.get(other) == {'rows': []}
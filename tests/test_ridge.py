@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+from sklearn.linear_model import Ridge
+from sklearn.metrics import r2_score
+from sklearn.model_selection import KFold
+
+from rapm_helpers import stack_matrix_targets
+from ridge import get_fold_bounds, get_sufficient_statistics, make_ridge_model, score_ridge_path, solve_ridge_path
+
+alphas = [0.1, 1.0, 5.0, 20.0, 80.0]
+
+
+# Make a sparse training set of +1/-1 columns with uneven weights, like stints weighted by their possessions
+def make_training_set(seed, n_rows=120, n_columns=15):
+    rng = np.random.default_rng(seed)
+    train_x = (rng.random((n_rows, n_columns)) < 0.3) * rng.choice([1.0, -1.0], (n_rows, n_columns))
+    train_y = 3 * rng.normal(size=n_rows) + train_x @ rng.normal(size=n_columns)
+    weights = rng.integers(1, 8, n_rows).astype(np.float64)
+    return csr_matrix(train_x), train_y, weights
+
+
+# Score each alpha with the weighted R² of Ridge fits on contiguous folds, and choose the best one
+# Ridge is fit on dense rows, as its sparse solvers are iterative and only match to a tolerance
+def choose_alpha_weighted_kfold(train_x, train_y, weights, folds):
+    train_x = train_x.toarray()
+    scores = []
+    for alpha in alphas:
+        alpha_scores = []
+        for train, test in KFold(folds).split(train_x):
+            model = Ridge(alpha=alpha).fit(train_x[train], train_y[train], sample_weight=weights[train])
+            alpha_scores.append(r2_score(train_y[test], model.predict(train_x[test]), sample_weight=weights[test]))
+        scores.append(np.mean(alpha_scores))
+    return alphas[int(np.argmax(scores))]
+
+
+# Scores from the sufficient statistics should be the weighted R² of the predictions on the fold
+@pytest.mark.parametrize('seed', range(5))
+def test_score_is_weighted_r2(seed):
+    train_x, train_y, weights = make_training_set(seed)
+    start, stop = get_fold_bounds(len(train_y), 5)[2]
+    test_rows = np.arange(start, stop)
+    train_rows = np.setdiff1d(np.arange(len(train_y)), test_rows)
+
+    statistics = get_sufficient_statistics(train_x[train_rows], train_y[train_rows], weights[train_rows])
+    coefs, intercepts = solve_ridge_path(statistics, alphas)
+    test_statistics = get_sufficient_statistics(train_x[test_rows], train_y[test_rows], weights[test_rows])
+    scores = score_ridge_path(test_statistics, coefs, intercepts)
+
+    dense_x = train_x.toarray()
+    for i, alpha in enumerate(alphas):
+        model = Ridge(alpha=alpha).fit(dense_x[train_rows], train_y[train_rows], sample_weight=weights[train_rows])
+        expected = r2_score(train_y[test_rows], model.predict(dense_x[test_rows]), sample_weight=weights[test_rows])
+        assert scores[i, 0] == pytest.approx(expected)
+
+
+# With uneven weights, the chosen alpha and coefficients should match weighted Ridge fits on contiguous folds
+@pytest.mark.parametrize('seed', range(20))
+def test_make_ridge_model_matches_weighted_kfold(seed):
+    train_x, train_y, weights = make_training_set(seed)
+    lambdas = [2 * alpha / weights.sum() for alpha in alphas]
+    model = make_ridge_model(train_x, train_y, 5, weights, lambdas)
+
+    alpha = choose_alpha_weighted_kfold(train_x, train_y, weights, 5)
+    assert model.alpha_[0] == pytest.approx(alpha)
+    expected = Ridge(alpha=alpha).fit(train_x.toarray(), train_y, sample_weight=weights)
+    np.testing.assert_allclose(model.coef_[0], expected.coef_, atol=1e-8)
+    assert model.intercept_[0] == pytest.approx(expected.intercept_)
+
+
+# Fitting two targets together should choose lambda for each and match fitting each target on its own
+@pytest.mark.parametrize('seed', range(5))
+def test_joint_fit_matches_separate_fits(seed):
+    train_x, train_y, weights = make_training_set(seed)
+    second_y = 0.5 * train_y + np.random.default_rng(seed + 100).normal(size=len(train_y)) * 4
+    lambdas = [2 * alpha / weights.sum() for alpha in alphas]
+    joint = make_ridge_model(train_x, np.column_stack([train_y, second_y]), 5, weights, lambdas)
+
+    for target, target_y in enumerate([train_y, second_y]):
+        separate = make_ridge_model(train_x, target_y, 5, weights, lambdas)
+        assert joint.alpha_[target] == separate.alpha_[0]
+        np.testing.assert_allclose(joint.coef_[target], separate.coef_[0], atol=1e-10)
+        assert joint.intercept_[target] == pytest.approx(separate.intercept_[0])
+
+
+# Stacking matrices with different possessions should fail instead of fitting mismatched targets
+def test_stack_matrix_targets_checks_possessions():
+    possessions = {'lineups': np.arange(20).reshape(2, 10), 'possessions': np.ones(2), 'points': np.array([2.0, 0.0])}
+    luck_adjusted = dict(possessions, points=np.array([1.5, 0.8]))
+    stacked = stack_matrix_targets([possessions, luck_adjusted])
+    np.testing.assert_array_equal(stacked['points'], [[2.0, 1.5], [0.0, 0.8]])
+    with pytest.raises(ValueError):
+        stack_matrix_targets([possessions, dict(luck_adjusted, possessions=np.array([1.0, 2.0]))])
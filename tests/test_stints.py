@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rapm_helpers import (compress_matrix_stints, compress_stints, date_column, defense_player_ids, game_id_column,
+                          offense_player_ids, points_column, possessions_column)
+from test_sufficient_statistics import make_possessions
+
+
+# Convert possessions from a possession matrix to the combined possessions dataframe, with player IDs in the lineups
+def to_possessions_dataframe(possessions):
+    possessions_df = pd.DataFrame(possessions['players'][possessions['lineups']],
+                                  columns=offense_player_ids + defense_player_ids)
+    possessions_df[points_column] = possessions['points']
+    possessions_df[possessions_column] = possessions['possessions']
+    possessions_df[game_id_column] = possessions['game_ids']
+    possessions_df[date_column] = possessions['dates']
+    return possessions_df
+
+
+# Make possessions where lineups repeat, both within and across games, like real stints
+def make_repeated_possessions():
+    possessions = make_possessions(n_players=12, rows_per_game=60)
+    rng = np.random.default_rng(1)
+    repeated = rng.integers(0, 8, len(possessions['lineups']))
+    possessions['lineups'] = possessions['lineups'][repeated * 3 + rng.integers(0, 2, len(repeated))]
+    return possessions
+
+
+# Stints from a possession matrix should match the dataframe stints, in the order each stint first appears
+@pytest.mark.parametrize('by_game', [False, True])
+def test_matrix_stints_match_dataframe_stints(by_game):
+    possessions = make_repeated_possessions()
+    matrix_stints = compress_matrix_stints(possessions, by_game=by_game)
+    stints = compress_stints(to_possessions_dataframe(possessions), by_game=by_game)
+    assert len(stints) < len(possessions['lineups'])
+
+    np.testing.assert_array_equal(possessions['players'][matrix_stints['lineups']],
+                                  stints[offense_player_ids + defense_player_ids])
+    np.testing.assert_allclose(matrix_stints['points'], stints[points_column])
+    np.testing.assert_allclose(matrix_stints['possessions'], stints[possessions_column])
+    if by_game:
+        np.testing.assert_array_equal(matrix_stints['game_ids'], stints[game_id_column])
+        np.testing.assert_array_equal(matrix_stints['dates'], stints[date_column])
+        assert np.all(np.diff(matrix_stints['dates']) >= 0)
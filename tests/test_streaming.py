@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from Possessions.combine_possessions import combine_all_seasons_possessions
+from Possessions.player_registry import load_player_registry
+from Possessions.possession_matrix import (load_possession_matrix, select_possession_matrix_seasons,
+                                           write_possession_matrix)
+from rapm import calculate_rapm_matrix, calculate_rapm_streaming
+from sufficient_statistics import (get_matrix_chunks, get_matrix_statistics, get_streaming_statistics,
+                                   read_possessions_chunks, sum_sufficient_statistics)
+from test_possession_matrix import write_seasons
+
+seasons = ['2016-17', '2017-18', '2018-19']
+season_types = ['Regular Season', 'Playoffs']
+
+
+# Write a possession matrix for the test seasons, returning the season filename template
+def make_matrix(tmp_path):
+    season_possessions_filename = write_seasons(tmp_path, seasons, season_types)
+    write_possession_matrix(seasons, season_types, season_possessions_filename, str(tmp_path / 'registry.csv'),
+                            str(tmp_path / 'matrix'))
+    return season_possessions_filename
+
+
+# Check that two sufficient statistics are the same up to rounding
+def assert_statistics_equal(statistics, expected):
+    np.testing.assert_allclose(statistics['xx'].toarray(), expected['xx'].toarray(), atol=1e-9)
+    for name in ['xy', 'x', 'y', 'yy']:
+        np.testing.assert_allclose(statistics[name], expected[name], atol=1e-9)
+    assert statistics['n'] == expected['n']
+
+
+# Adding up small chunks of the matrix should give the statistics of every possession at once, with the folds
+# covering every possession once
+def test_streaming_statistics_match_matrix_statistics(tmp_path):
+    make_matrix(tmp_path)
+    matrix = load_possession_matrix(str(tmp_path / 'matrix'))
+    chunks = get_matrix_chunks(matrix, seasons[0], seasons[-1], season_types, chunksize=7)
+    statistics, fold_statistics = get_streaming_statistics(chunks, 3)
+
+    expected = get_matrix_statistics(select_possession_matrix_seasons(matrix, seasons[0], seasons[-1], season_types))
+    assert_statistics_equal(statistics, expected)
+    assert len(fold_statistics) == 3
+    assert_statistics_equal(sum_sufficient_statistics(fold_statistics), expected)
+
+
+# Chunks read from the all-seasons .csv file should have the same statistics as the same seasons in the matrix,
+# including when only some season types are kept
+def test_csv_chunks_match_matrix_chunks(tmp_path):
+    season_possessions_filename = make_matrix(tmp_path)
+    all_possessions_filename = str(tmp_path / 'all_possessions.csv')
+    combine_all_seasons_possessions(seasons, season_types, season_possessions_filename, all_possessions_filename)
+    matrix = load_possession_matrix(str(tmp_path / 'matrix'))
+    registry = load_player_registry(str(tmp_path / 'registry.csv'))
+
+    for selected_season_types in [season_types, ['Playoffs']]:
+        chunks = read_possessions_chunks(all_possessions_filename, registry, selected_season_types, chunksize=11)
+        statistics, _ = get_streaming_statistics(chunks, 3)
+        expected, _ = get_streaming_statistics(
+            get_matrix_chunks(matrix, seasons[0], seasons[-1], selected_season_types), 3)
+        assert_statistics_equal(statistics, expected)
+
+
+# With a single lambda there is nothing to cross validate, so streaming the possessions should give the same RAPM
+# values as fitting them all at once
+def test_streaming_rapm_matches_matrix_rapm(tmp_path):
+    make_matrix(tmp_path)
+    matrix = load_possession_matrix(str(tmp_path / 'matrix'))
+    player_names_and_ids = pd.DataFrame({'PLAYER_ID': matrix['players'],
+                                         'PLAYER_NAME': [f'Player {i}' for i in matrix['players']]})
+    chunks = get_matrix_chunks(matrix, seasons[0], seasons[-1], season_types, chunksize=13)
+    calculate_rapm_streaming(chunks, matrix['players'], player_names_and_ids, 3, [0.05],
+                             str(tmp_path / 'streaming.csv'))
+    possessions = select_possession_matrix_seasons(matrix, seasons[0], seasons[-1], season_types)
+    calculate_rapm_matrix(possessions, player_names_and_ids, 3, [0.05], str(tmp_path / 'matrix.csv'))
+
+    rapms = pd.read_csv(str(tmp_path / 'streaming.csv'))
+    expected = pd.read_csv(str(tmp_path / 'matrix.csv'))
+    pd.testing.assert_frame_equal(rapms, expected, check_exact=False, atol=2e-3)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from sufficient_statistics import (fit_rapm_statistics, get_date_index, get_date_range_statistics,
+                                   get_matrix_statistics, select_possession_rows)
+
+
+# Make possessions in the form of rows of a possession matrix, with a few games on each of a few dates
+def make_possessions(n_players=20, n_dates=6, games_per_date=2, rows_per_game=40, seed=0):
+    rng = np.random.default_rng(seed)
+    n_games = n_dates * games_per_date
+    n_rows = n_games * rows_per_game
+    lineups = np.array([rng.choice(n_players, 10, replace=False) for _ in range(n_rows)])
+    game_numbers = np.repeat(np.arange(n_games), rows_per_game)
+    return {
+        'lineups': lineups,
+        'points': rng.integers(0, 4, n_rows).astype(np.float64),
+        'possessions': rng.integers(1, 4, n_rows).astype(np.float64),
+        'dates': 17800 + game_numbers // games_per_date,
+        'game_ids': 21800000 + game_numbers,
+        'players': np.arange(1000, 1000 + n_players),
+    }
+
+
+# A range of dates with no possessions should be rejected rather than fit with empty statistics
+def test_date_range_without_dates():
+    date_index = get_date_index(make_possessions())
+    with pytest.raises(ValueError):
+        get_date_range_statistics(date_index, 17900, 17910, 5)
+
+
+# A range with fewer dates than folds should use one fold per date and fit without NaNs
+def test_date_range_shorter_than_folds():
+    possessions = make_possessions()
+    date_index = get_date_index(possessions)
+    statistics, fold_statistics = get_date_range_statistics(date_index, 17801, 17803, 5)
+    assert len(fold_statistics) == 3
+
+    # The statistics match those of the possessions in the range
+    expected = get_matrix_statistics(select_possession_rows(
+        possessions, (possessions['dates'] >= 17801) & (possessions['dates'] <= 17803)))
+    assert statistics['n'] == expected['n']
+    np.testing.assert_allclose(statistics['xx'].toarray(), expected['xx'].toarray())
+    np.testing.assert_allclose(statistics['xy'], expected['xy'])
+
+    model, _ = fit_rapm_statistics(statistics, fold_statistics, possessions['players'], [0.01, 0.05, 0.1])
+    assert np.all(np.isfinite(model.coef_))
+    assert np.all(np.isfinite(model.intercept_))
+
+
+# A single date can be fit with one lambda, but there are no folds to choose between lambdas
+def test_date_range_single_date():
+    possessions = make_possessions()
+    date_index = get_date_index(possessions)
+    statistics, fold_statistics = get_date_range_statistics(date_index, 17802, 17802, 5)
+    assert len(fold_statistics) == 1
+
+    model, _ = fit_rapm_statistics(statistics, fold_statistics, possessions['players'], [0.05])
+    assert np.all(np.isfinite(model.coef_))
+    with pytest.raises(ValueError):
+        fit_rapm_statistics(statistics, fold_statistics, possessions['players'], [0.01, 0.05])